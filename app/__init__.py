@@ -1,12 +1,14 @@
+import logging
 import os
-import sys
+import threading
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_wtf.csrf import CSRFProtect
 
-# Inicializar extensões
+logger = logging.getLogger(__name__)
+
+# Inicializar extensões (a própria aplicação é criada no primeiro uso; ver
+# __getattr__ no fim do módulo)
 db = SQLAlchemy()
-csrf = CSRFProtect()
 
 def create_app():
     """Factory function para criar a aplicação"""
@@ -20,33 +22,102 @@ def create_app():
     
     # Verificar se DATABASE_URL existe
     if not database_url:
-        print("⚠️ DATABASE_URL não encontrada! Usando SQLite (desenvolvimento)")
+        logger.warning("DATABASE_URL não encontrada! Usando SQLite (desenvolvimento)")
         database_url = 'sqlite:///crm.db'
     else:
-        print(f"✅ DATABASE_URL encontrada: {database_url[:30]}...")
+        logger.info("DATABASE_URL encontrada: %s...", database_url[:30])
         # Railway/Heroku usam postgres://, mas SQLAlchemy precisa postgresql://
         if database_url.startswith('postgres://'):
             database_url = database_url.replace('postgres://', 'postgresql://', 1)
-            print("✅ URL convertida para postgresql://")
+            logger.info("URL convertida para postgresql://")
     
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Pool de conexões: tamanho, overflow, timeout, recycle e pre-ping por
+    # variáveis DB_POOL_*; PGBOUNCER=1 deixa o pool a cargo do PgBouncer
+    from app.pool import opcoes_engine
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opcoes_engine(database_url)
     app.config['WTF_CSRF_ENABLED'] = True
     
+    # Paginação: itens por página e tipo de contagem do pager
+    # ('aproximada' usa a estimativa do PostgreSQL, 'exata' faz COUNT, 'nenhuma' desliga)
+    app.config['ITEMS_PER_PAGE'] = int(os.environ.get('ITEMS_PER_PAGE', 10))
+    app.config['PAGINACAO_CONTAGEM'] = os.environ.get('PAGINACAO_CONTAGEM', 'aproximada')
+    
+    # Fuso dos relatórios: as datas são gravadas em UTC e agrupadas por mês local
+    app.config['TIMEZONE'] = os.environ.get('TIMEZONE', 'America/Sao_Paulo')
+    
+    # Busca de clientes: quantidade máxima de resultados ranqueados
+    app.config['BUSCA_LIMITE'] = int(os.environ.get('BUSCA_LIMITE', 50))
+    
+    # Orçamento de consultas por rota: em testes estourar o limite é erro,
+    # em produção só gera um aviso no log
+    app.config['ORCAMENTO_CONSULTAS_ESTRITO'] = os.environ.get('ORCAMENTO_CONSULTAS_ESTRITO', '0') == '1'
+    
+    # Cache de respostas: 'local' (LRU por processo), 'redis' (compartilhado
+    # entre workers, CACHE_URL) ou 'nenhum'
+    app.config['CACHE_TIPO'] = os.environ.get('CACHE_TIPO', 'local')
+    app.config['CACHE_URL'] = os.environ.get('CACHE_URL', '')
+    app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 30))
+    app.config['CACHE_MAX_ITENS'] = int(os.environ.get('CACHE_MAX_ITENS', 1000))
+    
+    # Perfil por requisição (SQL, Jinja, Server-Timing): fração das requisições
+    # medidas (0 desliga, 1 mede todas), limite do log de lentas e repetições
+    # do mesmo comando que contam como N+1
+    app.config['PERFIL_AMOSTRAGEM'] = float(os.environ.get('PERFIL_AMOSTRAGEM', 0))
+    app.config['PERFIL_LENTO_MS'] = float(os.environ.get('PERFIL_LENTO_MS', 500))
+    app.config['PERFIL_REPETICOES'] = int(os.environ.get('PERFIL_REPETICOES', 5))
+    app.config['PERFIL_LOG_LENTO'] = os.environ.get('PERFIL_LOG_LENTO', '')
+    
+    # Tarefas em segundo plano (flask trabalhador): threads por processo,
+    # espera entre consultas à fila vazia (s), segundos sem sinal até uma
+    # tarefa em execução ser dada como abandonada e uploads de importação
+    # acima deste tamanho (bytes) vão para a fila
+    app.config['TAREFAS_CONCORRENCIA'] = int(os.environ.get('TAREFAS_CONCORRENCIA', 2))
+    app.config['TAREFAS_INTERVALO'] = float(os.environ.get('TAREFAS_INTERVALO', 1))
+    app.config['TAREFAS_TEMPO_LIMITE'] = int(os.environ.get('TAREFAS_TEMPO_LIMITE', 600))
+    app.config['IMPORTACAO_SINCRONA_MAX_BYTES'] = int(os.environ.get('IMPORTACAO_SINCRONA_MAX_BYTES', 1024 * 1024))
+    
     # Inicializar extensões com app
     db.init_app(app)
-    csrf.init_app(app)
+    # CSRF global: importado aqui porque carrega o WTForms, que `import app`
+    # não precisa; a instância fica em app.extensions['csrf']
+    from flask_wtf.csrf import CSRFProtect
+    CSRFProtect(app)
+    
+    from app import orcamento, comandos, cache, perfil
+    orcamento.init_app(app)
+    perfil.init_app(app)
+    cache.init_app(app)
+    comandos.init_app(app)
     
     # Registrar blueprints
     try:
         from app.controllers import main_bp
         app.register_blueprint(main_bp)
-        print("✅ Blueprint registrado com sucesso")
-    except Exception as e:
-        print(f"❌ Erro ao registrar blueprint: {e}")
-        sys.exit(1)
+    except Exception:
+        logger.exception("Erro ao registrar blueprint")
+        raise
     
     return app
 
-# Para compatibilidade com imports antigos
-app = create_app()
+
+# ==================== OBJETOS PREGUIÇOSOS ====================
+
+_PREGUICOSOS = {'app': create_app}
+_trava_preguicosos = threading.RLock()
+
+
+def _preguicoso(nome):
+    with _trava_preguicosos:
+        if nome not in globals():
+            globals()[nome] = _PREGUICOSOS[nome]()
+        return globals()[nome]
+
+
+def __getattr__(nome):
+    """`from app import app` (compatibilidade) monta a aplicação só no primeiro acesso"""
+    if nome in _PREGUICOSOS:
+        return _preguicoso(nome)
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
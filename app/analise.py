@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import case
+
+from app.models import ResumoFunil, ResumoSegmento
+
+
+# Análise de vendas e do funil cotação -> pedido, por mês local.
+#
+# As datas são gravadas em UTC (datetime.utcnow); os meses seguem o TIMEZONE
+# da configuração. As rotas de escrita somam cada pedido/cotação nas tabelas
+# resumo_vendas_segmento (mês x canal x área) e resumo_funil_cotacoes
+# (mês x status), como os demais resumos (app/resumos.py); a análise lê só
+# essas linhas, então o custo não cresce com o número de pedidos.
+#
+# Para reconstruir os resumos, o início de cada mês local é convertido para
+# UTC em Python (zoneinfo, com horário de verão quando houver) e o banco
+# classifica as linhas com um CASE sobre esses limites (expressao_mes).
+
+SEM_CANAL = 'Não informado'
+SEM_AREA = 'Não informada'
+MESES_PADRAO = 12
+MESES_MAXIMO = 120
+
+
+# ==================== MESES LOCAIS ====================
+
+def fuso():
+    return ZoneInfo(current_app.config['TIMEZONE'])
+
+
+def mes_local(data):
+    """'AAAA-MM' do mês local de uma data UTC sem fuso"""
+    data = data or datetime.utcnow()
+    return data.replace(tzinfo=timezone.utc).astimezone(fuso()).strftime('%Y-%m')
+
+
+def _proximo(ano, mes):
+    return (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+
+def limites_meses(primeiro, ultimo):
+    """[(rótulo, início em UTC sem fuso)] de primeiro a ultimo ('AAAA-MM'), mais o limite final"""
+    local = fuso()
+    ano, mes = map(int, primeiro.split('-'))
+    limites = []
+    while True:
+        inicio = datetime(ano, mes, 1, tzinfo=local).astimezone(timezone.utc).replace(tzinfo=None)
+        rotulo = f'{ano:04d}-{mes:02d}'
+        limites.append((rotulo, inicio))
+        if rotulo > ultimo:
+            return limites
+        ano, mes = _proximo(ano, mes)
+
+
+def expressao_mes(coluna, limites):
+    """CASE que devolve o rótulo do mês local de `coluna` (None fora dos limites)"""
+    # Do mais recente para o mais antigo: as linhas novas param no primeiro teste
+    return case(*[(coluna >= inicio, rotulo) for rotulo, inicio in reversed(limites[:-1])])
+
+
+def periodo(inicio=None, fim=None, meses=MESES_PADRAO):
+    """(primeiro, último) mês local; inicio/fim são datas locais. Sem datas, os `meses` até o atual.
+
+    Nunca mais que MESES_MAXIMO meses, nem com um `inicio` explícito.
+    """
+    ultimo = fim.strftime('%Y-%m') if fim else mes_local(None)
+    ano, mes = map(int, ultimo.split('-'))
+    total = ano * 12 + mes - 1 - (MESES_MAXIMO - 1)
+    limite = f'{total // 12:04d}-{total % 12 + 1:02d}'
+    if inicio:
+        primeiro = inicio.strftime('%Y-%m')
+    else:
+        total = ano * 12 + mes - 1 - (min(max(meses, 1), MESES_MAXIMO) - 1)
+        primeiro = f'{total // 12:04d}-{total % 12 + 1:02d}'
+    return min(max(primeiro, limite), ultimo), ultimo
+
+
+# ==================== MONTAGEM ====================
+
+def _ticket(linha):
+    linha['receita'] = round(linha['receita'], 2)
+    linha['ticket_medio'] = round(linha['receita'] / linha['pedidos'], 2) if linha['pedidos'] else 0.0
+    return linha
+
+
+def _taxa(parte, total):
+    return round(parte / total, 4) if total else 0.0
+
+
+def analisar(inicio=None, fim=None, meses=MESES_PADRAO):
+    """Receita, ticket médio, quebras por canal/área e funil por mês local (duas consultas)"""
+    primeiro, ultimo = periodo(inicio, fim, meses)
+    limites = limites_meses(primeiro, ultimo)
+
+    por_mes = {rotulo: {'mes': rotulo, 'pedidos': 0, 'receita': 0.0, 'cotacoes': 0,
+                        'cotacoes_convertidas': 0, 'cotacoes_por_status': {}}
+               for rotulo, _ in limites[:-1]}
+    por_canal, por_area = {}, {}
+    for resumo in ResumoSegmento.query.filter(ResumoSegmento.mes.between(primeiro, ultimo)):
+        canal, area = resumo.canal_vendas, resumo.area_atuacao
+        for linha in (por_mes[resumo.mes],
+                      por_canal.setdefault(canal, {'canal': canal, 'pedidos': 0, 'receita': 0.0}),
+                      por_area.setdefault(area, {'area': area, 'pedidos': 0, 'receita': 0.0})):
+            linha['pedidos'] += resumo.total_pedidos
+            linha['receita'] += resumo.valor_total
+
+    for resumo in ResumoFunil.query.filter(ResumoFunil.mes.between(primeiro, ultimo)):
+        linha = por_mes[resumo.mes]
+        linha['cotacoes'] += resumo.total
+        linha['cotacoes_convertidas'] += resumo.convertidas
+        if resumo.total:
+            linha['cotacoes_por_status'][resumo.status] = resumo.total
+
+    for linha in por_mes.values():
+        _ticket(linha)
+        linha['taxa_conversao'] = _taxa(linha['cotacoes_convertidas'], linha['cotacoes'])
+
+    totais = {campo: sum(linha[campo] for linha in por_mes.values())
+              for campo in ('pedidos', 'receita', 'cotacoes', 'cotacoes_convertidas')}
+    _ticket(totais)
+    totais['taxa_conversao'] = _taxa(totais['cotacoes_convertidas'], totais['cotacoes'])
+
+    def _ordenado(grupo):
+        return sorted(map(_ticket, grupo.values()), key=lambda linha: linha['receita'], reverse=True)
+
+    return {
+        'fuso': str(fuso()),
+        'inicio': primeiro,
+        'fim': ultimo,
+        'totais': totais,
+        'meses': list(por_mes.values()),
+        'por_canal': _ordenado(por_canal),
+        'por_area': _ordenado(por_area),
+    }
@@ -0,0 +1,36 @@
+from sqlalchemy import text
+
+from app import db
+
+
+# Aquecimento antes de receber tráfego (usado por wsgi.py/gunicorn.conf.py):
+# templates compilados no processo mestre são compartilhados pelos workers
+# (copy-on-write); as conexões do banco são abertas em cada worker, depois do
+# fork, para nenhum socket ser herdado do mestre.
+
+def compilar_templates(app):
+    """Compila todos os templates no cache do Jinja; retorna quantos"""
+    nomes = [nome for nome in app.jinja_env.list_templates() if nome.endswith('.html')]
+    for nome in nomes:
+        app.jinja_env.get_template(nome)
+    return len(nomes)
+
+
+def descartar_conexoes_herdadas(app):
+    """Esquece (sem fechar) conexões abertas antes do fork"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def abrir_conexoes(app, quantidade=1):
+    """Abre `quantidade` conexões de uma vez e as devolve ao pool"""
+    conexoes = []
+    with app.app_context():
+        try:
+            for _ in range(quantidade):
+                conn = db.engine.connect()
+                conexoes.append(conn)
+                conn.execute(text('SELECT 1'))
+        finally:
+            for conn in conexoes:
+                conn.close()
@@ -0,0 +1,214 @@
+from sqlalchemy import and_, event, func, or_, text
+
+from app import db
+from app.models import Cliente
+from app.utils import (TAMANHO_SUFIXO_TELEFONE, montar_texto_busca, normalizar_telefone,
+                       normalizar_texto, sufixo_telefone)
+
+
+# Busca de clientes sobre a coluna normalizada Cliente.texto_busca:
+#   - PostgreSQL: índices GIN pg_trgm (substring) e tsvector (ranking)
+#   - SQLite: tabela FTS5 "sombra" com tokenizador trigram, mantida por triggers
+
+
+# ==================== DDL DOS ÍNDICES ====================
+
+DDL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_texto_busca_trgm "
+    "ON clientes USING gin (texto_busca gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clientes_texto_busca_tsv "
+    "ON clientes USING gin (to_tsvector('simple', coalesce(texto_busca, '')))",
+]
+
+DDL_SQLITE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS clientes_busca USING fts5("
+    "texto_busca, content='clientes', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS clientes_busca_ai AFTER INSERT ON clientes BEGIN "
+    "INSERT INTO clientes_busca(rowid, texto_busca) VALUES (new.id, new.texto_busca); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_busca_ad AFTER DELETE ON clientes BEGIN "
+    "INSERT INTO clientes_busca(clientes_busca, rowid, texto_busca) "
+    "VALUES ('delete', old.id, old.texto_busca); END",
+    "CREATE TRIGGER IF NOT EXISTS clientes_busca_au AFTER UPDATE OF texto_busca ON clientes BEGIN "
+    "INSERT INTO clientes_busca(clientes_busca, rowid, texto_busca) "
+    "VALUES ('delete', old.id, old.texto_busca); "
+    "INSERT INTO clientes_busca(rowid, texto_busca) VALUES (new.id, new.texto_busca); END",
+]
+
+# O tokenizador trigram precisa de pelo menos 3 caracteres por termo
+TAMANHO_MINIMO_FTS = 3
+
+
+def criar_indices_busca(conn):
+    """Cria (se não existirem) os índices de busca do banco conectado"""
+    dialeto = conn.dialect.name
+    if dialeto == 'postgresql':
+        comandos = DDL_POSTGRES
+    elif dialeto == 'sqlite':
+        comandos = DDL_SQLITE
+    else:
+        return
+    for comando in comandos:
+        conn.execute(text(comando))
+
+
+def remover_indices_busca(conn):
+    """Remove a tabela FTS5 e os triggers (SQLite)"""
+    if conn.dialect.name != 'sqlite':
+        return
+    for sufixo in ('ai', 'ad', 'au'):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS clientes_busca_{sufixo}"))
+    conn.execute(text("DROP TABLE IF EXISTS clientes_busca"))
+
+
+def reconstruir_indices_busca(conn):
+    """Recalcula texto_busca de todos os clientes e recria os índices"""
+    # No SQLite o índice FTS é recriado do zero: os triggers de UPDATE
+    # corromperiam o índice se ele estiver fora de sincronia com a tabela
+    remover_indices_busca(conn)
+    linhas = conn.execute(text(
+        "SELECT id, nome, empresa, email, telefone FROM clientes"
+    )).fetchall()
+    valores = [
+        {'id': id, 'texto': montar_texto_busca(nome, empresa, email, telefone)}
+        for id, nome, empresa, email, telefone in linhas
+    ]
+    if valores:
+        conn.execute(text("UPDATE clientes SET texto_busca = :texto WHERE id = :id"), valores)
+    criar_indices_busca(conn)
+    if conn.dialect.name == 'sqlite':
+        conn.execute(text("INSERT INTO clientes_busca(clientes_busca) VALUES ('rebuild')"))
+    return len(valores)
+
+
+@event.listens_for(Cliente.__table__, 'after_create')
+def _apos_criar_clientes(tabela, conn, **kw):
+    criar_indices_busca(conn)
+
+
+@event.listens_for(Cliente.__table__, 'before_drop')
+def _antes_remover_clientes(tabela, conn, **kw):
+    # A tabela FTS5 não faz parte do metadata; sem isso ficaria órfã
+    remover_indices_busca(conn)
+
+
+# ==================== CONSULTA ====================
+
+def normalizar_termo(termo):
+    """Normaliza o termo da mesma forma que texto_busca.
+
+    Termos só com dígitos e pontuação (telefones) viram apenas dígitos.
+    """
+    termo = normalizar_texto(termo)
+    digitos = ''.join(filter(str.isdigit, termo))
+    if digitos and not any(c.isalpha() for c in termo):
+        return digitos
+    return termo
+
+
+def _escapar_like(palavra):
+    return palavra.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _filtro_like(palavras):
+    """Todas as palavras como substring (usa o índice trigram no PostgreSQL)"""
+    return and_(*[
+        Cliente.texto_busca.like(f'%{_escapar_like(p)}%', escape='\\') for p in palavras
+    ])
+
+
+def _buscar_like(palavras, limite):
+    return (Cliente.query
+            .filter(Cliente.ativo.is_(True))
+            .filter(_filtro_like(palavras))
+            .order_by(Cliente.nome, Cliente.id)
+            .limit(limite)
+            .all())
+
+
+def _buscar_postgres(termo, palavras, limite):
+    documento = func.to_tsvector('simple', func.coalesce(Cliente.texto_busca, ''))
+    consulta = func.plainto_tsquery('simple', termo)
+    relevancia = func.ts_rank(documento, consulta) + func.similarity(Cliente.texto_busca, termo)
+    return (Cliente.query
+            .filter(Cliente.ativo.is_(True))
+            .filter(or_(_filtro_like(palavras), documento.op('@@')(consulta)))
+            .order_by(relevancia.desc(), Cliente.nome, Cliente.id)
+            .limit(limite)
+            .all())
+
+
+def _buscar_sqlite(palavras, limite):
+    if min(len(p) for p in palavras) < TAMANHO_MINIMO_FTS:
+        return _buscar_like(palavras, limite)
+
+    expressao = ' AND '.join('"' + p.replace('"', '""') + '"' for p in palavras)
+    ids = db.session.execute(text(
+        "SELECT c.id FROM clientes_busca f JOIN clientes c ON c.id = f.rowid "
+        "WHERE clientes_busca MATCH :expressao AND c.ativo "
+        "ORDER BY f.rank LIMIT :limite"
+    ), {'expressao': expressao, 'limite': limite}).scalars().all()
+    if not ids:
+        return []
+
+    posicao = {id: i for i, id in enumerate(ids)}
+    clientes = Cliente.query.filter(Cliente.id.in_(ids)).all()
+    return sorted(clientes, key=lambda c: posicao[c.id])
+
+
+def _clientes_por_telefone(coluna, valor, limite, apenas_ativos):
+    consulta = Cliente.query.filter(coluna == valor)
+    if apenas_ativos:
+        consulta = consulta.filter(Cliente.ativo.is_(True))
+    return consulta.order_by(Cliente.nome, Cliente.id).limit(limite).all()
+
+
+def buscar_por_telefone(numero, limite=50, apenas_ativos=True):
+    """Clientes com esse telefone: pelo E.164 ou, sem casar, pelos dígitos finais.
+
+    Número completo (com DDD) consulta o índice de telefone_e164; número
+    parcial ou gravado sem o nono dígito cai no índice de telefone_sufixo.
+    """
+    normalizado = normalizar_telefone(numero)
+    if normalizado:
+        clientes = _clientes_por_telefone(Cliente.telefone_e164, normalizado[0], limite, apenas_ativos)
+        if clientes:
+            return clientes
+    sufixo = sufixo_telefone(normalizado[0] if normalizado else numero)
+    if sufixo is None:
+        return []
+    return _clientes_por_telefone(Cliente.telefone_sufixo, sufixo, limite, apenas_ativos)
+
+
+def buscar_clientes(termo, limite=50):
+    """Clientes ativos que casam com o termo, dos mais relevantes para os menos"""
+    termo = normalizar_termo(termo)
+    palavras = termo.split()
+    if not palavras:
+        return []
+
+    # Termo que parece telefone: consulta direta aos índices de telefone
+    if termo.isdigit() and len(termo) >= TAMANHO_SUFIXO_TELEFONE:
+        clientes = buscar_por_telefone(termo, limite)
+        if clientes:
+            return clientes
+
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == 'postgresql':
+        return _buscar_postgres(termo, palavras, limite)
+    if dialeto == 'sqlite':
+        return _buscar_sqlite(palavras, limite)
+    return _buscar_like(palavras, limite)
+
+
+class ResultadoBusca:
+    """Resultado ranqueado com a mesma interface usada pelas listagens"""
+
+    has_prev = False
+    has_next = False
+    page = 1
+
+    def __init__(self, items, limite):
+        self.items = items
+        self.limite = limite
+        self.truncado = len(items) >= limite
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from hashlib import sha1
+
+from flask import current_app, g, has_request_context, make_response, request, session
+from flask.globals import request_ctx
+
+
+# Cache de respostas das páginas de leitura.
+#
+# As chaves são por rota + query string e carregam a versão atual de cada
+# tag da página ('clientes', 'cliente:7', ...). As rotas de escrita chamam
+# invalidar(tags) depois do commit, o que troca a versão das tags: as
+# entradas antigas deixam de ser encontradas e expiram sozinhas pelo TTL/LRU.
+#
+# O backend padrão é um LRU em memória, por processo. Com vários workers a
+# invalidação feita em um não chega aos outros (ficam no máximo CACHE_TTL
+# segundos desatualizados); para invalidar em todos, use um backend
+# compartilhado (CACHE_TIPO=redis, CACHE_URL=redis://...). Quem acabou de
+# escrever não lê do cache por CACHE_TTL segundos, então sempre vê a própria
+# alteração, em qualquer worker.
+
+PREFIXO_TAG = 'tag:'
+TAG_GLOBAL = 'tudo'
+
+
+# ==================== BACKENDS ====================
+
+class CacheLocal:
+    """LRU em memória com TTL por entrada (thread-safe)"""
+
+    def __init__(self, max_itens=1000):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def get_many(self, chaves):
+        agora = time.monotonic()
+        valores = []
+        with self._trava:
+            for chave in chaves:
+                item = self._itens.get(chave)
+                if item is None:
+                    valores.append(None)
+                    continue
+                valor, expira = item
+                if expira is not None and expira <= agora:
+                    del self._itens[chave]
+                    valores.append(None)
+                    continue
+                self._itens.move_to_end(chave)
+                valores.append(valor)
+        return valores
+
+    def set_many(self, itens, ttl=None):
+        expira = time.monotonic() + ttl if ttl else None
+        with self._trava:
+            for chave, valor in itens.items():
+                self._itens[chave] = (valor, expira)
+                self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+
+
+class CacheRedis:
+    """Backend compartilhado entre workers (pacote redis, em requirements.txt)"""
+
+    def __init__(self, url):
+        if not url:
+            raise RuntimeError('CACHE_TIPO=redis exige CACHE_URL (ex.: redis://localhost:6379/0)')
+        try:
+            import redis
+        except ImportError as erro:
+            raise RuntimeError('CACHE_TIPO=redis exige o pacote redis (pip install -r requirements.txt)') from erro
+        self.cliente = redis.Redis.from_url(url)
+
+    def get_many(self, chaves):
+        return [json.loads(valor) if valor is not None else None
+                for valor in self.cliente.mget(chaves)]
+
+    def set_many(self, itens, ttl=None):
+        pipe = self.cliente.pipeline()
+        for chave, valor in itens.items():
+            pipe.set(chave, json.dumps(valor), ex=ttl or None)
+        pipe.execute()
+
+    def limpar(self):
+        self.cliente.flushdb()
+
+
+# ==================== CACHE COM TAGS ====================
+
+class CacheRespostas:
+    """Respostas guardadas por chave + versões das tags"""
+
+    def __init__(self, backend, ttl=30):
+        self.backend = backend
+        self.ttl = ttl
+
+    def _versoes(self, tags):
+        chaves = [PREFIXO_TAG + tag for tag in tags]
+        versoes = self.backend.get_many(chaves)
+        novas = {chave: uuid.uuid4().hex[:12] for chave, versao in zip(chaves, versoes) if versao is None}
+        if novas:
+            # Tag sem versão (nova ou despejada pelo LRU): qualquer versão
+            # nova é segura, só invalida o que já existia
+            self.backend.set_many(novas)
+        return [versao or novas[chave] for chave, versao in zip(chaves, versoes)]
+
+    def chave(self, rota, caminho, tags):
+        assinatura = '|'.join(f'{tag}={versao}' for tag, versao in zip(tags, self._versoes(tags)))
+        return 'resp:' + sha1(f'{rota}|{caminho}|{assinatura}'.encode('utf-8')).hexdigest()
+
+    def get(self, chave):
+        return self.backend.get_many([chave])[0]
+
+    def set(self, chave, valor, ttl=None):
+        self.backend.set_many({chave: valor}, ttl or self.ttl)
+
+    def invalidar(self, *tags):
+        self.backend.set_many({PREFIXO_TAG + tag: uuid.uuid4().hex[:12] for tag in tags})
+
+
+def _cache():
+    return current_app.extensions.get('cache_respostas')
+
+
+def invalidar(*tags):
+    """Invalida as páginas com essas tags (chamar depois do commit)"""
+    cache = _cache()
+    if cache is None or not tags:
+        return
+    cache.invalidar(*tags)
+    if has_request_context():
+        session['_cache_escrita'] = time.time()
+
+
+def invalidar_tudo():
+    invalidar(TAG_GLOBAL)
+
+
+# ==================== DECORADOR ====================
+
+def cache_resposta(*tags, ttl=None):
+    """Guarda a resposta da rota GET por rota + query string.
+
+    As tags podem usar os argumentos da rota: @cache_resposta('cliente:{id}').
+    Respostas em streaming, com status diferente de 200, que consumiram
+    mensagens flash ou geraram token CSRF não são guardadas; com flash
+    pendente na sessão a rota também não é servida do cache (a página
+    guardada não exibiria a mensagem).
+    """
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            cache = _cache()
+            if cache is None or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            tags_rota = [TAG_GLOBAL] + [tag.format(**kwargs) for tag in tags]
+            chave = cache.chave(request.endpoint, request.full_path, tags_rota)
+            escreveu = session.get('_cache_escrita', 0) > time.time() - cache.ttl
+            salvo = None if escreveu or session.get('_flashes') else cache.get(chave)
+            if salvo is not None:
+                resposta = current_app.response_class(
+                    salvo['corpo'], status=salvo['status'], mimetype=salvo['mimetype']
+                )
+                resposta.headers['X-Cache'] = 'HIT'
+                return resposta
+
+            resposta = make_response(view(*args, **kwargs))
+            if (resposta.status_code == 200 and not resposta.is_streamed
+                    and not request_ctx.flashes and 'csrf_token' not in g):
+                cache.set(chave, {
+                    'corpo': resposta.get_data(as_text=True),
+                    'status': resposta.status_code,
+                    'mimetype': resposta.mimetype,
+                }, ttl)
+                resposta.headers['X-Cache'] = 'MISS'
+            return resposta
+        return envolvida
+    return decorador
+
+
+def init_app(app):
+    """Escolhe o backend pelo CACHE_TIPO ('local', 'redis' ou 'nenhum')"""
+    tipo = app.config.get('CACHE_TIPO', 'local')
+    if tipo == 'nenhum':
+        return
+    if tipo == 'redis':
+        backend = CacheRedis(app.config['CACHE_URL'])
+    else:
+        backend = CacheLocal(app.config.get('CACHE_MAX_ITENS', 1000))
+    app.extensions['cache_respostas'] = CacheRespostas(backend, app.config.get('CACHE_TTL', 30))
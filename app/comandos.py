@@ -0,0 +1,296 @@
+import click
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from app import db
+from app.cache import invalidar, invalidar_tudo
+
+
+# Comandos de manutenção: `flask <comando>` (FLASK_APP=run.py)
+
+@click.command('reindexar-busca')
+def reindexar_busca():
+    """Cria os índices de busca de clientes e recalcula texto_busca"""
+    from app.busca import reconstruir_indices_busca
+
+    with db.engine.begin() as conn:
+        colunas = {c['name'] for c in inspect(conn).get_columns('clientes')}
+        if 'texto_busca' not in colunas:
+            conn.execute(text("ALTER TABLE clientes ADD COLUMN texto_busca TEXT"))
+            click.echo("✅ Coluna clientes.texto_busca criada")
+        total = reconstruir_indices_busca(conn)
+    click.echo(f"✅ Índice de busca reconstruído ({total} clientes)")
+
+
+def _criar_indices_faltantes(conn):
+    """Índices dos modelos em tabelas que já existiam (create_all os pula)"""
+    criados = []
+    inspetor = inspect(conn)
+    tabelas = set(inspetor.get_table_names())
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        existentes = {i['name'] for i in inspetor.get_indexes(tabela.name)}
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            if indice.name not in existentes:
+                indice.create(conn)
+                criados.append(indice.name)
+    return criados
+
+
+def _adicionar_colunas_faltantes(conn):
+    """ALTER TABLE ADD COLUMN para colunas novas dos modelos (nulas ou com default no banco)"""
+    criadas = []
+    inspetor = inspect(conn)
+    tabelas = set(inspetor.get_table_names())
+    for tabela in db.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            continue
+        existentes = {c['name'] for c in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes:
+                continue
+            if not coluna.nullable and coluna.server_default is None:
+                raise click.ClickException(
+                    f"{tabela.name}.{coluna.name} é NOT NULL sem default no banco; crie-a manualmente"
+                )
+            ddl = CreateColumn(coluna).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {tabela.name} ADD COLUMN {ddl}"))
+            criadas.append(f"{tabela.name}.{coluna.name}")
+    return criadas
+
+
+# Datas das chaves da paginação por cursor: (data, id) < (:d, :i) nunca casa
+# com data nula, e a linha sumiria de todas as páginas depois da primeira
+_DATAS_OBRIGATORIAS = (('cotacoes', 'data_criacao'), ('pedidos', 'data_criacao'),
+                       ('interacoes', 'data_hora'))
+
+
+def _exigir_datas(conn):
+    """Preenche datas nulas (gravadas por SQL ou cargas externas) e as torna NOT NULL.
+
+    No SQLite a restrição só vale para tabelas criadas pelo create_all
+    (ALTER COLUMN não existe); nos bancos antigos fica o preenchimento.
+    """
+    preenchidas = {}
+    inspetor = inspect(conn)
+    for tabela, coluna in _DATAS_OBRIGATORIAS:
+        colunas = {c['name']: c for c in inspetor.get_columns(tabela)}
+        # Sem data conhecida: a última atualização ou o momento da migração
+        valor = 'COALESCE(atualizado_em, CURRENT_TIMESTAMP)' if 'atualizado_em' in colunas else 'CURRENT_TIMESTAMP'
+        total = conn.execute(text(f"UPDATE {tabela} SET {coluna} = {valor} WHERE {coluna} IS NULL")).rowcount
+        if total:
+            preenchidas[f"{tabela}.{coluna}"] = total
+        if conn.dialect.name == 'postgresql' and colunas[coluna]['nullable']:
+            conn.execute(text(f"ALTER TABLE {tabela} ALTER COLUMN {coluna} SET DEFAULT CURRENT_TIMESTAMP, "
+                              f"ALTER COLUMN {coluna} SET NOT NULL"))
+    return preenchidas
+
+
+@click.command('init-db')
+def init_db():
+    """Cria tabelas, colunas e índices que faltam (idempotente; rodar a cada deploy)"""
+    db.create_all()
+    with db.engine.begin() as conn:
+        for nome in _adicionar_colunas_faltantes(conn):
+            click.echo(f"✅ Coluna {nome} criada")
+        for nome, total in _exigir_datas(conn).items():
+            click.echo(f"✅ {nome}: {total} datas nulas preenchidas")
+        for nome in _criar_indices_faltantes(conn):
+            click.echo(f"✅ {nome} criado")
+    click.echo("✅ Banco de dados inicializado")
+
+
+@click.command('criar-indices')
+def criar_indices():
+    """Cria os índices declarados nos modelos que ainda não existem no banco"""
+    with db.engine.begin() as conn:
+        for nome in _criar_indices_faltantes(conn):
+            click.echo(f"✅ {nome} criado")
+        # Estatísticas novas para o planejador escolher os índices
+        conn.execute(text("ANALYZE"))
+    click.echo("✅ Índices em dia")
+
+
+@click.command('recalcular-contadores')
+def recalcular_contadores():
+    """Recalcula os contadores do dashboard a partir das tabelas"""
+    from app import contadores
+
+    valores = contadores.recalcular_contadores()
+    for nome, valor in valores.items():
+        click.echo(f"   {nome}: {valor}")
+    click.echo("✅ Contadores recalculados")
+
+
+@click.command('reconstruir-resumos')
+def reconstruir_resumos():
+    """Recalcula as tabelas de resumo de vendas usadas em /relatorios"""
+    from app import resumos
+
+    resumos.reconstruir_resumos()
+    click.echo("✅ Resumos de vendas reconstruídos")
+
+
+@click.command('normalizar-telefones')
+@click.option('--lote', default=5000, show_default=True, help='Clientes por lote/transação')
+def normalizar_telefones(lote):
+    """Preenche telefone_e164/telefone_sufixo (e o formato de exibição) dos clientes já cadastrados"""
+    from app.models import dados_telefone
+    from app.utils import montar_texto_busca
+
+    ultimo_id, alterados, invalidos = 0, 0, 0
+    while True:
+        with db.engine.begin() as conn:
+            linhas = conn.execute(text(
+                "SELECT id, nome, empresa, email, telefone, telefone_e164, telefone_sufixo "
+                "FROM clientes WHERE id > :ultimo ORDER BY id LIMIT :lote"
+            ), {'ultimo': ultimo_id, 'lote': lote}).fetchall()
+            if not linhas:
+                break
+            ultimo_id = linhas[-1].id
+
+            valores = []
+            for linha in linhas:
+                dados = dados_telefone(linha.telefone)
+                invalidos += dados['telefone_e164'] is None
+                if (dados['telefone'], dados['telefone_e164'], dados['telefone_sufixo']) == \
+                        (linha.telefone, linha.telefone_e164, linha.telefone_sufixo):
+                    continue
+                dados['id'] = linha.id
+                dados['texto_busca'] = montar_texto_busca(linha.nome, linha.empresa, linha.email, dados['telefone'])
+                valores.append(dados)
+            if valores:
+                conn.execute(text(
+                    "UPDATE clientes SET telefone = :telefone, telefone_e164 = :telefone_e164, "
+                    "telefone_sufixo = :telefone_sufixo, texto_busca = :texto_busca WHERE id = :id"
+                ), valores)
+                alterados += len(valores)
+
+    if alterados:
+        invalidar_tudo()
+    click.echo(f"✅ {alterados} telefones normalizados ({invalidos} inválidos, buscados só pelo sufixo)")
+
+
+@click.command('duplicados')
+@click.option('--limiar', default=None, type=float, help='Pontuação mínima (0 a 1) para considerar duplicado')
+@click.option('--reindexar', is_flag=True, help='Recalcula a tabela de chaves antes (após cargas por SQL)')
+@click.option('--saida', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Grava os grupos em CSV (grupo, id, nome, empresa, email, telefone)')
+def duplicados(limiar, reindexar, saida):
+    """Encontra grupos de clientes duplicados em toda a base"""
+    import csv
+    from app import duplicados as deteccao
+    from app.models import Cliente
+
+    if reindexar:
+        total = deteccao.reconstruir_chaves()
+        click.echo(f"✅ Chaves de {total} clientes recalculadas")
+
+    grupos, estatisticas = deteccao.encontrar_grupos(limiar or deteccao.LIMIAR_PADRAO)
+    click.echo(f"   {estatisticas['clientes']} clientes, {estatisticas['pares_comparados']} pares comparados, "
+               f"{estatisticas['blocos_pulados']} blocos grandes pulados")
+
+    escritor = None
+    if saida:
+        arquivo = open(saida, 'w', encoding='utf-8', newline='')
+        escritor = csv.writer(arquivo)
+        escritor.writerow(['grupo', 'id', 'nome', 'empresa', 'email', 'telefone'])
+    try:
+        for numero, ids in enumerate(grupos, 1):
+            clientes = Cliente.query.filter(Cliente.id.in_(ids)).order_by(Cliente.id).all()
+            click.echo(f"\n🔁 Grupo {numero} ({len(clientes)} clientes)")
+            for cliente in clientes:
+                click.echo(f"   #{cliente.id} {cliente.nome} | {cliente.empresa} | {cliente.email} | {cliente.telefone}")
+                if escritor:
+                    escritor.writerow([numero, cliente.id, cliente.nome, cliente.empresa,
+                                       cliente.email, cliente.telefone])
+    finally:
+        if escritor:
+            arquivo.close()
+    click.echo(f"\n✅ {len(grupos)} grupos de possíveis duplicados")
+
+
+@click.command('migrar-itens')
+@click.option('--lote', default=1000, show_default=True, help='Documentos por lote/transação')
+def migrar_itens(lote):
+    """Cria os itens estruturados a partir do texto `itens` das cotações e pedidos antigos"""
+    from app import itens
+
+    cotacoes, pedidos = itens.migrar_itens(lote)
+    click.echo(f"✅ Itens criados para {cotacoes} cotações e {pedidos} pedidos")
+
+
+@click.command('importar-clientes')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(['csv', 'json']), default=None,
+              help='Padrão: pela extensão do arquivo')
+@click.option('--lote', default=5000, show_default=True, help='Linhas por lote/transação')
+@click.option('--processos', default=1, show_default=True, help='Processos para validação')
+def importar_clientes(arquivo, formato, lote, processos):
+    """Importa clientes em massa de um arquivo CSV ou JSON/NDJSON"""
+    import time
+    from app import importacao
+
+    inicio = time.perf_counter()
+    with open(arquivo, encoding='utf-8-sig', newline='') as texto:
+        registros = importacao.abrir_registros(texto, formato, arquivo)
+        resultado = importacao.importar_clientes(registros, lote, processos)
+    duracao = time.perf_counter() - inicio
+    if resultado.importados:
+        # Só alcança outros processos com backend compartilhado (CACHE_TIPO=redis)
+        invalidar('clientes')
+
+    for erro in resultado.erros:
+        mensagens = '; '.join(f"{campo}: {', '.join(m)}" for campo, m in erro['erros'].items())
+        click.echo(f"   linha {erro['linha']}: {mensagens}")
+    if resultado.total_erros > len(resultado.erros):
+        click.echo(f"   ... e mais {resultado.total_erros - len(resultado.erros)} linhas com erro")
+    click.echo(f"✅ {resultado.importados} clientes importados, {resultado.total_erros} linhas com erro "
+               f"({resultado.importados / duracao:.0f} linhas/s)")
+
+
+@click.command('trabalhador')
+@click.option('--concorrencia', type=int, default=None, help='Threads (padrão: TAREFAS_CONCORRENCIA)')
+@click.option('--intervalo', type=float, default=None, help='Segundos entre consultas à fila vazia')
+@click.option('--ate-esvaziar', is_flag=True, help='Sai quando não houver mais tarefas pendentes (cron)')
+def trabalhador(concorrencia, intervalo, ate_esvaziar):
+    """Executa as tarefas em segundo plano da fila no banco (Ctrl+C / SIGTERM para parar)"""
+    from flask import current_app
+    from app.tarefas import Trabalhador
+
+    processo = Trabalhador(current_app._get_current_object(), concorrencia, intervalo, ate_esvaziar)
+    click.echo(f"✅ Trabalhador {processo.nome} com {processo.concorrencia} threads")
+    processo.executar()
+    click.echo("✅ Trabalhador encerrado")
+
+
+@click.command('enfileirar')
+@click.argument('tipo')
+@click.option('--parametro', '-p', multiple=True, help='chave=valor (repetível)')
+def enfileirar(tipo, parametro):
+    """Enfileira uma tarefa em segundo plano (ex.: flask enfileirar popular_banco)"""
+    from app import tarefas
+
+    parametros = dict(item.split('=', 1) for item in parametro)
+    try:
+        tarefa = tarefas.enfileirar(tipo, parametros)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    db.session.commit()
+    click.echo(f"✅ Tarefa #{tarefa.id} ({tipo}) enfileirada")
+
+
+def init_app(app):
+    """Registra os comandos no CLI do Flask"""
+    app.cli.add_command(init_db)
+    app.cli.add_command(reindexar_busca)
+    app.cli.add_command(criar_indices)
+    app.cli.add_command(recalcular_contadores)
+    app.cli.add_command(reconstruir_resumos)
+    app.cli.add_command(importar_clientes)
+    app.cli.add_command(normalizar_telefones)
+    app.cli.add_command(duplicados)
+    app.cli.add_command(migrar_itens)
+    app.cli.add_command(trabalhador)
+    app.cli.add_command(enfileirar)
@@ -0,0 +1,89 @@
+import hashlib
+import os
+from datetime import timezone
+from functools import wraps
+
+from flask import abort, current_app, make_response, request, session
+from flask.globals import request_ctx
+
+
+# GET condicional (ETag / Last-Modified) a partir da coluna `versao`.
+#
+# A rota declara uma função que busca só a versão e a data de atualização
+# (uma consulta pela chave primária). Se o cliente HTTP já tem essa versão,
+# a resposta é 304 sem executar a rota, sem tocar no cache de respostas e
+# sem carregar interações/cotações/pedidos. Com mensagem flash pendente na
+# sessão a página é sempre renderizada (um 304 a esconderia).
+
+
+def _assinatura_codigo():
+    """Hash do código e dos templates: um deploy novo muda todas as ETags"""
+    raiz = os.path.dirname(os.path.abspath(__file__))
+    resumo = hashlib.sha1()
+    for pasta, _, arquivos in sorted(os.walk(raiz)):
+        for nome in sorted(arquivos):
+            if nome.endswith(('.py', '.html')):
+                with open(os.path.join(pasta, nome), 'rb') as arquivo:
+                    resumo.update(arquivo.read())
+    return resumo.hexdigest()[:10]
+
+
+ASSINATURA = _assinatura_codigo()
+
+
+def _utc(data):
+    # Datas são gravadas em UTC sem fuso; HTTP tem resolução de segundos
+    return data.replace(tzinfo=timezone.utc, microsecond=0) if data else None
+
+
+def nao_modificado(etag, atualizado_em):
+    """True se If-None-Match/If-Modified-Since já cobrem esta versão"""
+    if request.if_none_match:
+        # If-None-Match usa comparação fraca (RFC 9110 13.1.2)
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and atualizado_em:
+        return _utc(atualizado_em) <= request.if_modified_since
+    return False
+
+
+def condicional(buscar_versao, fraco=False):
+    """Responde 304 quando o cliente HTTP já tem a versão atual.
+
+    buscar_versao(**kwargs_da_rota) retorna (chave, versao, atualizado_em)
+    ou None (404). Respostas fracas (W/) servem para páginas que não são
+    idênticas byte a byte entre renderizações (ex.: com token CSRF).
+    """
+    def decorador(view):
+        @wraps(view)
+        def envolvida(*args, **kwargs):
+            atual = buscar_versao(**kwargs)
+            if atual is None:
+                abort(404)
+            chave, versao, atualizado_em = atual
+            etag = f'{ASSINATURA}-{chave}-v{versao}'
+
+            # Com mensagem flash pendente (escrita que não mudou a versão, ex.:
+            # status inválido) a página é renderizada para exibi-la
+            if nao_modificado(etag, atualizado_em) and not session.get('_flashes'):
+                resposta = current_app.response_class(status=304)
+            else:
+                resposta = make_response(view(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+                if request_ctx.flashes:
+                    # Exibiu as mensagens: sem ETag, para o navegador não
+                    # guardar a página com elas
+                    resposta.headers['Cache-Control'] = 'private, no-cache'
+                    return resposta
+                if nao_modificado(etag, atualizado_em):
+                    # A rota não exibe mensagens (ex.: JSON): vale o 304
+                    resposta = current_app.response_class(status=304)
+
+            resposta.set_etag(etag, weak=fraco)
+            if atualizado_em:
+                resposta.last_modified = _utc(atualizado_em)
+            # O navegador pode guardar, mas revalida a cada uso
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return envolvida
+    return decorador
@@ -0,0 +1,167 @@
+from sqlalchemy import event, func, insert, select, text, true
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Cliente, Contador, Cotacao, Pedido
+
+
+# Contadores do dashboard guardados na tabela `contadores`.
+#
+# As rotas de escrita ajustam os valores na mesma transação da mudança
+# (ajustar / ajustar_status), então o dashboard lê tudo com um único SELECT
+# por chave primária. Se faltar algum contador (banco novo, tabela recriada)
+# o caminho frio calcula os que faltam com uma única consulta agregada.
+#
+# Cada contador é uma linha só, disputada por todas as escritas: o UPDATE
+# trava a linha até o fim da transação. Por isso ajustar() só acumula o
+# delta na sessão, e os deltas da transação viram um UPDATE por contador no
+# commit, em ordem de nome (a trava dura só o COMMIT, e duas transações
+# nunca travam os mesmos contadores em ordens opostas). Um rollback descarta
+# os deltas junto com a mudança.
+#
+# O caminho frio não apaga linhas, só cria as que faltam, mas uma escrita
+# que termine entre o cálculo e a criação da linha não entra na conta (o
+# UPDATE dela não encontrou a linha). Contadores que divergirem por isso ou
+# por cargas feitas fora do sistema se corrigem com `flask
+# recalcular-contadores`, o caminho de reparo suportado (de preferência sem
+# escritas em andamento: ele regrava todos os valores).
+
+CLIENTES_ATIVOS = 'clientes:ativos'
+COTACOES = 'cotacoes'
+PEDIDOS = 'pedidos'
+
+
+def chave_status(tabela, status):
+    """Nome do contador de um status ('cotacoes:Enviada', 'pedidos:Pendente')"""
+    return f'{tabela}:{status}'
+
+
+CONTADORES_DASHBOARD = (
+    CLIENTES_ATIVOS,
+    COTACOES,
+    chave_status(COTACOES, 'Enviada'),
+    chave_status(COTACOES, 'Aprovada'),
+    PEDIDOS,
+    chave_status(PEDIDOS, 'Pendente'),
+)
+
+
+# ==================== CAMINHO FRIO ====================
+
+def calcular_contadores():
+    """Calcula os contadores do dashboard em uma única ida ao banco"""
+    clientes = select(
+        func.count().filter(Cliente.ativo.is_(True)).label('ativos'),
+    ).subquery()
+    cotacoes = select(
+        func.count().label('total'),
+        func.count().filter(Cotacao.status == 'Enviada').label('enviadas'),
+        func.count().filter(Cotacao.status == 'Aprovada').label('aprovadas'),
+    ).select_from(Cotacao).subquery()
+    pedidos = select(
+        func.count().label('total'),
+        func.count().filter(Pedido.status_entrega == 'Pendente').label('pendentes'),
+    ).select_from(Pedido).subquery()
+
+    linha = db.session.execute(select(
+        clientes.c.ativos,
+        cotacoes.c.total, cotacoes.c.enviadas, cotacoes.c.aprovadas,
+        pedidos.c.total, pedidos.c.pendentes,
+    ).select_from(
+        # Cada subconsulta devolve uma linha; o produto cruzado é intencional
+        clientes.join(cotacoes, true()).join(pedidos, true())
+    )).one()
+    return dict(zip(CONTADORES_DASHBOARD, (int(v or 0) for v in linha)))
+
+
+def recalcular_contadores():
+    """Recalcula e grava todos os contadores do dashboard (reparo: `flask recalcular-contadores`)"""
+    valores = calcular_contadores()
+    Contador.query.filter(Contador.nome.in_(valores)).delete(synchronize_session=False)
+    db.session.execute(insert(Contador), [
+        {'nome': nome, 'valor': valor} for nome, valor in valores.items()
+    ])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro worker gravou ao mesmo tempo; os valores dele também servem
+        db.session.rollback()
+    return valores
+
+
+def ler_contadores():
+    """Contadores do dashboard (calcula e cria os que ainda não existirem)"""
+    valores = dict(
+        db.session.query(Contador.nome, Contador.valor)
+        .filter(Contador.nome.in_(CONTADORES_DASHBOARD))
+        .all()
+    )
+    if len(valores) < len(CONTADORES_DASHBOARD):
+        # Só os que faltam: apagar os existentes perderia os incrementos
+        # das escritas em andamento
+        calculados = calcular_contadores()
+        faltando = {nome: valor for nome, valor in calculados.items() if nome not in valores}
+        db.session.execute(insert(Contador), [
+            {'nome': nome, 'valor': valor} for nome, valor in faltando.items()
+        ])
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker criou ao mesmo tempo; os valores dele também servem
+            db.session.rollback()
+        valores.update(faltando)
+    return valores
+
+
+# ==================== AJUSTES NAS ESCRITAS ====================
+
+_PENDENTES = 'contadores_pendentes'
+
+
+def ajustar(nome, delta=1):
+    """Soma delta ao contador no commit da transação atual"""
+    sessao = db.session()
+    if not sessao.in_transaction():
+        # Abre a transação (sem ir ao banco) para um rollback descartar o delta
+        sessao.begin()
+    pendentes = sessao.info.setdefault(_PENDENTES, {})
+    pendentes[nome] = pendentes.get(nome, 0) + delta
+
+
+@event.listens_for(db.session, 'before_commit')
+def _gravar_pendentes(session):
+    """Um UPDATE por contador com delta, em ordem de nome, logo antes do COMMIT"""
+    pendentes = session.info.pop(_PENDENTES, None)
+    linhas = [{'nome': nome, 'delta': delta} for nome, delta in sorted((pendentes or {}).items()) if delta]
+    if linhas:
+        session.execute(text("UPDATE contadores SET valor = valor + :delta WHERE nome = :nome"), linhas)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _descartar_pendentes(session, transacao):
+    session.info.pop(_PENDENTES, None)
+
+
+def ajustar_status(tabela, antigo, novo):
+    """Move uma unidade do contador do status antigo para o novo"""
+    if antigo == novo:
+        return
+    if antigo:
+        ajustar(chave_status(tabela, antigo), -1)
+    if novo:
+        ajustar(chave_status(tabela, novo), +1)
+
+
+def mover_status(tabela, antigos, novo):
+    """ajustar_status para um lote: antigos = {status anterior: quantidade}"""
+    deltas = {}
+    for antigo, quantidade in antigos.items():
+        if antigo == novo:
+            continue
+        if antigo:
+            deltas[antigo] = deltas.get(antigo, 0) - quantidade
+        if novo:
+            deltas[novo] = deltas.get(novo, 0) + quantidade
+    for status, delta in deltas.items():
+        if delta:
+            ajustar(chave_status(tabela, status), delta)
@@ -1,63 +1,251 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, abort, render_template, request, redirect, url_for, flash, jsonify, current_app, Response, stream_with_context
 from app import db
-from app.models import Cliente, Interacao, Cotacao, Pedido
-from app.forms import ClienteForm, InteracaoForm, CotacaoForm, PedidoForm, StatusEntregaForm
-from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from app.models import Cliente, Interacao, Cotacao, Pedido, ItemCotacao, ItemPedido, Tarefa
+from app.paginacao import PaginacaoCursor, paginar_cursor
+from app.busca import buscar_clientes, buscar_por_telefone, ResultadoBusca
+from app import contadores, resumos
+from app.exportacao import gerar_ndjson, gerar_json_array, gerar_csv, gerar_xlsx
+from app import importacao, duplicados, itens, analise, tarefas, em_massa
+from app.orcamento import orcamento
+from app.cache import cache_resposta, invalidar, invalidar_tudo
+from app.condicional import condicional
+from datetime import date, datetime, timedelta
+import csv
+import io
+import time
+from hashlib import sha1
+from sqlalchemy import func, select, true
+from sqlalchemy.orm import joinedload, selectinload
 
 # Cria o Blueprint principal
 main_bp = Blueprint('main', __name__)
 
 
+# ==================== FILTROS E EXPORTAÇÃO ====================
+
+def _data_param(valor):
+    return datetime.strptime(valor, '%Y-%m-%d')
+
+
+def _filtrar_periodo(query, coluna):
+    """Aplica ?inicio= e ?fim= (AAAA-MM-DD, ambos inclusivos); datas inválidas são ignoradas"""
+    inicio = request.args.get('inicio', type=_data_param)
+    fim = request.args.get('fim', type=_data_param)
+    if inicio:
+        query = query.where(coluna >= inicio)
+    if fim:
+        query = query.where(coluna < fim + timedelta(days=1))
+    return query
+
+
+# ==================== VERSÕES (GET CONDICIONAL) ====================
+
+def _versao_cliente(id):
+    """(chave, versão, atualizado_em) do cliente, numa consulta pela PK"""
+    linha = db.session.execute(
+        select(Cliente.versao, func.coalesce(Cliente.atualizado_em, Cliente.data_cadastro))
+        .where(Cliente.id == id)
+    ).first()
+    return (f'c{id}', *linha) if linha else None
+
+
+def _versao_api_cliente(id):
+    versao = _versao_cliente(id)
+    return ('api-' + versao[0], *versao[1:]) if versao else None
+
+
+def _versao_pedido(id):
+    """Versão do pedido + do cliente (a página mostra os dois)"""
+    linha = db.session.execute(
+        select(Pedido.versao, Cliente.versao,
+               func.coalesce(Pedido.atualizado_em, Pedido.data_criacao),
+               func.coalesce(Cliente.atualizado_em, Cliente.data_cadastro))
+        .join(Cliente, Cliente.id == Pedido.cliente_id)
+        .where(Pedido.id == id)
+    ).first()
+    if linha is None:
+        return None
+    versao_pedido, versao_cliente, pedido_em, cliente_em = linha
+    # A página tem formulário com token CSRF (válido por 1h): revalida por
+    # completo a cada 30 min para nunca servir um token vencido
+    janela = int(time.time() // 1800)
+    atualizado_em = max(filter(None, (pedido_em, cliente_em)), default=None)
+    return (f'p{id}-t{janela}', f'{versao_pedido}.{versao_cliente}', atualizado_em)
+
+
+def _marca_cursor():
+    cursor = request.args.get('cursor', '', type=str)
+    return sha1(cursor.encode('utf-8')).hexdigest()[:10] if cursor else 'inicio'
+
+
+def _versao_secao(id, secao):
+    """Versão do cliente (sobe a cada escrita nas seções) + página pedida"""
+    versao = _versao_cliente(id)
+    return (f'{versao[0]}-{secao}-{_marca_cursor()}', *versao[1:]) if versao else None
+
+
+def _versao_api_secao(id, secao):
+    versao = _versao_secao(id, secao)
+    return ('api-' + versao[0], *versao[1:]) if versao else None
+
+
+# ==================== ATUALIZAÇÃO EM LOTE ====================
+
+def _lote_status(campo_status):
+    """(ids, status, data_entrega_real) do formulário da lista ou do JSON da API"""
+    if request.is_json:
+        dados = request.get_json(silent=True) or {}
+        ids = dados.get('ids')
+        if not isinstance(ids, list):
+            raise ValueError('Informe "ids" como uma lista')
+    else:
+        dados = request.form
+        ids = request.form.getlist('ids')
+    data = dados.get('data_entrega_real') or None
+    if data is not None:
+        try:
+            data = date.fromisoformat(data)
+        except (TypeError, ValueError):
+            raise ValueError('Data de entrega real inválida (use AAAA-MM-DD)')
+    return ids, dados.get(campo_status, ''), data
+
+
+def _responder_lote(resultado, nome, voltar):
+    """Commit, invalidação e resposta (JSON para a API, flash + redirect para a lista)"""
+    db.session.commit()
+    if resultado.atualizados:
+        invalidar(nome, *(f'cliente:{id}' for id in resultado.clientes))
+    if request.is_json:
+        return jsonify(resultado.to_dict())
+    mensagem = f'{resultado.atualizados} {nome} atualizados'
+    if resultado.erros:
+        falhas = ', '.join(str(r['id']) for r in resultado.erros[:10])
+        mensagem += f'; {len(resultado.erros)} com erro ({falhas})'
+    flash(mensagem + '.', 'success' if not resultado.erros else 'warning')
+    return redirect(voltar)
+
+
+def _erro_lote(erro, voltar):
+    if request.is_json:
+        return jsonify({'erro': str(erro)}), 400
+    flash(str(erro), 'error')
+    return redirect(voltar)
+
+
+# ==================== SEÇÕES DO CLIENTE ====================
+
+# Cada seção da página do cliente é carregada sob demanda, uma página por
+# vez: (modelo, coluna de data da ordenação, template do fragmento)
+_SECOES_CLIENTE = {
+    'interacoes': (Interacao, Interacao.data_hora, 'clientes/secoes/interacoes.html'),
+    'cotacoes': (Cotacao, Cotacao.data_criacao, 'clientes/secoes/cotacoes.html'),
+    'pedidos': (Pedido, Pedido.data_criacao, 'clientes/secoes/pedidos.html'),
+}
+
+
+def _pagina_secao(id, secao):
+    """Página (cursor em data, id; mais recentes primeiro) de uma seção do cliente"""
+    modelo, coluna_data, _ = _SECOES_CLIENTE[secao]
+    # Sem contagem: os totais vêm do resumo da página do cliente
+    return PaginacaoCursor(
+        modelo.query.filter(modelo.cliente_id == id),
+        [coluna_data, modelo.id],
+        cursor=request.args.get('cursor', '', type=str),
+        per_page=current_app.config.get('ITEMS_PER_PAGE', 10),
+        descendente=True,
+        contagem=None,
+    )
+
+
+def _cliente_com_resumo(id):
+    """Cliente e os totais das seções numa única consulta agregada"""
+    interacoes = (select(func.count().label('total'),
+                         func.max(Interacao.data_hora).label('ultima'))
+                  .where(Interacao.cliente_id == id).subquery())
+    cotacoes = (select(func.count().label('total'),
+                       func.count().filter(Cotacao.status == 'Enviada').label('abertas'),
+                       func.coalesce(func.sum(Cotacao.valor_total), 0).label('valor'))
+                .where(Cotacao.cliente_id == id).subquery())
+    pedidos = (select(func.count().label('total'),
+                      func.count().filter(Pedido.status_entrega.notin_(('Entregue', 'Cancelado'))).label('pendentes'),
+                      func.coalesce(func.sum(Pedido.valor_final), 0).label('valor'))
+               .where(Pedido.cliente_id == id).subquery())
+
+    linha = db.session.execute(
+        select(Cliente,
+               interacoes.c.total, interacoes.c.ultima,
+               cotacoes.c.total, cotacoes.c.abertas, cotacoes.c.valor,
+               pedidos.c.total, pedidos.c.pendentes, pedidos.c.valor)
+        # Cada subconsulta devolve uma linha: junção sem condição
+        .select_from(Cliente)
+        .join(interacoes, true()).join(cotacoes, true()).join(pedidos, true())
+        .where(Cliente.id == id)
+    ).first()
+    if linha is None:
+        return None, None
+    cliente, *valores = linha
+    chaves = ('interacoes', 'ultima_interacao', 'cotacoes', 'cotacoes_abertas', 'valor_cotacoes',
+              'pedidos', 'pedidos_pendentes', 'valor_pedidos')
+    return cliente, dict(zip(chaves, valores))
+
+
+def _resposta_planilha(consulta, cabecalho, nome):
+    """Resposta em streaming no formato pedido em ?formato= (csv ou xlsx)"""
+    arquivo = f"{nome}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    if request.args.get('formato', 'csv', type=str) == 'xlsx':
+        return Response(
+            stream_with_context(gerar_xlsx(consulta, cabecalho, nome.capitalize())),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename={arquivo}.xlsx'}
+        )
+    return Response(
+        stream_with_context(gerar_csv(consulta, cabecalho)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={arquivo}.csv'}
+    )
+
+
 # ==================== ROTAS PRINCIPAIS ====================
 
 @main_bp.route('/')
+@orcamento(4)
+@cache_resposta('clientes', 'cotacoes', 'pedidos')
 def index():
     """Página inicial - Dashboard"""
     
-    # Estatísticas gerais
-    total_clientes = Cliente.query.filter_by(ativo=True).count()
-    total_cotacoes = Cotacao.query.count()
-    total_pedidos = Pedido.query.count()
-    
-    # Cotações por status
-    cotacoes_enviadas = Cotacao.query.filter_by(status='Enviada').count()
-    cotacoes_aprovadas = Cotacao.query.filter_by(status='Aprovada').count()
-    
-    # Pedidos pendentes
-    pedidos_pendentes = Pedido.query.filter_by(status_entrega='Pendente').count()
+    # Contadores mantidos pelas rotas de escrita (1 SELECT; 4 no caminho frio)
+    valores = contadores.ler_contadores()
     
     return render_template('index.html',
-        total_clientes=total_clientes,
-        total_cotacoes=total_cotacoes,
-        total_pedidos=total_pedidos,
-        cotacoes_enviadas=cotacoes_enviadas,
-        cotacoes_aprovadas=cotacoes_aprovadas,
-        pedidos_pendentes=pedidos_pendentes
+        total_clientes=valores[contadores.CLIENTES_ATIVOS],
+        total_cotacoes=valores[contadores.COTACOES],
+        total_pedidos=valores[contadores.PEDIDOS],
+        cotacoes_enviadas=valores[contadores.chave_status(contadores.COTACOES, 'Enviada')],
+        cotacoes_aprovadas=valores[contadores.chave_status(contadores.COTACOES, 'Aprovada')],
+        pedidos_pendentes=valores[contadores.chave_status(contadores.PEDIDOS, 'Pendente')]
     )
 
 
 # ==================== ROTAS DE CLIENTES ====================
 
 @main_bp.route('/clientes')
+@orcamento(2)
+@cache_resposta('clientes')
 def listar_clientes():
     """Lista todos os clientes"""
     
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '', type=str)
     
-    query = Cliente.query.filter_by(ativo=True)
-    
     if search:
-        query = query.filter(
-            (Cliente.nome.ilike(f'%{search}%')) |
-            (Cliente.email.ilike(f'%{search}%')) |
-            (Cliente.telefone.ilike(f'%{search}%'))
-        )
+        # Busca indexada (trigram/FTS), resultados ordenados por relevância
+        limite = current_app.config.get('BUSCA_LIMITE', 50)
+        clientes = ResultadoBusca(buscar_clientes(search, limite), limite)
+        return render_template('clientes/lista.html', clientes=clientes, search=search)
     
-    clientes = query.order_by(Cliente.nome).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    query = Cliente.query.filter_by(ativo=True)
+    
+    # Paginação por cursor em (nome, id): a página N custa o mesmo que a 1
+    clientes = paginar_cursor(query, [Cliente.nome, Cliente.id])
     
     return render_template('clientes/lista.html', clientes=clientes, search=search)
 
@@ -66,9 +254,16 @@ def listar_clientes():
 def novo_cliente():
     """Adiciona um novo cliente"""
     
+    from app.forms import ClienteForm
+    
     form = ClienteForm()
     
     if form.validate_on_submit():
+        # Cadastro parecido com outro: avisa e só grava quando o usuário confirmar
+        parecidos = None if request.form.get('ignorar_duplicados') else duplicados.candidatos_formulario(form)
+        if parecidos:
+            return render_template('clientes/novo.html', form=form, duplicados=parecidos)
+        
         cliente = Cliente(
             nome=form.nome.data,
             telefone=form.telefone.data,
@@ -81,7 +276,9 @@ def novo_cliente():
         )
         
         db.session.add(cliente)
+        contadores.ajustar(contadores.CLIENTES_ATIVOS, +1)
         db.session.commit()
+        invalidar('clientes')
         
         flash(f'Cliente {cliente.nome} cadastrado com sucesso!', 'success')
         return redirect(url_for('main.listar_clientes'))
@@ -89,27 +286,95 @@ def novo_cliente():
     return render_template('clientes/novo.html', form=form)
 
 
+@main_bp.route('/clientes/importar', methods=['GET', 'POST'])
+def importar_clientes():
+    """Importação em massa de clientes (CSV ou JSON)"""
+    
+    resultado = None
+    
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            flash('Selecione um arquivo CSV ou JSON!', 'error')
+            return redirect(url_for('main.importar_clientes'))
+        
+        # Arquivos grandes vão para a fila (flask trabalhador); a resposta é imediata
+        if (request.content_length or 0) > current_app.config['IMPORTACAO_SINCRONA_MAX_BYTES']:
+            tarefa = tarefas.enfileirar('importar_clientes', {'nome_arquivo': arquivo.filename},
+                                        anexo=arquivo.read())
+            db.session.commit()
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(tarefa.to_dict()), 202, {'Location': url_for('main.api_tarefa', id=tarefa.id)}
+            flash(f'Arquivo grande: importação enfileirada como tarefa #{tarefa.id}.', 'info')
+            return render_template('clientes/importar.html', tarefa=tarefa), 202
+        
+        # Lê o upload em streaming (o Werkzeug guarda arquivos grandes em disco)
+        texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig')
+        registros = importacao.abrir_registros(texto, nome_arquivo=arquivo.filename)
+        try:
+            resultado = importacao.importar_clientes(registros)
+        except (ValueError, csv.Error) as e:
+            flash(f'Arquivo inválido: {e}', 'error')
+            return redirect(url_for('main.importar_clientes'))
+        if resultado.importados:
+            invalidar('clientes')
+        
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify(resultado.to_dict())
+        flash(f'{resultado.importados} clientes importados, {resultado.total_erros} linhas com erro.',
+              'success' if not resultado.total_erros else 'warning')
+    
+    return render_template('clientes/importar.html', resultado=resultado)
+
+
+@tarefas.tarefa('importar_clientes', max_tentativas=1)
+def importar_clientes_em_segundo_plano(tarefa, progresso):
+    """Importa o arquivo anexado à tarefa; o progresso segue a posição no arquivo"""
+    
+    bruto = io.BytesIO(tarefa.anexo or b'')
+    tamanho = max(len(bruto.getbuffer()), 1)
+    texto = io.TextIOWrapper(bruto, encoding='utf-8-sig')
+    registros = importacao.abrir_registros(texto, nome_arquivo=tarefa.parametros.get('nome_arquivo', ''))
+    
+    def _lote_gravado(resultado):
+        progresso(100 * bruto.tell() / tamanho,
+                  f'{resultado.importados} importados, {resultado.total_erros} linhas com erro')
+    
+    resultado = importacao.importar_clientes(registros, progresso=_lote_gravado)
+    if resultado.importados:
+        # Só alcança os workers web com backend compartilhado (CACHE_TIPO=redis)
+        invalidar('clientes')
+    # Primeiras linhas com erro; o total vem à parte
+    return {'importados': resultado.importados, 'total_erros': resultado.total_erros,
+            'erros': resultado.erros[:200]}
+
+
 @main_bp.route('/clientes/<int:id>')
+@orcamento(2)
+@condicional(_versao_cliente)
+@cache_resposta('cliente:{id}')
 def detalhes_cliente(id):
     """Exibe detalhes de um cliente específico"""
     
-    cliente = Cliente.query.get_or_404(id)
-    
-    # Últimas interações
-    interacoes = cliente.interacoes.order_by(desc(Interacao.data_hora)).limit(10).all()
+    # Só o cliente e os totais; interações, cotações e pedidos são carregados
+    # pela página em fragmentos paginados (detalhes_cliente_secao), então o
+    # custo não cresce com o histórico da conta
+    cliente, resumo = _cliente_com_resumo(id)
+    if cliente is None:
+        abort(404)
     
-    # Cotações
-    cotacoes = cliente.cotacoes.order_by(desc(Cotacao.data_criacao)).all()
-    
-    # Pedidos
-    pedidos = cliente.pedidos.order_by(desc(Pedido.data_criacao)).all()
+    return render_template('clientes/detalhes.html', cliente=cliente, resumo=resumo)
+
+
+@main_bp.route('/clientes/<int:id>/<any(interacoes, cotacoes, pedidos):secao>')
+@orcamento(2)
+@condicional(_versao_secao)
+@cache_resposta('cliente:{id}')
+def detalhes_cliente_secao(id, secao):
+    """Fragmento HTML com uma página de interações, cotações ou pedidos do cliente"""
     
-    return render_template('clientes/detalhes.html',
-        cliente=cliente,
-        interacoes=interacoes,
-        cotacoes=cotacoes,
-        pedidos=pedidos
-    )
+    pagina = _pagina_secao(id, secao)
+    return render_template(_SECOES_CLIENTE[secao][2], cliente_id=id, secao=secao, pagina=pagina)
 
 
 @main_bp.route('/clientes/<int:id>/editar', methods=['GET', 'POST'])
@@ -117,9 +382,18 @@ def editar_cliente(id):
     """Edita um cliente existente"""
     
     cliente = Cliente.query.get_or_404(id)
+    from app.forms import ClienteForm
+    
     form = ClienteForm(obj=cliente)
     
     if form.validate_on_submit():
+        parecidos = (None if request.form.get('ignorar_duplicados')
+                     else duplicados.candidatos_formulario(form, cliente.id))
+        if parecidos:
+            return render_template('clientes/editar.html', form=form, cliente=cliente, duplicados=parecidos)
+        
+        resumos.mudar_segmento_cliente(cliente.id, (cliente.canal_vendas, cliente.area_atuacao),
+                                       (form.canal_vendas.data, form.area_atuacao.data))
         cliente.nome = form.nome.data
         cliente.telefone = form.telefone.data
         cliente.email = form.email.data
@@ -130,6 +404,7 @@ def editar_cliente(id):
         cliente.endereco = form.endereco.data
 
         db.session.commit()
+        invalidar('clientes', f'cliente:{cliente.id}')
         
         flash(f'Cliente {cliente.nome} atualizado com sucesso!', 'success')
         return redirect(url_for('main.detalhes_cliente', id=cliente.id))
@@ -142,8 +417,11 @@ def desativar_cliente(id):
     """Desativa um cliente (soft delete)"""
     
     cliente = Cliente.query.get_or_404(id)
-    cliente.ativo = False
+    if cliente.ativo:
+        cliente.ativo = False
+        contadores.ajustar(contadores.CLIENTES_ATIVOS, -1)
     db.session.commit()
+    invalidar('clientes', f'cliente:{cliente.id}')
     
     flash(f'Cliente {cliente.nome} desativado com sucesso!', 'info')
     return redirect(url_for('main.listar_clientes'))
@@ -156,6 +434,8 @@ def nova_interacao(cliente_id):
     """Registra nova interação com cliente"""
     
     cliente = Cliente.query.get_or_404(cliente_id)
+    from app.forms import InteracaoForm
+    
     form = InteracaoForm()
     
     if form.validate_on_submit():
@@ -170,6 +450,7 @@ def nova_interacao(cliente_id):
         
         db.session.add(interacao)
         db.session.commit()
+        invalidar('clientes', f'cliente:{cliente.id}')
         
         flash('Interação registrada com sucesso!', 'success')
         return redirect(url_for('main.detalhes_cliente', id=cliente.id))
@@ -180,22 +461,48 @@ def nova_interacao(cliente_id):
 # ==================== ROTAS DE COTAÇÕES ====================
 
 @main_bp.route('/cotacoes')
+@orcamento(2)
+@cache_resposta('cotacoes', 'clientes')
 def listar_cotacoes():
     """Lista todas as cotações"""
     
-    page = request.args.get('page', 1, type=int)
     status = request.args.get('status', '', type=str)
     
-    query = Cotacao.query
+    # Cliente carregado no mesmo SELECT (a lista mostra cotacao.cliente.nome)
+    query = Cotacao.query.options(joinedload(Cotacao.cliente))
     
     if status:
         query = query.filter_by(status=status)
+    query = _filtrar_periodo(query, Cotacao.data_criacao)
     
-    cotacoes = query.order_by(desc(Cotacao.data_criacao)).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    cotacoes = paginar_cursor(query, [Cotacao.data_criacao, Cotacao.id], descendente=True)
     
-    return render_template('cotacoes/lista.html', cotacoes=cotacoes, status=status)
+    # ?selecionar=1: caixas de seleção e formulário de status em lote
+    return render_template('cotacoes/lista.html', cotacoes=cotacoes, status=status,
+                           inicio=request.args.get('inicio', ''), fim=request.args.get('fim', ''),
+                           selecionar=request.args.get('selecionar', 0, type=int))
+
+
+@main_bp.route('/cotacoes/exportar')
+@orcamento(1)
+def exportar_cotacoes():
+    """Exporta as cotações filtradas em CSV ou XLSX"""
+    
+    status = request.args.get('status', '', type=str)
+    
+    # Só as colunas, lidas por cursor no servidor e escritas lote a lote
+    consulta = (select(Cotacao.id_cotacao, Cliente.nome, Cliente.empresa, Cotacao.data_criacao,
+                       Cotacao.valor_total, Cotacao.status, Cotacao.validade,
+                       Cotacao.itens, Cotacao.observacoes)
+                .join(Cliente, Cliente.id == Cotacao.cliente_id))
+    if status:
+        consulta = consulta.where(Cotacao.status == status)
+    consulta = _filtrar_periodo(consulta, Cotacao.data_criacao)
+    consulta = consulta.order_by(Cotacao.data_criacao.desc(), Cotacao.id.desc())
+    
+    cabecalho = ['ID Cotação', 'Cliente', 'Empresa', 'Data', 'Valor Total', 'Status',
+                 'Validade', 'Itens', 'Observações']
+    return _resposta_planilha(consulta, cabecalho, 'cotacoes')
 
 
 @main_bp.route('/clientes/<int:cliente_id>/cotacoes/nova', methods=['GET', 'POST'])
@@ -203,13 +510,17 @@ def nova_cotacao(cliente_id):
     """Cria nova cotação para cliente"""
     
     cliente = Cliente.query.get_or_404(cliente_id)
+    from app.forms import CotacaoForm
+    
     form = CotacaoForm()
     
     if form.validate_on_submit():
+        linhas, valor = itens.montar_linhas(form.itens.data, ItemCotacao)
         cotacao = Cotacao(
             cliente_id=cliente.id,
             itens=form.itens.data,
-            valor_total=form.valor_total.data,
+            linhas=linhas,
+            valor_total=valor if valor is not None else form.valor_total.data,
             validade=form.validade.data,
             observacoes=form.observacoes.data
         )
@@ -218,7 +529,11 @@ def nova_cotacao(cliente_id):
         cliente.ultimo_contato = datetime.now().date()
         
         db.session.add(cotacao)
+        contadores.ajustar(contadores.COTACOES, +1)
+        contadores.ajustar_status(contadores.COTACOES, None, 'Enviada')
+        resumos.registrar_cotacao(cotacao)
         db.session.commit()
+        invalidar('cotacoes', 'clientes', f'cliente:{cliente.id}')
         
         flash(f'Cotação {cotacao.id_cotacao} criada com sucesso!', 'success')
         return redirect(url_for('main.detalhes_cliente', id=cliente.id))
@@ -228,26 +543,65 @@ def nova_cotacao(cliente_id):
 
 @main_bp.route('/cotacoes/<int:id>/converter', methods=['POST'])
 def converter_cotacao_pedido(id):
-    """Converte uma cotação em pedido"""
+    """Converte uma cotação em pedido (uma segunda conversão não cria outro pedido)"""
     
     cotacao = Cotacao.query.get_or_404(id)
+    resultado = em_massa.converter_cotacoes([cotacao.id])
+    db.session.commit()
     
-    # Atualiza status da cotação
-    cotacao.status = 'Aprovada'
+    if resultado.erros:
+        # Ex.: o id PED-00N já pertence a um pedido de outra cotação
+        flash(f"Não foi possível converter a cotação: {resultado.erros[0]['erro']}.", 'error')
+    elif resultado.pedidos(criados=True):
+        invalidar('cotacoes', 'pedidos', f'cliente:{cotacao.cliente_id}')
+        flash(f'Cotação convertida em pedido {resultado.pedidos(criados=True)[0]} com sucesso!', 'success')
+    else:
+        flash(f'Cotação já convertida no pedido {resultado.pedidos(criados=False)[0]}.', 'info')
+    return redirect(url_for('main.detalhes_cliente', id=cotacao.cliente_id))
+
+
+@main_bp.route('/cotacoes/converter', methods=['POST'])
+@main_bp.route('/api/cotacoes/converter', methods=['POST'])
+def converter_cotacoes():
+    """Converte várias cotações em pedidos numa transação.
+
+    JSON: {"ids": [...]} ou, para um contrato de fornecimento mensal, um
+    pedido por mês: {"cotacao_id": 7, "inicio": "2024-08", "meses": 3, "dia": 5}.
+    Repetir a chamada não duplica pedidos; a resposta traz os id_pedido criados.
+    """
     
-    # Cria o pedido
-    pedido = Pedido(
-        cliente_id=cotacao.cliente_id,
-        cotacao_id=cotacao.id,
-        itens=cotacao.itens,
-        valor_final=cotacao.valor_total
-    )
+    voltar = url_for('main.listar_cotacoes', status=request.form.get('filtro') or None, selecionar=1)
+    dados = (request.get_json(silent=True) or {}) if request.is_json else request.form
+    try:
+        if dados.get('cotacao_id') is not None:
+            try:
+                inicio = datetime.strptime(str(dados.get('inicio', '')), '%Y-%m').date()
+                meses, dia = int(dados.get('meses') or 1), int(dados.get('dia') or 5)
+            except (TypeError, ValueError):
+                raise ValueError('Informe inicio (AAAA-MM), meses e dia do fornecimento mensal')
+            resultado = em_massa.converter_mensal(dados['cotacao_id'], inicio, meses, dia)
+        else:
+            ids = dados.get('ids') if request.is_json else request.form.getlist('ids')
+            if not isinstance(ids, list):
+                raise ValueError('Informe "ids" como uma lista')
+            resultado = em_massa.converter_cotacoes(ids)
+    except ValueError as e:
+        return _erro_lote(e, voltar)
     
-    db.session.add(pedido)
     db.session.commit()
-    
-    flash(f'Cotação convertida em pedido {pedido.id_pedido} com sucesso!', 'success')
-    return redirect(url_for('main.detalhes_cliente', id=cotacao.cliente_id))
+    criados = resultado.pedidos(criados=True)
+    if criados:
+        invalidar('cotacoes', 'pedidos', *(f'cliente:{id}' for id in resultado.clientes))
+    if request.is_json:
+        return jsonify(resultado.to_dict()), 201 if criados else 200
+    mensagem = f'{len(criados)} pedidos criados'
+    existentes = resultado.pedidos(criados=False)
+    if existentes:
+        mensagem += f', {len(existentes)} já existiam'
+    if resultado.erros:
+        mensagem += f'; {len(resultado.erros)} cotações com erro'
+    flash(mensagem + '.', 'success' if not resultado.erros else 'warning')
+    return redirect(voltar)
 
 
 @main_bp.route('/cotacoes/<int:id>/status', methods=['POST'])
@@ -258,8 +612,11 @@ def atualizar_status_cotacao(id):
     novo_status = request.form.get('status')
     
     if novo_status in ['Enviada', 'Aprovada', 'Recusada']:
+        contadores.ajustar_status(contadores.COTACOES, cotacao.status, novo_status)
+        resumos.mudar_status_cotacao(cotacao, cotacao.status, novo_status)
         cotacao.status = novo_status
         db.session.commit()
+        invalidar('cotacoes', f'cliente:{cotacao.cliente_id}')
         flash('Status da cotação atualizado!', 'success')
     else:
         flash('Status inválido!', 'error')
@@ -267,25 +624,65 @@ def atualizar_status_cotacao(id):
     return redirect(url_for('main.detalhes_cliente', id=cotacao.cliente_id))
 
 
+@main_bp.route('/cotacoes/status', methods=['POST'])
+@main_bp.route('/api/cotacoes/status', methods=['POST'])
+def atualizar_status_cotacoes():
+    """Atualiza o status de várias cotações: {"ids": [...], "status": "Recusada"}"""
+    
+    voltar = url_for('main.listar_cotacoes', status=request.form.get('filtro') or None, selecionar=1)
+    try:
+        ids, status, _ = _lote_status('status')
+        resultado = em_massa.atualizar_status_cotacoes(ids, status)
+    except ValueError as e:
+        return _erro_lote(e, voltar)
+    return _responder_lote(resultado, 'cotacoes', voltar)
+
+
 # ==================== ROTAS DE PEDIDOS ====================
 
 @main_bp.route('/pedidos')
+@orcamento(2)
+@cache_resposta('pedidos', 'clientes')
 def listar_pedidos():
     """Lista todos os pedidos"""
     
-    page = request.args.get('page', 1, type=int)
     status = request.args.get('status', '', type=str)
     
-    query = Pedido.query
+    # Cliente carregado no mesmo SELECT (a lista mostra pedido.cliente.nome)
+    query = Pedido.query.options(joinedload(Pedido.cliente))
     
     if status:
         query = query.filter_by(status_entrega=status)
+    query = _filtrar_periodo(query, Pedido.data_criacao)
     
-    pedidos = query.order_by(desc(Pedido.data_criacao)).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    pedidos = paginar_cursor(query, [Pedido.data_criacao, Pedido.id], descendente=True)
     
-    return render_template('pedidos/lista.html', pedidos=pedidos, status=status)
+    # ?selecionar=1: caixas de seleção e formulário de status em lote
+    return render_template('pedidos/lista.html', pedidos=pedidos, status=status,
+                           inicio=request.args.get('inicio', ''), fim=request.args.get('fim', ''),
+                           selecionar=request.args.get('selecionar', 0, type=int))
+
+
+@main_bp.route('/pedidos/exportar')
+@orcamento(1)
+def exportar_pedidos():
+    """Exporta os pedidos filtrados em CSV ou XLSX"""
+    
+    status = request.args.get('status', '', type=str)
+    
+    # Só as colunas, lidas por cursor no servidor e escritas lote a lote
+    consulta = (select(Pedido.id_pedido, Cliente.nome, Cliente.empresa, Pedido.data_criacao,
+                       Pedido.valor_final, Pedido.status_entrega, Pedido.data_entrega_prevista,
+                       Pedido.data_entrega_real, Pedido.itens, Pedido.observacoes)
+                .join(Cliente, Cliente.id == Pedido.cliente_id))
+    if status:
+        consulta = consulta.where(Pedido.status_entrega == status)
+    consulta = _filtrar_periodo(consulta, Pedido.data_criacao)
+    consulta = consulta.order_by(Pedido.data_criacao.desc(), Pedido.id.desc())
+    
+    cabecalho = ['ID Pedido', 'Cliente', 'Empresa', 'Data do Pedido', 'Valor Final',
+                 'Status de Entrega', 'Entrega Prevista', 'Entrega Real', 'Itens', 'Observações']
+    return _resposta_planilha(consulta, cabecalho, 'pedidos')
 
 
 @main_bp.route('/pedidos/novo', methods=['GET', 'POST'])
@@ -305,16 +702,24 @@ def novo_pedido():
             flash('Por favor, selecione um cliente!', 'error')
             return render_template('pedidos/novo.html', form=form, clientes=clientes)
         
+        linhas, valor = itens.montar_linhas(form.itens.data, ItemPedido)
         pedido = Pedido(
             cliente_id=int(cliente_id),
             itens=form.itens.data,
-            valor_final=form.valor_final.data,
+            linhas=linhas,
+            valor_final=valor if valor is not None else form.valor_final.data,
             data_entrega_prevista=form.data_entrega_prevista.data,
             observacoes=form.observacoes.data
         )
         
         db.session.add(pedido)
+        contadores.ajustar(contadores.PEDIDOS, +1)
+        contadores.ajustar_status(contadores.PEDIDOS, None, 'Pendente')
+        canal, area = (db.session.query(Cliente.canal_vendas, Cliente.area_atuacao)
+                       .filter_by(id=pedido.cliente_id).first() or (None, None))
+        resumos.registrar_pedido(pedido, canal, area)
         db.session.commit()
+        invalidar('pedidos', f'cliente:{pedido.cliente_id}')
         
         flash(f'Pedido {pedido.id_pedido} criado com sucesso!', 'success')
         return redirect(url_for('main.listar_pedidos'))
@@ -323,10 +728,14 @@ def novo_pedido():
 
 
 @main_bp.route('/pedidos/<int:id>')
+@orcamento(3)
+@condicional(_versao_pedido, fraco=True)
 def detalhes_pedido(id):
     """Exibe detalhes de um pedido"""
     
-    pedido = Pedido.query.get_or_404(id)
+    pedido = Pedido.query.options(joinedload(Pedido.cliente), selectinload(Pedido.linhas)).get_or_404(id)
+    from app.forms import StatusEntregaForm
+    
     form = StatusEntregaForm(obj=pedido)
     
     return render_template('pedidos/detalhes.html', pedido=pedido, form=form)
@@ -337,87 +746,194 @@ def atualizar_status_pedido(id):
     """Atualiza status de entrega de um pedido"""
     
     pedido = Pedido.query.get_or_404(id)
+    from app.forms import StatusEntregaForm
+    
     form = StatusEntregaForm()
     
     if form.validate_on_submit():
+        contadores.ajustar_status(contadores.PEDIDOS, pedido.status_entrega, form.status_entrega.data)
+        resumos.mudar_status_pedido(pedido.status_entrega, form.status_entrega.data, pedido)
         pedido.status_entrega = form.status_entrega.data
         if form.data_entrega_real.data:
             pedido.data_entrega_real = form.data_entrega_real.data
         
         db.session.commit()
+        invalidar('pedidos', f'cliente:{pedido.cliente_id}')
         flash('Status de entrega atualizado!', 'success')
     
     return redirect(url_for('main.detalhes_pedido', id=pedido.id))
 
 
+@main_bp.route('/pedidos/status', methods=['POST'])
+@main_bp.route('/api/pedidos/status', methods=['POST'])
+def atualizar_status_pedidos():
+    """Atualiza o status de entrega de vários pedidos num só UPDATE.
+
+    JSON: {"ids": [...], "status_entrega": "Entregue", "data_entrega_real": "2024-05-02"};
+    a resposta traz o resultado de cada id.
+    """
+    
+    voltar = url_for('main.listar_pedidos', status=request.form.get('filtro') or None, selecionar=1)
+    try:
+        ids, status, data_entrega_real = _lote_status('status_entrega')
+        resultado = em_massa.atualizar_status_pedidos(ids, status, data_entrega_real)
+    except ValueError as e:
+        return _erro_lote(e, voltar)
+    return _responder_lote(resultado, 'pedidos', voltar)
+
+
 # ==================== ROTAS DE RELATÓRIOS ====================
 
 @main_bp.route('/relatorios')
+@orcamento(4)
 def relatorios():
     """Dashboard de relatórios"""
     
-    # Vendas por canal
-    vendas_por_canal = db.session.query(
-        Cliente.canal_vendas,
-        func.count(Pedido.id).label('total_pedidos'),
-        func.sum(Pedido.valor_final).label('valor_total')
-    ).join(Pedido).group_by(Cliente.canal_vendas).all()
-    
-    # Top 10 clientes por valor de pedidos
-    top_clientes = db.session.query(
-        Cliente.nome,
-        func.sum(Pedido.valor_final).label('valor_total')
-    ).join(Pedido).group_by(Cliente.id).order_by(desc('valor_total')).limit(10).all()
-    
-    # Pedidos por status
-    pedidos_por_status = db.session.query(
-        Pedido.status_entrega,
-        func.count(Pedido.id).label('total')
-    ).group_by(Pedido.status_entrega).all()
-    
-    return render_template('relatorios/dashboard.html',
-        vendas_por_canal=vendas_por_canal,
-        top_clientes=top_clientes,
-        pedidos_por_status=pedidos_por_status
-    )
+    # Vendas por canal, top 10 clientes, pedidos por status e por mês
+    # vêm das tabelas de resumo mantidas pelas rotas de pedidos
+    return render_template('relatorios/dashboard.html', **resumos.ler_resumos())
 
 
 # ==================== API JSON (opcional) ====================
 
+@main_bp.route('/api/relatorios/analise')
+@orcamento(2)
+@cache_resposta('pedidos', 'cotacoes', 'clientes', ttl=300)
+def api_analise():
+    """Receita, ticket médio, canal/área e funil por mês local (?meses=12 ou ?inicio=&fim=)"""
+    
+    return jsonify(analise.analisar(
+        inicio=request.args.get('inicio', type=_data_param),
+        fim=request.args.get('fim', type=_data_param),
+        meses=request.args.get('meses', analise.MESES_PADRAO, type=int),
+    ))
+
+
+@main_bp.route('/api/relatorios/produtos')
+@orcamento(1)
+def api_vendas_por_produto():
+    """Quantidade e valor vendidos por produto (?produto=aco&inicio=2024-07-01&fim=2024-09-30)"""
+    
+    return jsonify(itens.vendas_por_produto(
+        inicio=request.args.get('inicio', type=_data_param),
+        fim=request.args.get('fim', type=_data_param),
+        produto=request.args.get('produto', '', type=str),
+        limite=min(request.args.get('limite', 50, type=int), 500),
+    ))
+
+
 @main_bp.route('/api/clientes')
+@orcamento(1)
 def api_clientes():
-    """Retorna lista de clientes em JSON"""
+    """Retorna lista de clientes em JSON (array) ou NDJSON, em streaming"""
+    
+    # Só as colunas, sem montar entidades do ORM, lidas por cursor no servidor
+    campos = Cliente.CAMPOS_API
+    consulta = (select(*[getattr(Cliente, campo) for campo in campos])
+                .where(Cliente.ativo.is_(True))
+                .order_by(Cliente.id))
+    
+    formato = request.args.get('formato', '', type=str)
+    if formato == 'ndjson' or (not formato and request.accept_mimetypes.best == 'application/x-ndjson'):
+        return Response(stream_with_context(gerar_ndjson(consulta, campos)),
+                        mimetype='application/x-ndjson')
     
-    clientes = Cliente.query.filter_by(ativo=True).all()
+    return Response(stream_with_context(gerar_json_array(consulta, campos)),
+                    mimetype='application/json')
+
+
+@main_bp.route('/api/clientes/por-telefone')
+@orcamento(2)
+def api_clientes_por_telefone():
+    """Clientes (ativos ou não) com o telefone em ?numero= (ex.: identificador de chamadas)"""
+    
+    numero = request.args.get('numero', '', type=str)
+    clientes = buscar_por_telefone(numero, apenas_ativos=False)
     return jsonify([cliente.to_dict() for cliente in clientes])
 
 
+@main_bp.route('/api/metricas/pool')
+@orcamento(0)
+def api_metricas_pool():
+    """Espera por conexão e ocupação do pool do banco (deste worker)"""
+    
+    from app import pool
+    opcoes = current_app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    return jsonify(pool.metricas.to_dict(db.engine, pool.capacidade(opcoes)))
+
+
+@main_bp.route('/api/metricas/perfil')
+@orcamento(0)
+def api_metricas_perfil():
+    """Tempo, comandos SQL e N+1 por endpoint das requisições medidas (deste worker)"""
+    
+    from app import perfil
+    return jsonify(perfil.estatisticas.to_dict())
+
+
+@main_bp.route('/api/tarefas')
+@orcamento(1)
+def api_tarefas():
+    """Tarefas em segundo plano mais recentes (?status=Pendente&tipo=importar_clientes)"""
+    
+    consulta = Tarefa.query.order_by(Tarefa.id.desc())
+    for campo in ('status', 'tipo'):
+        valor = request.args.get(campo, '', type=str)
+        if valor:
+            consulta = consulta.filter(getattr(Tarefa, campo) == valor)
+    limite = min(request.args.get('limite', 50, type=int), 200)
+    return jsonify([tarefa.to_dict() for tarefa in consulta.limit(limite)])
+
+
+@main_bp.route('/api/tarefas/<int:id>')
+@orcamento(1)
+def api_tarefa(id):
+    """Status, progresso e resultado de uma tarefa em segundo plano"""
+    
+    return jsonify(Tarefa.query.get_or_404(id).to_dict())
+
+
 @main_bp.route('/api/clientes/<int:id>')
+@orcamento(2)
+@condicional(_versao_api_cliente)
 def api_cliente_detalhes(id):
     """Retorna detalhes de um cliente em JSON"""
     
     cliente = Cliente.query.get_or_404(id)
     return jsonify(cliente.to_dict())
 
+
+@main_bp.route('/api/clientes/<int:id>/<any(interacoes, cotacoes, pedidos):secao>')
+@orcamento(2)
+@condicional(_versao_api_secao)
+def api_cliente_secao(id, secao):
+    """Uma página de interações, cotações ou pedidos do cliente em JSON"""
+    
+    pagina = _pagina_secao(id, secao)
+    return jsonify({
+        'itens': [item.to_dict() for item in pagina.items],
+        'proximo_cursor': pagina.next_cursor,
+        'cursor_anterior': pagina.prev_cursor,
+    })
+
 # ==================================================
 # ROTA DEFINITIVA - USA SEU models.py ATUAL
 # Cole este código no FINAL do arquivo app/controllers.py
 # Substitua qualquer rota /admin/popular-banco anterior
 # ==================================================
 
-@main_bp.route('/admin/popular-banco')
-def popular_banco():
-    """Popula banco usando a estrutura CORRETA do models.py"""
-    from flask import render_template_string
-    from datetime import datetime
+@tarefas.tarefa('popular_banco', max_tentativas=1)
+def popular_dados_exemplo(tarefa, progresso):
+    """Recria as tabelas com os dados de exemplo (tarefa em segundo plano)"""
     
-    try:
-        # Recriar estrutura
-        db.drop_all()
-        db.create_all()
-        
-        # Inserir clientes - NOMES DE TABELA CORRETOS (PLURAL)
-        sql_clientes = """
+    # Recriar estrutura; a tabela de tarefas fica (esta tarefa está nela)
+    progresso(10, 'Recriando tabelas')
+    tabelas = [tabela for tabela in db.metadata.sorted_tables if tabela.name != Tarefa.__tablename__]
+    db.metadata.drop_all(db.engine, tables=tabelas)
+    db.create_all()
+    
+    # Inserir clientes - NOMES DE TABELA CORRETOS (PLURAL)
+    sql_clientes = """
 INSERT INTO clientes (nome, telefone, email, limite_credito, area_atuacao, canal_vendas, endereco, data_cadastro, ultimo_contato, ativo) VALUES
 ('Tech Solutions Ltda', '(11) 98765-4321', 'contato@techsolutions.com.br', 15000.00, 'Tecnologia da Informação', 'Indústria', 'Av. Paulista, 1000 - Bela Vista, São Paulo - SP', '2024-01-15', '2025-10-05', true),
 ('Supermercado Bom Preço', '(21) 97654-3210', 'compras@bompreco.com.br', 25000.00, 'Varejo Alimentício', 'Revenda', 'Rua das Flores, 250 - Centro, Rio de Janeiro - RJ', '2024-02-20', '2025-10-08', true),
@@ -430,9 +946,9 @@ INSERT INTO clientes (nome, telefone, email, limite_credito, area_atuacao, canal
 ('Academia Corpo e Mente', '(85) 90987-6543', 'recepcao@corpoeamente.com.br', 6000.00, 'Fitness e Bem-estar', 'Consumidor', 'R. do Ginásio, 88 - Aldeota, Fortaleza - CE', '2024-09-08', '2025-09-20', true),
 ('Escritório Advocacia & Cia', '(11) 89876-5432', 'contato@advocaciaecia.adv.br', 5000.00, 'Serviços Jurídicos', 'Consumidor', 'Av. Faria Lima, 2000 - Itaim Bibi, São Paulo - SP', '2024-10-01', '2025-10-07', true);
 """
-        
-        # Inserir interações
-        sql_interacoes = """
+    
+    # Inserir interações
+    sql_interacoes = """
 INSERT INTO interacoes (cliente_id, tipo, descricao, data_hora) VALUES
 (1, 'Telefone', 'Primeiro contato - Cliente interessado em soluções de software empresarial', '2024-01-15 10:30:00'),
 (1, 'Email', 'Envio de apresentação institucional e portfólio de produtos', '2024-01-16 14:20:00'),
@@ -446,9 +962,9 @@ INSERT INTO interacoes (cliente_id, tipo, descricao, data_hora) VALUES
 (3, 'Email', 'Envio de orçamento detalhado para obra do Shopping Leste', '2024-03-15 10:30:00'),
 (3, 'Telefone', 'Negociação de condições de pagamento e prazo de entrega', '2024-03-20 11:00:00');
 """
-        
-        # Inserir cotações
-        sql_cotacoes = """
+    
+    # Inserir cotações
+    sql_cotacoes = """
 INSERT INTO cotacoes (id_cotacao, cliente_id, itens, valor_total, status, data_criacao, validade, observacoes) VALUES
 ('COT-001A', 1, '- 5 Licenças de Software de Gestão Empresarial
 - 10 Estações de trabalho (computadores)
@@ -516,9 +1032,9 @@ INSERT INTO cotacoes (id_cotacao, cliente_id, itens, valor_total, status, data_c
 - Módulo de Business Intelligence
 - Consultoria e customização (80h)', 28000.00, 'Enviada', '2025-10-01', '2025-11-01', 'Proposta de expansão do sistema atual.');
 """
-        
-        # Inserir pedidos
-        sql_pedidos = """
+    
+    # Inserir pedidos
+    sql_pedidos = """
 INSERT INTO pedidos (id_pedido, cliente_id, cotacao_id, itens, valor_final, status_entrega, data_criacao, data_entrega_prevista, data_entrega_real, observacoes) VALUES
 ('PED-001', 1, 1, '- 5 Licenças de Software de Gestão Empresarial
 - 10 Estações de trabalho (computadores)
@@ -583,221 +1099,33 @@ INSERT INTO pedidos (id_pedido, cliente_id, cotacao_id, itens, valor_final, stat
 - 2 Impressoras multifuncionais laser
 - Rede estruturada e cabeamento', 28500.00, 'Em processamento', '2024-10-08', '2024-10-28', NULL, 'Móveis em produção. Computadores já estão no estoque. Instalação agendada para 28/10.');
 """
-        
-        # Executar todos os SQLs
-        db.session.execute(db.text(sql_clientes))
-        db.session.execute(db.text(sql_interacoes))
-        db.session.execute(db.text(sql_cotacoes))
-        db.session.execute(db.text(sql_pedidos))
-        db.session.commit()
-        
-        # Contar dados criados
-        from app.models import Cliente, Interacao, Cotacao, Pedido
-        total_clientes = Cliente.query.count()
-        total_interacoes = Interacao.query.count()
-        total_cotacoes = Cotacao.query.count()
-        total_pedidos = Pedido.query.count()
-        
-        # HTML de sucesso bonito
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>✅ Banco Populado com Sucesso!</title>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1">
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                body {{ 
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    min-height: 100vh;
-                    display: flex;
-                    align-items: center;
-                    justify-content: center;
-                    padding: 20px;
-                }}
-                .container {{
-                    background: white;
-                    border-radius: 20px;
-                    box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                    max-width: 700px;
-                    width: 100%;
-                    overflow: hidden;
-                    animation: slideUp 0.5s ease-out;
-                }}
-                @keyframes slideUp {{
-                    from {{ opacity: 0; transform: translateY(30px); }}
-                    to {{ opacity: 1; transform: translateY(0); }}
-                }}
-                .header {{
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    padding: 50px 30px;
-                    text-align: center;
-                }}
-                .header h1 {{
-                    font-size: 3em;
-                    margin-bottom: 10px;
-                    animation: bounce 1s ease;
-                }}
-                @keyframes bounce {{
-                    0%, 100% {{ transform: translateY(0); }}
-                    50% {{ transform: translateY(-10px); }}
-                }}
-                .header p {{
-                    opacity: 0.95;
-                    font-size: 1.2em;
-                }}
-                .content {{
-                    padding: 40px 30px;
-                }}
-                .stats {{
-                    background: #f8f9fa;
-                    border-radius: 15px;
-                    padding: 30px;
-                    margin-bottom: 30px;
-                }}
-                .stats h2 {{
-                    color: #333;
-                    margin-bottom: 25px;
-                    font-size: 1.6em;
-                    text-align: center;
-                }}
-                .stat-grid {{
-                    display: grid;
-                    grid-template-columns: repeat(2, 1fr);
-                    gap: 20px;
-                }}
-                .stat-card {{
-                    background: white;
-                    padding: 20px;
-                    border-radius: 12px;
-                    text-align: center;
-                    box-shadow: 0 4px 6px rgba(0,0,0,0.07);
-                    transition: transform 0.2s;
-                }}
-                .stat-card:hover {{
-                    transform: translateY(-5px);
-                }}
-                .stat-icon {{
-                    font-size: 2.5em;
-                    margin-bottom: 10px;
-                }}
-                .stat-value {{
-                    font-size: 2.5em;
-                    font-weight: bold;
-                    color: #667eea;
-                    margin-bottom: 5px;
-                }}
-                .stat-label {{
-                    color: #666;
-                    font-size: 1em;
-                }}
-                .btn {{
-                    display: block;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    text-decoration: none;
-                    padding: 18px 30px;
-                    border-radius: 12px;
-                    text-align: center;
-                    font-size: 1.2em;
-                    font-weight: 600;
-                    transition: all 0.3s;
-                    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.4);
-                }}
-                .btn:hover {{
-                    transform: translateY(-2px);
-                    box-shadow: 0 6px 20px rgba(102, 126, 234, 0.6);
-                }}
-                .footer {{
-                    text-align: center;
-                    padding: 25px;
-                    color: #999;
-                    font-size: 0.95em;
-                    border-top: 1px solid #f0f0f0;
-                }}
-                @media (max-width: 600px) {{
-                    .stat-grid {{ grid-template-columns: 1fr; }}
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>✅</h1>
-                    <p><strong>Banco Populado com Sucesso!</strong></p>
-                    <p style="font-size: 0.9em; margin-top: 10px;">Dados do arquivo dados_ficticios_crm.sql</p>
-                </div>
-                
-                <div class="content">
-                    <div class="stats">
-                        <h2>📊 Dados Criados</h2>
-                        <div class="stat-grid">
-                            <div class="stat-card">
-                                <div class="stat-icon">👥</div>
-                                <div class="stat-value">{total_clientes}</div>
-                                <div class="stat-label">Clientes</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-icon">💬</div>
-                                <div class="stat-value">{total_interacoes}</div>
-                                <div class="stat-label">Interações</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-icon">📋</div>
-                                <div class="stat-value">{total_cotacoes}</div>
-                                <div class="stat-label">Cotações</div>
-                            </div>
-                            <div class="stat-card">
-                                <div class="stat-icon">🛒</div>
-                                <div class="stat-value">{total_pedidos}</div>
-                                <div class="stat-label">Pedidos</div>
-                            </div>
-                        </div>
-                    </div>
-                    
-                    <a href="/" class="btn">🏠 Ir para o Dashboard</a>
-                </div>
-                
-                <div class="footer">
-                    Sistema CRM - Dados de exemplo inseridos com sucesso
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return render_template_string(html)
-        
-    except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        
-        error_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>❌ Erro ao Popular Banco</title>
-            <meta charset="utf-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; max-width: 900px; margin: 50px auto; padding: 20px; background: #f5f5f5; }}
-                .error {{ background: #f8d7da; border: 2px solid #f5c6cb; color: #721c24; padding: 30px; border-radius: 10px; }}
-                h1 {{ margin-bottom: 20px; }}
-                pre {{ background: #fff; padding: 20px; border-radius: 5px; overflow-x: auto; font-size: 13px; border: 1px solid #ddd; }}
-                .btn {{ display: inline-block; margin-top: 20px; padding: 12px 25px; background: #007bff; color: white; text-decoration: none; border-radius: 5px; }}
-            </style>
-        </head>
-        <body>
-            <div class="error">
-                <h1>❌ Erro ao Popular Banco de Dados</h1>
-                <p><strong>Erro:</strong> {str(e)}</p>
-                <p><strong>Detalhes técnicos:</strong></p>
-                <pre>{error_detail}</pre>
-            </div>
-            <a href="/" class="btn">Voltar ao Dashboard</a>
-        </body>
-        </html>
-        """
-        return render_template_string(error_html), 500
\ No newline at end of file
+    
+    progresso(40, 'Inserindo dados de exemplo')
+    # Executar todos os SQLs
+    db.session.execute(db.text(sql_clientes))
+    db.session.execute(db.text(sql_interacoes))
+    db.session.execute(db.text(sql_cotacoes))
+    db.session.execute(db.text(sql_pedidos))
+    db.session.commit()
+    progresso(60, 'Itens, contadores e resumos')
+    itens.migrar_itens()
+    contadores.recalcular_contadores()
+    resumos.reconstruir_resumos()
+    invalidar_tudo()
+    
+    return {
+        'clientes': Cliente.query.count(),
+        'interacoes': Interacao.query.count(),
+        'cotacoes': Cotacao.query.count(),
+        'pedidos': Pedido.query.count(),
+    }
+
+
+@main_bp.route('/admin/popular-banco')
+def popular_banco():
+    """Enfileira a recriação do banco com os dados de exemplo e acompanha o progresso"""
+    
+    tarefa = tarefas.enfileirar('popular_banco')
+    db.session.commit()
+    return render_template('tarefas/acompanhar.html', tarefa=tarefa,
+                           titulo='Popular banco com dados de exemplo'), 202
@@ -0,0 +1,272 @@
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from app import db
+from app.models import ChaveDuplicidade, Cliente, dados_telefone
+from app.utils import normalizar_texto
+
+
+# Detecção de clientes duplicados por blocagem.
+#
+# Cada cliente gera poucas chaves de bloqueio (palavras significativas da
+# empresa, domínio do email, telefone), guardadas em chaves_duplicidade.
+# Só clientes que dividem alguma chave são comparados com similaridade de
+# texto; assim o cadastro consulta um punhado de candidatos e o lote
+# completo custa ~ n x tamanho do bloco, não n².
+
+# Palavras que não identificam a empresa
+PALAVRAS_IGNORADAS = {
+    'ltda', 'me', 'epp', 'eireli', 'sa', 'cia', 'comercio', 'industria', 'ind', 'com',
+    'servicos', 'e', 'de', 'da', 'do', 'das', 'dos', 'the', 'and', 'inc', 'co',
+}
+
+# Domínios de email pessoal: não indicam empresa (a chave vira o usuário)
+DOMINIOS_GENERICOS = {
+    'gmail.com', 'hotmail.com', 'outlook.com', 'live.com', 'yahoo.com', 'yahoo.com.br',
+    'icloud.com', 'bol.com.br', 'uol.com.br', 'terra.com.br', 'ig.com.br',
+}
+
+# Blocos maiores que isso (ex.: "distribuidora") são pulados no lote: não
+# discriminam e tornariam a comparação quadrática
+TAMANHO_MAXIMO_BLOCO = 200
+
+LIMIAR_PADRAO = 0.7
+
+# Pesos da pontuação (somam 1)
+PESOS = {'empresa': 0.4, 'nome': 0.25, 'email': 0.15, 'telefone': 0.2}
+
+CAMPOS_PERFIL = ('id', 'nome', 'empresa', 'email', 'telefone_e164', 'telefone_sufixo')
+
+Perfil = namedtuple('Perfil', 'id nome empresa usuario dominio telefone')
+
+
+# ==================== CHAVES ====================
+
+def palavras_empresa(empresa):
+    """Palavras significativas da empresa, normalizadas"""
+    texto = re.sub(r'[^a-z0-9 ]', ' ', normalizar_texto(empresa))
+    return [p for p in texto.split() if len(p) >= 3 and p not in PALAVRAS_IGNORADAS]
+
+
+def perfil(dados):
+    """Perfil normalizado de um cliente (objeto ou dict com CAMPOS_PERFIL)"""
+    obter = dados.get if isinstance(dados, dict) else lambda campo: getattr(dados, campo, None)
+    usuario, _, dominio = (obter('email') or '').strip().lower().partition('@')
+    return Perfil(
+        id=obter('id'),
+        nome=normalizar_texto(obter('nome')),
+        empresa=' '.join(palavras_empresa(obter('empresa'))),
+        usuario=usuario,
+        dominio=dominio,
+        telefone=obter('telefone_e164') or obter('telefone_sufixo'),
+    )
+
+
+def chaves(p):
+    """Chaves de bloqueio de um perfil"""
+    resultado = {'e:' + palavra for palavra in p.empresa.split()}
+    if p.dominio and p.dominio not in DOMINIOS_GENERICOS:
+        resultado.add('d:' + p.dominio)
+    elif len(p.usuario) >= 4:
+        resultado.add('u:' + p.usuario)
+    if p.telefone:
+        resultado.add('t:' + p.telefone)
+    return {chave[:120] for chave in resultado}
+
+
+# ==================== PONTUAÇÃO ====================
+
+def _similaridade(a, b):
+    if not a or not b:
+        return 0.0
+    return 1.0 if a == b else SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def _teto(a, b):
+    """Limite superior de _similaridade só pelos comprimentos (sem comparar)"""
+    if not a or not b:
+        return 0.0
+    return 1.0 if a == b else 2 * min(len(a), len(b)) / (len(a) + len(b))
+
+
+def pontuar(a, b, limiar=0.0):
+    """De 0 a 1: quanto dois perfis parecem ser o mesmo cliente.
+
+    Com limiar, devolve 0 assim que fica claro que o par não chega lá,
+    antes de calcular as similaridades de texto (a parte cara).
+    """
+    if a.dominio and a.dominio == b.dominio and a.dominio not in DOMINIOS_GENERICOS:
+        email = 1.0
+    else:
+        email = 1.0 if a.usuario and a.usuario == b.usuario else 0.0
+    telefone = 1.0 if a.telefone and a.telefone == b.telefone else 0.0
+    pontos = PESOS['email'] * email + PESOS['telefone'] * telefone
+
+    teto_nome = PESOS['nome'] * _teto(a.nome, b.nome)
+    if pontos + PESOS['empresa'] * _teto(a.empresa, b.empresa) + teto_nome < limiar:
+        return 0.0
+    pontos += PESOS['empresa'] * _similaridade(a.empresa, b.empresa)
+    if pontos + teto_nome < limiar:
+        return 0.0
+    return pontos + PESOS['nome'] * _similaridade(a.nome, b.nome)
+
+
+# ==================== ÍNDICE DE CHAVES ====================
+
+def gravar_chaves(conexao, clientes):
+    """Substitui as chaves dos clientes (dicts ou objetos com CAMPOS_PERFIL)"""
+    perfis = [perfil(cliente) for cliente in clientes]
+    if not perfis:
+        return
+    conexao.execute(delete(ChaveDuplicidade.__table__)
+                    .where(ChaveDuplicidade.cliente_id.in_([p.id for p in perfis])))
+    linhas = [{'chave': chave, 'cliente_id': p.id} for p in perfis for chave in chaves(p)]
+    if linhas:
+        conexao.execute(insert(ChaveDuplicidade.__table__), linhas)
+
+
+def reconstruir_chaves(tamanho_lote=5000):
+    """Recalcula a tabela de chaves para todos os clientes; retorna quantos"""
+    colunas = [getattr(Cliente, campo) for campo in CAMPOS_PERFIL]
+    db.session.execute(delete(ChaveDuplicidade.__table__))
+    total, ultimo_id = 0, 0
+    while True:
+        lote = db.session.execute(
+            select(*colunas).where(Cliente.id > ultimo_id).order_by(Cliente.id).limit(tamanho_lote)
+        ).mappings().all()
+        if not lote:
+            break
+        gravar_chaves(db.session.connection(), lote)
+        total += len(lote)
+        ultimo_id = lote[-1]['id']
+    db.session.commit()
+    return total
+
+
+_CAMPOS_CHAVE = ('empresa', 'email', 'telefone_e164', 'telefone_sufixo')
+
+
+@event.listens_for(Cliente, 'after_insert')
+def _indexar_cliente_novo(mapper, connection, cliente):
+    gravar_chaves(connection, [cliente])
+
+
+@event.listens_for(Cliente, 'after_update')
+def _atualizar_chaves(mapper, connection, cliente):
+    """Regrava as chaves só quando muda algum campo que as gera"""
+    estado = inspect(cliente)
+    if any(estado.attrs[campo].history.has_changes() for campo in _CAMPOS_CHAVE):
+        gravar_chaves(connection, [cliente])
+
+
+@event.listens_for(Cliente, 'before_delete')
+def _remover_chaves(mapper, connection, cliente):
+    connection.execute(delete(ChaveDuplicidade.__table__).where(ChaveDuplicidade.cliente_id == cliente.id))
+
+
+# ==================== CANDIDATOS ====================
+
+Candidato = namedtuple('Candidato', 'cliente pontuacao')
+
+
+def candidatos(dados, limiar=LIMIAR_PADRAO, limite=5):
+    """Clientes parecidos com `dados` (form/dict/objeto), do mais parecido ao menos.
+
+    Duas consultas: os ids que mais dividem chaves com os dados (no índice
+    de chaves) e esses clientes.
+    """
+    alvo = perfil(dados)
+    chaves_alvo = chaves(alvo)
+    if not chaves_alvo:
+        return []
+
+    consulta = (select(ChaveDuplicidade.cliente_id)
+                .where(ChaveDuplicidade.chave.in_(chaves_alvo))
+                .group_by(ChaveDuplicidade.cliente_id)
+                .order_by(func.count().desc())
+                .limit(50))
+    if alvo.id is not None:
+        consulta = consulta.where(ChaveDuplicidade.cliente_id != alvo.id)
+    ids = db.session.execute(consulta).scalars().all()
+    if not ids:
+        return []
+
+    encontrados = [Candidato(cliente, pontuar(alvo, perfil(cliente)))
+                   for cliente in Cliente.query.filter(Cliente.id.in_(ids))]
+    encontrados = [c for c in encontrados if c.pontuacao >= limiar]
+    encontrados.sort(key=lambda c: c.pontuacao, reverse=True)
+    return encontrados[:limite]
+
+
+def candidatos_formulario(form, cliente_id=None, limiar=LIMIAR_PADRAO):
+    """Candidatos para os dados de um ClienteForm (cliente_id: o próprio, na edição)"""
+    dados = {campo: getattr(form, campo).data for campo in ('nome', 'empresa', 'email')}
+    dados.update(dados_telefone(form.telefone.data), id=cliente_id)
+    return candidatos(dados, limiar)
+
+
+# ==================== LOTE ====================
+
+class _Conjuntos:
+    """Union-find para juntar pares em grupos"""
+
+    def __init__(self):
+        self.pai = {}
+
+    def raiz(self, x):
+        self.pai.setdefault(x, x)
+        while self.pai[x] != x:
+            self.pai[x] = self.pai[self.pai[x]]
+            x = self.pai[x]
+        return x
+
+    def unir(self, a, b):
+        self.pai[self.raiz(a)] = self.raiz(b)
+
+    def grupos(self):
+        por_raiz = {}
+        for x in self.pai:
+            por_raiz.setdefault(self.raiz(x), []).append(x)
+        return [sorted(grupo) for grupo in por_raiz.values() if len(grupo) > 1]
+
+
+def encontrar_grupos(limiar=LIMIAR_PADRAO, tamanho_maximo_bloco=TAMANHO_MAXIMO_BLOCO):
+    """Grupos de clientes duplicados em toda a base.
+
+    Lê os perfis uma vez e percorre a tabela de chaves em ordem; cada par
+    dentro de um bloco é pontuado uma única vez. Retorna (grupos, estatísticas).
+    """
+    perfis = {
+        linha['id']: perfil(linha)
+        for linha in db.session.execute(
+            select(*[getattr(Cliente, campo) for campo in CAMPOS_PERFIL])
+            .execution_options(yield_per=5000)
+        ).mappings()
+    }
+
+    comparados = set()
+    conjuntos = _Conjuntos()
+    pulados = 0
+    linhas = db.session.execute(
+        select(ChaveDuplicidade.chave, ChaveDuplicidade.cliente_id)
+        .order_by(ChaveDuplicidade.chave, ChaveDuplicidade.cliente_id)
+        .execution_options(yield_per=5000)
+    )
+    for _, bloco in groupby(linhas, key=lambda linha: linha.chave):
+        ids = [linha.cliente_id for linha in bloco]
+        if len(ids) > tamanho_maximo_bloco:
+            pulados += 1
+            continue
+        for a, b in combinations(ids, 2):
+            if (a, b) in comparados or a not in perfis or b not in perfis:
+                continue
+            comparados.add((a, b))
+            if pontuar(perfis[a], perfis[b], limiar) >= limiar:
+                conjuntos.unir(a, b)
+
+    grupos = sorted(conjuntos.grupos(), key=len, reverse=True)
+    return grupos, {'clientes': len(perfis), 'pares_comparados': len(comparados), 'blocos_pulados': pulados}
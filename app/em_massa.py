@@ -0,0 +1,369 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import insert, or_, select, update
+
+from app import contadores, db, itens, resumos
+from app.models import Cliente, Cotacao, Pedido, tocar_clientes
+
+
+# Atualizações de status e conversões de cotações em lote (listas e API).
+#
+# Um lote lê o status atual dos documentos com SELECT ... FOR UPDATE (no
+# PostgreSQL, escritas concorrentes nos mesmos ids esperam) e grava todos
+# num único UPDATE ... WHERE id IN (...) RETURNING, na mesma transação.
+# Contadores do dashboard, resumos e versões dos clientes são ajustados
+# pelos totais do lote, com o mesmo efeito de atualizar um a um.
+#
+# A conversão de cotações cria os pedidos num único INSERT de várias
+# linhas. O id_pedido é derivado da cotação (PED-007, ou PED-007-08 para
+# cada mês de um contrato, como nos dados de exemplo). A cotação que já tem
+# pedido (ou, no contrato, pedido naquele mês) não ganha outro, e o INSERT
+# ainda ignora id_pedido repetido (ON CONFLICT DO NOTHING): repetir a
+# conversão não duplica pedidos.
+
+LIMITE_LOTE = 500
+LIMITE_MESES = 36
+STATUS_PEDIDO = ('Pendente', 'Em processamento', 'Enviado', 'Entregue', 'Cancelado')
+STATUS_COTACAO = ('Enviada', 'Aprovada', 'Recusada')
+NOMES_MESES = ('Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto',
+               'Setembro', 'Outubro', 'Novembro', 'Dezembro')
+
+
+class ResultadoLote:
+    """Resultado por id de uma atualização em lote"""
+
+    def __init__(self):
+        self.resultados = {}
+        self.clientes = set()
+
+    @property
+    def atualizados(self):
+        return sum(1 for r in self.resultados.values() if r.get('atualizado'))
+
+    @property
+    def erros(self):
+        return [r for r in self.resultados.values() if 'erro' in r]
+
+    def adicionar_erro(self, id, erro):
+        self.resultados[id] = {'id': id, 'erro': erro}
+
+    def to_dict(self):
+        return {'atualizados': self.atualizados, 'erros': len(self.erros),
+                'resultados': list(self.resultados.values())}
+
+
+def ler_ids(valores, resultado):
+    """Ids distintos do lote, na ordem recebida; os inválidos viram erro no resultado"""
+    ids = []
+    for valor in valores:
+        try:
+            id = int(valor)
+        except (TypeError, ValueError):
+            resultado.adicionar_erro(str(valor), 'Id inválido')
+            continue
+        if id not in resultado.resultados:
+            resultado.resultados[id] = {'id': id}
+            ids.append(id)
+    if len(ids) > LIMITE_LOTE:
+        raise ValueError(f'No máximo {LIMITE_LOTE} ids por lote')
+    return ids
+
+
+def _gravar(tabela, ids, valores):
+    """UPDATE ... RETURNING id, versao; {id: nova versão} dos que ainda existiam"""
+    if not ids:
+        return {}
+    comando = (update(tabela).where(tabela.c.id.in_(ids))
+               .values(**valores, versao=tabela.c.versao + 1, atualizado_em=datetime.utcnow()))
+    if db.session.get_bind().dialect.update_returning:
+        return dict(db.session.execute(comando.returning(tabela.c.id, tabela.c.versao)).all())
+    db.session.execute(comando)
+    return dict(db.session.execute(select(tabela.c.id, tabela.c.versao).where(tabela.c.id.in_(ids))).all())
+
+
+# ==================== PEDIDOS ====================
+
+def atualizar_status_pedidos(valores_ids, status, data_entrega_real=None):
+    """Aplica o status de entrega (e a data de entrega real, se dada) a um lote de pedidos.
+
+    Não faz commit; quem chama faz o commit e invalida o cache de
+    resultado.clientes. Status inválido ou lote grande demais: ValueError.
+    """
+    if status not in STATUS_PEDIDO:
+        raise ValueError(f'Status inválido: {status}')
+    resultado = ResultadoLote()
+    ids = ler_ids(valores_ids, resultado)
+    if not ids:
+        return resultado
+
+    atuais = {linha.id: linha for linha in db.session.execute(
+        select(Pedido.id, Pedido.status_entrega, Pedido.data_entrega_real, Pedido.cliente_id,
+               Pedido.data_criacao, Pedido.valor_final, Cliente.canal_vendas, Cliente.area_atuacao)
+        .join(Cliente, Cliente.id == Pedido.cliente_id)
+        .where(Pedido.id.in_(ids))
+        .with_for_update(of=Pedido)
+    )}
+    alterar = []
+    for id in ids:
+        linha = atuais.get(id)
+        if linha is None:
+            resultado.adicionar_erro(id, 'Pedido não encontrado')
+        elif linha.status_entrega == status and data_entrega_real in (None, linha.data_entrega_real):
+            resultado.resultados[id].update(status_entrega=status, atualizado=False)
+        else:
+            alterar.append(id)
+
+    valores = {'status_entrega': status}
+    if data_entrega_real is not None:
+        valores['data_entrega_real'] = data_entrega_real
+    versoes = _gravar(Pedido.__table__, alterar, valores)
+
+    gravados = [atuais[id] for id in alterar if id in versoes]
+    contadores.mover_status(contadores.PEDIDOS, Counter(linha.status_entrega for linha in gravados), status)
+    resumos.mudar_status_pedidos([(linha.status_entrega, linha.data_criacao, linha.valor_final,
+                                   linha.canal_vendas, linha.area_atuacao) for linha in gravados], status)
+    tocar_clientes(db.session.connection(), [linha.cliente_id for linha in gravados])
+
+    for id in alterar:
+        if id in versoes:
+            resultado.resultados[id].update(status_entrega=status, versao=versoes[id], atualizado=True)
+            resultado.clientes.add(atuais[id].cliente_id)
+        else:
+            resultado.adicionar_erro(id, 'Pedido não encontrado')
+    return resultado
+
+
+# ==================== COTAÇÕES ====================
+
+def atualizar_status_cotacoes(valores_ids, status):
+    """Aplica o status a um lote de cotações (mesmas regras de atualizar_status_pedidos)"""
+    if status not in STATUS_COTACAO:
+        raise ValueError(f'Status inválido: {status}')
+    resultado = ResultadoLote()
+    ids = ler_ids(valores_ids, resultado)
+    if not ids:
+        return resultado
+
+    atuais = {linha.id: linha for linha in db.session.execute(
+        select(Cotacao.id, Cotacao.status, Cotacao.cliente_id, Cotacao.data_criacao)
+        .where(Cotacao.id.in_(ids))
+        .with_for_update()
+    )}
+    alterar = []
+    for id in ids:
+        linha = atuais.get(id)
+        if linha is None:
+            resultado.adicionar_erro(id, 'Cotação não encontrada')
+        elif (linha.status or 'Enviada') == status:
+            resultado.resultados[id].update(status=status, atualizado=False)
+        else:
+            alterar.append(id)
+
+    # Convertidas em pedido: uma consulta para o lote (índice parcial por cotacao_id)
+    convertidas = set(db.session.scalars(
+        select(Pedido.cotacao_id).where(Pedido.cotacao_id.in_(alterar)).distinct()
+    )) if alterar else set()
+    versoes = _gravar(Cotacao.__table__, alterar, {'status': status})
+
+    gravadas = [atuais[id] for id in alterar if id in versoes]
+    contadores.mover_status(contadores.COTACOES, Counter(linha.status for linha in gravadas), status)
+    resumos.mudar_status_cotacoes([(linha.status, linha.data_criacao, linha.id in convertidas)
+                                   for linha in gravadas], status)
+    tocar_clientes(db.session.connection(), [linha.cliente_id for linha in gravadas])
+
+    for id in alterar:
+        if id in versoes:
+            resultado.resultados[id].update(status=status, versao=versoes[id], atualizado=True)
+            resultado.clientes.add(atuais[id].cliente_id)
+        else:
+            resultado.adicionar_erro(id, 'Cotação não encontrada')
+    return resultado
+
+
+# ==================== CONVERSÃO DE COTAÇÕES ====================
+
+class ResultadoConversao(ResultadoLote):
+    """Pedidos de cada cotação: criados agora ou já existentes"""
+
+    def pedidos(self, criados):
+        return [pedido['id_pedido'] for r in self.resultados.values()
+                for pedido in r.get('pedidos', []) if pedido['criado'] == criados]
+
+    def to_dict(self):
+        return {'criados': self.pedidos(True), 'existentes': self.pedidos(False),
+                'erros': len(self.erros), 'resultados': list(self.resultados.values())}
+
+
+def id_pedido_conversao(cotacao_id, competencia=None, com_ano=False):
+    """PED-007 (conversão da cotação 7) ou PED-007-08 (mês de um contrato); competencia = (ano, mês).
+
+    Com com_ano o mês leva o ano no fim (PED-007-08-2025): contratos que
+    passam da virada do ano ou mês cujo id curto já foi usado em outro ano.
+    """
+    if competencia is None:
+        return f'PED-{cotacao_id:03d}'
+    ano, mes = competencia
+    return f'PED-{cotacao_id:03d}-{mes:02d}-{ano}' if com_ano else f'PED-{cotacao_id:03d}-{mes:02d}'
+
+
+def meses_contrato(inicio, quantidade):
+    """(ano, mês) de `quantidade` meses seguidos a partir da data inicio"""
+    if not 1 <= quantidade <= LIMITE_MESES:
+        raise ValueError(f'Informe de 1 a {LIMITE_MESES} meses')
+    primeiro = inicio.year * 12 + inicio.month - 1
+    return [divmod(primeiro + i, 12) for i in range(quantidade)]
+
+
+def converter_cotacoes(valores_ids):
+    """Converte cada cotação em um pedido (as já convertidas ficam como estão)"""
+    resultado = ResultadoConversao()
+    ids = ler_ids(valores_ids, resultado)
+    return _converter(resultado, [(id, None) for id in ids])
+
+
+def converter_mensal(cotacao_id, inicio, meses, dia=5):
+    """Um pedido por mês da cotação de um contrato (fornecimento mensal), no `dia` de cada mês"""
+    if not 1 <= dia <= 28:
+        raise ValueError('Informe o dia do mês entre 1 e 28')
+    resultado = ResultadoConversao()
+    ids = ler_ids([cotacao_id], resultado)
+    competencias = [(ano, mes + 1) for ano, mes in meses_contrato(inicio, meses)]
+    com_ano = len({ano for ano, _ in competencias}) > 1
+    planos = [(id, (ano, mes, dia, com_ano)) for id in ids for ano, mes in competencias]
+    return _converter(resultado, planos)
+
+
+def _linha_pedido(cotacao, competencia, agora):
+    """Valores do pedido de uma cotação; competencia = (ano, mês, dia, com_ano) no fornecimento mensal"""
+    linha = {
+        'cliente_id': cotacao.cliente_id, 'cotacao_id': cotacao.id, 'itens': cotacao.itens,
+        'valor_final': cotacao.valor_total, 'status_entrega': 'Pendente', 'data_criacao': agora,
+        'atualizado_em': agora, 'versao': 1, 'id_pedido': id_pedido_conversao(cotacao.id),
+    }
+    if competencia is not None:
+        ano, mes, dia, com_ano = competencia
+        linha.update(
+            id_pedido=id_pedido_conversao(cotacao.id, (ano, mes), com_ano),
+            itens=f'Fornecimento mensal - {NOMES_MESES[mes - 1]}/{ano}:\n{cotacao.itens}',
+            # Meio-dia UTC: o mesmo dia (e mês) no fuso local
+            data_criacao=datetime(ano, mes, dia, 12),
+        )
+    return linha
+
+
+def _inserir_pedidos(linhas):
+    """INSERT de várias linhas que ignora id_pedido repetido; as linhas gravadas"""
+    tabela = Pedido.__table__
+    colunas = (tabela.c.id, tabela.c.id_pedido, tabela.c.cotacao_id, tabela.c.cliente_id,
+               tabela.c.valor_final, tabela.c.status_entrega, tabela.c.data_criacao)
+    dialeto = db.session.get_bind().dialect
+    if dialeto.name in ('postgresql', 'sqlite') and dialeto.insert_returning:
+        if dialeto.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as insert_upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_upsert
+        comando = (insert_upsert(tabela).values(linhas)
+                   .on_conflict_do_nothing(index_elements=['id_pedido']).returning(*colunas))
+        return db.session.execute(comando).all()
+    db.session.execute(insert(tabela).values(linhas))
+    return db.session.execute(
+        select(*colunas).where(tabela.c.id_pedido.in_([linha['id_pedido'] for linha in linhas]))
+    ).all()
+
+
+def _converter(resultado, planos):
+    """Cria os pedidos de planos = [(cotacao_id, competência ou None)] numa transação (sem commit)"""
+    ids = list(dict.fromkeys(id for id, _ in planos))
+    if not ids:
+        return resultado
+    if len(planos) > LIMITE_LOTE:
+        raise ValueError(f'No máximo {LIMITE_LOTE} pedidos por lote')
+
+    cotacoes = {linha.id: linha for linha in db.session.execute(
+        select(Cotacao.id, Cotacao.cliente_id, Cotacao.itens, Cotacao.valor_total, Cotacao.status,
+               Cotacao.data_criacao, Cliente.canal_vendas, Cliente.area_atuacao)
+        .join(Cliente, Cliente.id == Cotacao.cliente_id)
+        .where(Cotacao.id.in_(ids))
+        .with_for_update(of=Cotacao)
+    )}
+    agora = datetime.utcnow()
+    planejados, candidatos = [], set()
+    for id, competencia in planos:
+        if id not in cotacoes:
+            resultado.adicionar_erro(id, 'Cotação não encontrada')
+            continue
+        resultado.resultados[id].setdefault('pedidos', [])
+        linha = _linha_pedido(cotacoes[id], competencia, agora)
+        # Id curto do mês ocupado (outro ano): o mesmo mês com o ano no fim
+        opcoes = [linha['id_pedido']]
+        if competencia is not None and not competencia[3]:
+            opcoes.append(id_pedido_conversao(id, competencia[:2], com_ano=True))
+        planejados.append((id, competencia, linha, opcoes))
+        candidatos.update(opcoes)
+
+    # Pedidos que já existem: das cotações do lote ou com algum dos id_pedido
+    anteriores = db.session.execute(
+        select(Pedido.id, Pedido.id_pedido, Pedido.cotacao_id, Pedido.data_criacao)
+        .where(or_(Pedido.cotacao_id.in_(list(cotacoes)), Pedido.id_pedido.in_(list(candidatos))))
+        .order_by(Pedido.id)
+    ).all()
+    convertidas = {pedido.cotacao_id for pedido in anteriores if pedido.cotacao_id in cotacoes}
+    usados = {pedido.id_pedido for pedido in anteriores}
+    primeiros, por_mes = {}, {}
+    for pedido in anteriores:
+        primeiros.setdefault(pedido.cotacao_id, pedido)
+        if pedido.data_criacao is not None:
+            por_mes.setdefault((pedido.cotacao_id, pedido.data_criacao.year, pedido.data_criacao.month), pedido)
+
+    linhas = {}
+    for cotacao_id, competencia, linha, opcoes in planejados:
+        if 'erro' in resultado.resultados[cotacao_id]:
+            continue
+        # Conversão simples: qualquer pedido da cotação (mesmo com outro id_pedido);
+        # contrato: pedido da cotação criado naquele mês (PED-007-08 dos dados de exemplo)
+        existente = (primeiros.get(cotacao_id) if competencia is None
+                     else por_mes.get((cotacao_id, competencia[0], competencia[1])))
+        if existente is not None:
+            resultado.resultados[cotacao_id]['pedidos'].append(
+                {'id': existente.id, 'id_pedido': existente.id_pedido, 'criado': False})
+            continue
+        livre = next((opcao for opcao in opcoes if opcao not in usados and opcao not in linhas), None)
+        if livre is None:
+            resultado.adicionar_erro(cotacao_id, f'{opcoes[0]} já é o id de outro pedido')
+            for outro in [chave for chave, valor in linhas.items() if valor['cotacao_id'] == cotacao_id]:
+                del linhas[outro]
+            continue
+        linha['id_pedido'] = livre
+        linhas[livre] = linha
+
+    gravados = _inserir_pedidos(list(linhas.values())) if linhas else []
+    for pedido in gravados:
+        resultado.resultados[pedido.cotacao_id]['pedidos'].append(
+            {'id': pedido.id, 'id_pedido': pedido.id_pedido, 'criado': True})
+        resultado.resultados[pedido.cotacao_id]['atualizado'] = True
+        resultado.clientes.add(pedido.cliente_id)
+    # Criados por outra transação entre a leitura e o INSERT
+    for id_pedido in set(linhas) - {pedido.id_pedido for pedido in gravados}:
+        resultado.resultados[linhas[id_pedido]['cotacao_id']]['pedidos'].append(
+            {'id': None, 'id_pedido': id_pedido, 'criado': False})
+    if not gravados:
+        return resultado
+
+    itens.copiar_itens_pedidos([pedido.id for pedido in gravados])
+    contadores.ajustar(contadores.PEDIDOS, +len(gravados))
+    contadores.mover_status(contadores.PEDIDOS, {None: len(gravados)}, 'Pendente')
+    resumos.registrar_pedidos([(pedido, cotacoes[pedido.cotacao_id].canal_vendas,
+                                cotacoes[pedido.cotacao_id].area_atuacao) for pedido in gravados])
+
+    # Cotações convertidas agora: passam a Aprovada e contam no funil (como converter_cotacao_pedido)
+    novas = [cotacoes[id] for id in dict.fromkeys(pedido.cotacao_id for pedido in gravados)]
+    aprovar = [cotacao for cotacao in novas if cotacao.status != 'Aprovada']
+    _gravar(Cotacao.__table__, [cotacao.id for cotacao in aprovar], {'status': 'Aprovada'})
+    contadores.mover_status(contadores.COTACOES, Counter(cotacao.status for cotacao in aprovar), 'Aprovada')
+    resumos.mudar_status_cotacoes([(cotacao.status, cotacao.data_criacao, cotacao.id in convertidas)
+                                   for cotacao in aprovar], 'Aprovada')
+    resumos.registrar_conversoes([(cotacao.data_criacao, 'Aprovada')
+                                  for cotacao in novas if cotacao.id not in convertidas])
+    tocar_clientes(db.session.connection(), resultado.clientes)
+    return resultado
@@ -0,0 +1,176 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+from app import db
+
+
+# Exportação em streaming: as linhas saem do banco por um cursor do lado do
+# servidor (yield_per/stream_results) e são escritas na resposta em lotes,
+# sem montar a lista inteira em memória.
+
+TAMANHO_LOTE = 1000
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+
+def para_json(dados):
+    return json.dumps(dados, default=_valor_json, ensure_ascii=False, separators=(',', ':'))
+
+
+def lotes(consulta, tamanho=TAMANHO_LOTE):
+    """Executa a consulta com cursor no servidor e gera listas de linhas"""
+    resultado = db.session.execute(
+        consulta.execution_options(yield_per=tamanho, stream_results=True)
+    )
+    try:
+        for lote in resultado.partitions():
+            yield lote
+    finally:
+        resultado.close()
+
+
+def gerar_ndjson(consulta, campos, tamanho=TAMANHO_LOTE):
+    """Um objeto JSON por linha (application/x-ndjson)"""
+    for lote in lotes(consulta, tamanho):
+        yield ''.join(para_json(dict(zip(campos, linha))) + '\n' for linha in lote)
+
+
+def gerar_json_array(consulta, campos, tamanho=TAMANHO_LOTE):
+    """Array JSON escrito em pedaços, um lote de cada vez"""
+    yield '['
+    primeiro = True
+    for lote in lotes(consulta, tamanho):
+        pedaco = ','.join(para_json(dict(zip(campos, linha))) for linha in lote)
+        if not primeiro:
+            pedaco = ',' + pedaco
+        primeiro = False
+        yield pedaco
+    yield ']'
+
+
+# ==================== CSV ====================
+
+def _texto_celula(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    return valor
+
+
+def gerar_csv(consulta, cabecalho, tamanho=TAMANHO_LOTE):
+    """CSV (com BOM, para o Excel reconhecer UTF-8) escrito lote a lote"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(cabecalho)
+    yield '\ufeff' + buffer.getvalue()
+    for lote in lotes(consulta, tamanho):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_texto_celula(v) for v in linha] for linha in lote)
+        yield buffer.getvalue()
+
+
+# ==================== XLSX ====================
+
+class _SaidaZip(io.RawIOBase):
+    """Arquivo só de escrita que acumula os bytes até serem retirados"""
+
+    def __init__(self):
+        self.pedacos = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.pedacos.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self.pedacos)
+        self.pedacos.clear()
+        return dados
+
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_NS_DOC = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_PARTES_XLSX = {
+    '[Content_Types].xml': (
+        _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        _XML + f'<Relationships xmlns="{_NS_REL}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOC}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        _XML + f'<Relationships xmlns="{_NS_REL}">'
+        f'<Relationship Id="rId1" Type="{_NS_DOC}/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Caracteres de controle não são permitidos em XML
+_INVALIDOS_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _celula_xlsx(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float)):
+        return f'<c><v>{valor!r}</v></c>'
+    texto = escape(_INVALIDOS_XML.sub('', str(_texto_celula(valor))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xlsx(valores):
+    return '<row>' + ''.join(_celula_xlsx(v) for v in valores) + '</row>'
+
+
+def gerar_xlsx(consulta, cabecalho, nome_planilha='Planilha', tamanho=TAMANHO_LOTE):
+    """Planilha XLSX gerada em streaming, sem biblioteca externa.
+
+    O zip é escrito em um destino não pesquisável (descritores de dados no
+    fim de cada entrada), então cada lote de linhas vira bytes na resposta
+    assim que é comprimido; a memória não cresce com o número de linhas.
+    """
+    saida = _SaidaZip()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _PARTES_XLSX.items():
+            arquivo.writestr(nome, conteudo)
+        arquivo.writestr('xl/workbook.xml', (
+            _XML + f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_DOC}"><sheets>'
+            f'<sheet name="{escape(nome_planilha[:31])}" sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        ))
+        yield saida.retirar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write((_XML + f'<worksheet xmlns="{_NS_MAIN}"><sheetData>').encode('utf-8'))
+            planilha.write(_linha_xlsx(cabecalho).encode('utf-8'))
+            for lote in lotes(consulta, tamanho):
+                planilha.write(''.join(_linha_xlsx(linha) for linha in lote).encode('utf-8'))
+                yield saida.retirar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield saida.retirar()
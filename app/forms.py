@@ -1,7 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, FloatField, SelectField, TextAreaField, DateField, SubmitField
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange
-import phonenumbers
 
 
 class ClienteForm(FlaskForm):
@@ -55,20 +54,12 @@ class ClienteForm(FlaskForm):
     
     def validate_telefone(self, field):
         """Validação personalizada para telefone brasileiro"""
-        try:
-            # Remove caracteres não numéricos
-            numero_limpo = ''.join(filter(str.isdigit, field.data))
-            
-            # Valida se tem pelo menos 10 dígitos (DDD + número)
-            if len(numero_limpo) < 10:
-                raise ValueError('Telefone deve ter pelo menos 10 dígitos')
-                
-            # Tenta validar como número brasileiro
-            numero = phonenumbers.parse('+55' + numero_limpo, 'BR')
-            if not phonenumbers.is_valid_number(numero):
-                raise ValueError('Número de telefone inválido')
-                
-        except Exception as e:
+        # Parser memoizado, o mesmo que preenche telefone_e164 na gravação
+        from app.utils import normalizar_telefone
+        
+        # Só números do Brasil, como antes: "+1 ..." é válido para o parser, não para o cadastro
+        normalizado = normalizar_telefone(field.data, 'BR')
+        if normalizado is None or not normalizado[0].startswith('+55'):
             from wtforms.validators import ValidationError
             raise ValidationError('Telefone inválido. Use formato: (XX) XXXXX-XXXX')
 
@@ -97,6 +88,16 @@ class InteracaoForm(FlaskForm):
     submit = SubmitField('Registrar')
 
 
+def _exigir_valor(itens, valor):
+    """Sem valor informado, todos os itens precisam de preço unitário"""
+    from app.itens import interpretar_itens, valor_calculado
+    
+    if valor.data is not None or valor_calculado(interpretar_itens(itens.data)) is not None:
+        return True
+    valor.errors.append('Informe o valor ou o preço de cada item (ex.: "- 10 un Produto A @ 12,50")')
+    return False
+
+
 class CotacaoForm(FlaskForm):
     """Formulário para criação de cotações"""
     
@@ -105,8 +106,9 @@ class CotacaoForm(FlaskForm):
         Length(min=10, max=2000)
     ])
     
+    # Opcional quando todos os itens têm preço ("@ 32,50"): o total é calculado
     valor_total = FloatField('Valor Total (R$)', validators=[
-        DataRequired(message='Valor total é obrigatório'),
+        Optional(),
         NumberRange(min=0.01, message='Valor deve ser maior que zero')
     ])
     
@@ -115,6 +117,9 @@ class CotacaoForm(FlaskForm):
     observacoes = TextAreaField('Observações', validators=[Optional(), Length(max=1000)])
     
     submit = SubmitField('Criar Cotação')
+    
+    def validate(self, extra_validators=None):
+        return super().validate(extra_validators) and _exigir_valor(self.itens, self.valor_total)
 
 
 class PedidoForm(FlaskForm):
@@ -125,8 +130,9 @@ class PedidoForm(FlaskForm):
         Length(min=10, max=2000)
     ])
     
+    # Opcional quando todos os itens têm preço ("@ 32,50"): o total é calculado
     valor_final = FloatField('Valor Final (R$)', validators=[
-        DataRequired(message='Valor final é obrigatório'),
+        Optional(),
         NumberRange(min=0.01, message='Valor deve ser maior que zero')
     ])
     
@@ -138,6 +144,9 @@ class PedidoForm(FlaskForm):
     observacoes = TextAreaField('Observações', validators=[Optional(), Length(max=1000)])
     
     submit = SubmitField('Criar Pedido')
+    
+    def validate(self, extra_validators=None):
+        return super().validate(extra_validators) and _exigir_valor(self.itens, self.valor_final)
 
 
 class StatusEntregaForm(FlaskForm):
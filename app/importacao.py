@@ -0,0 +1,345 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from functools import lru_cache
+from itertools import chain, islice
+
+from sqlalchemy import insert, select
+
+from app import contadores, db, duplicados
+from app.models import Cliente, dados_telefone
+from app.utils import montar_texto_busca
+
+
+# Importação em massa de clientes (CSV ou JSON/NDJSON).
+#
+# O arquivo é lido em streaming, validado em lotes com as mesmas regras do
+# ClienteForm (os próprios validadores declarados no formulário, sem o custo
+# de instanciar um form por linha) e gravado com COPY no PostgreSQL ou
+# executemany nos demais bancos. Cada lote é uma transação.
+#
+# O custo está na validação em Python (email_validator e phonenumbers), não
+# no banco: o domínio do email é validado uma vez por domínio e o telefone é
+# normalizado uma vez por linha, na etapa que roda nos processos auxiliares.
+
+CAMPOS = ('nome', 'telefone', 'email', 'empresa', 'limite_credito',
+          'area_atuacao', 'canal_vendas', 'endereco')
+
+TAMANHO_LOTE = 5000
+
+# Linhas com erro guardadas no resultado (relatório e JSON); das seguintes,
+# só a contagem: um arquivo grande cheio de erros não vai inteiro para a memória
+MAX_ERROS = 1000
+
+
+# ==================== LEITURA DO ARQUIVO ====================
+
+def ler_csv(texto):
+    """Gera (linha, dados) de um CSV com cabeçalho; aceita ',' ou ';'"""
+    cabecalho = texto.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    leitor = csv.DictReader(chain([cabecalho], texto), delimiter=delimitador)
+    for dados in leitor:
+        # Linha 1 é o cabeçalho
+        yield leitor.line_num, dados
+
+
+def ler_json(texto, tamanho_bloco=64 * 1024):
+    """Gera (item, dados) de um array JSON ou de NDJSON, sem carregar tudo"""
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    posicao = 0
+    numero = 0
+    fim_arquivo = False
+    while True:
+        # Pula espaços, vírgulas e colchetes entre os objetos
+        while posicao < len(buffer) and buffer[posicao] in ' \t\r\n,[]':
+            posicao += 1
+        if posicao >= len(buffer):
+            if fim_arquivo:
+                return
+            buffer, posicao = texto.read(tamanho_bloco), 0
+            fim_arquivo = not buffer
+            continue
+        try:
+            dados, fim = decodificador.raw_decode(buffer, posicao)
+        except json.JSONDecodeError:
+            bloco = '' if fim_arquivo else texto.read(tamanho_bloco)
+            if not bloco:
+                raise
+            buffer, posicao = buffer[posicao:] + bloco, 0
+            continue
+        numero += 1
+        posicao = fim
+        yield numero, dados
+
+
+# ==================== VALIDAÇÃO ====================
+
+class _Campo:
+    """O mínimo da interface de Field usada pelos validadores do WTForms"""
+
+    def __init__(self, valor):
+        self.raw_data = [valor] if valor not in (None, '') else []
+        self.data = valor
+        self.errors = []
+
+    def gettext(self, texto):
+        return texto
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+# Parte local que o email_validator aceita como está (dot-atom ASCII): com
+# ela, a validade do email depende só do domínio
+_PARTE_LOCAL = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*\Z")
+
+
+class _EmailPorDominio:
+    """Validador Email do formulário com a checagem do domínio memoizada"""
+
+    def __init__(self, validador):
+        self.validador = validador
+        self.erro_dominio = lru_cache(maxsize=4096)(self._erro_dominio)
+
+    def _erro_dominio(self, dominio):
+        from wtforms.validators import ValidationError
+
+        try:
+            self.validador(None, _Campo('a@' + dominio))
+        except ValidationError as e:
+            return str(e)
+        return None
+
+    def __call__(self, form, field):
+        from wtforms.validators import ValidationError
+
+        email = field.data or ''
+        local, arroba, dominio = email.rpartition('@')
+        if not (arroba and dominio.isascii() and len(local) <= 64 and len(email) <= 254
+                and _PARTE_LOCAL.match(local)):
+            # Aspas, acentos, limites de tamanho: o validador completo decide
+            return self.validador(form, field)
+        erro = self.erro_dominio(dominio)
+        if erro:
+            raise ValidationError(erro)
+
+
+def _regras():
+    """Validadores e conversões de cada campo, lidos do ClienteForm"""
+    from wtforms.validators import Email
+
+    from app.forms import ClienteForm
+
+    regras = {}
+    for nome in CAMPOS:
+        campo = getattr(ClienteForm, nome)
+        validadores = [_EmailPorDominio(v) if isinstance(v, Email) else v
+                       for v in campo.kwargs.get('validators', [])]
+        inline = getattr(ClienteForm, f'validate_{nome}', None)
+        if inline is not None:
+            validadores.append(lambda form, field, inline=inline: inline(form, field))
+        escolhas = campo.kwargs.get('choices')
+        regras[nome] = {
+            'validadores': validadores,
+            'numerico': campo.field_class.__name__ == 'FloatField',
+            'escolhas': {valor for valor, _ in escolhas} if escolhas else None,
+        }
+    return regras
+
+
+_REGRAS = None
+
+
+def validar_cliente(dados):
+    """Retorna (valores, erros) para uma linha, com as regras do ClienteForm"""
+    global _REGRAS
+    from wtforms.validators import StopValidation, ValidationError
+
+    if _REGRAS is None:
+        _REGRAS = _regras()
+
+    valores, erros = {}, {}
+    for nome, regra in _REGRAS.items():
+        valor = dados.get(nome)
+        if isinstance(valor, str):
+            valor = valor.strip()
+        if regra['numerico'] and valor not in (None, ''):
+            try:
+                valor = float(str(valor).replace(',', '.'))
+            except ValueError:
+                erros[nome] = ['Valor numérico inválido']
+                continue
+        elif regra['numerico']:
+            valor = None
+        if regra['escolhas'] is not None and valor not in regra['escolhas']:
+            erros[nome] = ['Opção inválida']
+            continue
+
+        campo = _Campo(valor)
+        for validador in regra['validadores']:
+            try:
+                validador(None, campo)
+            except StopValidation as e:
+                if e.args and e.args[0]:
+                    campo.errors.append(e.args[0])
+                break
+            except (ValidationError, ValueError) as e:
+                campo.errors.append(str(e))
+        if campo.errors:
+            erros[nome] = campo.errors
+        # Strings vazias viram NULL, como nos campos opcionais do formulário
+        valores[nome] = valor if regra['numerico'] or valor else None
+    return valores, erros
+
+
+def _validar_lote(lote):
+    """Valida um lote de (linha, dados); roda também em processos auxiliares"""
+    validas, invalidas = [], []
+    for linha, dados in lote:
+        if not isinstance(dados, dict):
+            invalidas.append((linha, {'linha': ['Registro não é um objeto']}))
+            continue
+        valores, erros = validar_cliente(dados)
+        if erros:
+            invalidas.append((linha, erros))
+            continue
+        # COPY/executemany não passam pelos eventos do ORM; o telefone acabou
+        # de ser normalizado pelo validador (memoizado)
+        valores.update(dados_telefone(valores['telefone']))
+        valores['texto_busca'] = montar_texto_busca(
+            valores['nome'], valores['empresa'], valores['email'], valores['telefone']
+        )
+        validas.append((linha, valores))
+    return validas, invalidas
+
+
+# ==================== GRAVAÇÃO ====================
+
+def _gravar_copy(linhas):
+    """COPY ... FROM STDIN (PostgreSQL / psycopg2)"""
+    colunas = CAMPOS + ('texto_busca', 'telefone_e164', 'telefone_sufixo', 'data_cadastro', 'ativo')
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for valores in linhas:
+        escritor.writerow([valores[c] for c in colunas])
+    buffer.seek(0)
+    conexao = db.session.connection().connection.dbapi_connection
+    with conexao.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY clientes ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+
+def _gravar(linhas):
+    agora = datetime.utcnow()
+    for valores in linhas:
+        valores['data_cadastro'] = agora
+        valores['ativo'] = True
+    if db.session.get_bind().dialect.name == 'postgresql':
+        _gravar_copy(linhas)
+    else:
+        db.session.execute(insert(Cliente.__table__), linhas)
+
+    # Chaves de duplicidade: os ids só existem depois do INSERT
+    emails = [valores['email'] for valores in linhas]
+    ids = dict(db.session.execute(
+        select(Cliente.email, Cliente.id).where(Cliente.email.in_(emails))
+    ).all())
+    duplicados.gravar_chaves(db.session.connection(),
+                             [dict(valores, id=ids[valores['email']]) for valores in linhas])
+
+
+class ResultadoImportacao:
+    """Totais e as primeiras MAX_ERROS linhas com erro de uma importação"""
+
+    def __init__(self, max_erros=MAX_ERROS):
+        self.importados = 0
+        self.total_erros = 0
+        self.erros = []
+        self.max_erros = max_erros
+
+    def adicionar_erro(self, linha, erros):
+        self.total_erros += 1
+        if len(self.erros) < self.max_erros:
+            self.erros.append({'linha': linha, 'erros': erros})
+
+    def to_dict(self):
+        return {'importados': self.importados, 'total_erros': self.total_erros, 'erros': self.erros}
+
+
+def importar_clientes(registros, tamanho_lote=TAMANHO_LOTE, processos=1, progresso=None):
+    """Importa clientes de um iterável de (linha, dados).
+
+    Com processos > 1 a validação dos lotes é distribuída em um pool de
+    processos; a gravação continua na conexão atual, lote a lote.
+    `progresso(resultado)`, se informado, é chamado após cada lote.
+    """
+    resultado = ResultadoImportacao()
+
+    def _lotes():
+        iterador = iter(registros)
+        while True:
+            lote = list(islice(iterador, tamanho_lote))
+            if not lote:
+                return
+            yield lote
+
+    pool = None
+    if processos > 1:
+        from multiprocessing import Pool
+        pool = Pool(processos)
+        validados = pool.imap(_validar_lote, _lotes())
+    else:
+        validados = map(_validar_lote, _lotes())
+
+    try:
+        for validas, invalidas in validados:
+            for linha, erros in invalidas:
+                resultado.adicionar_erro(linha, erros)
+
+            # Emails já cadastrados (inclusive pelos lotes anteriores, que já
+            # foram gravados) ou repetidos dentro do lote
+            emails = [valores['email'] for _, valores in validas]
+            existentes = {
+                email for (email,) in db.session.query(Cliente.email)
+                .filter(Cliente.email.in_(emails)).all()
+            } if emails else set()
+            novas = []
+            for linha, valores in validas:
+                if valores['email'] in existentes:
+                    resultado.adicionar_erro(linha, {'email': ['Email já cadastrado']})
+                    continue
+                existentes.add(valores['email'])
+                novas.append((linha, valores))
+
+            if novas:
+                try:
+                    _gravar([valores for _, valores in novas])
+                    contadores.ajustar(contadores.CLIENTES_ATIVOS, len(novas))
+                    db.session.commit()
+                    resultado.importados += len(novas)
+                except Exception as e:
+                    db.session.rollback()
+                    for linha, _ in novas:
+                        resultado.adicionar_erro(linha, {'lote': [f'Falha ao gravar o lote: {e}']})
+            if progresso:
+                progresso(resultado)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    resultado.erros.sort(key=lambda erro: erro['linha'])
+    return resultado
+
+
+def abrir_registros(arquivo, formato=None, nome_arquivo=''):
+    """Escolhe o leitor pelo formato ou pela extensão do arquivo"""
+    if formato is None:
+        formato = 'json' if nome_arquivo.lower().endswith(('.json', '.ndjson', '.jsonl')) else 'csv'
+    if formato == 'json':
+        return ler_json(arquivo)
+    return ler_csv(arquivo)
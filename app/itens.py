@@ -0,0 +1,197 @@
+import re
+from datetime import timedelta
+
+from sqlalchemy import func, insert, literal, select
+
+from app import db
+from app.models import Cotacao, ItemCotacao, ItemPedido, Pedido
+from app.utils import normalizar_texto
+
+
+# Itens estruturados de cotações e pedidos.
+#
+# O formulário continua recebendo o texto livre (uma linha por item); cada
+# linha vira uma linha de itens_cotacao/itens_pedido com produto,
+# quantidade, unidade e, se informado, preço unitário:
+#
+#     - 500 sacos de cimento CP-II 50kg @ 32,50    (ou "x R$ 32,50")
+#     - 50 toneladas de ferro 10mm
+#     - Instalação e configuração                (1 un, sem preço)
+#
+# Com preço em todas as linhas o valor total é calculado pelos itens.
+
+# Unidade canônica de cada forma escrita
+UNIDADES = {
+    'un': 'un', 'und': 'un', 'unid': 'un', 'unidade': 'un', 'unidades': 'un',
+    'saco': 'saco', 'sacos': 'saco', 'sc': 'saco',
+    'caixa': 'cx', 'caixas': 'cx', 'cx': 'cx',
+    'pacote': 'pct', 'pacotes': 'pct', 'pct': 'pct',
+    'peca': 'pç', 'pecas': 'pç', 'pc': 'pç',
+    'par': 'par', 'pares': 'par',
+    'kg': 'kg', 'quilo': 'kg', 'quilos': 'kg',
+    't': 't', 'ton': 't', 'tonelada': 't', 'toneladas': 't',
+    'l': 'l', 'litro': 'l', 'litros': 'l',
+    'm': 'm', 'metro': 'm', 'metros': 'm',
+    'm2': 'm²', 'm²': 'm²', 'm3': 'm³', 'm³': 'm³',
+    'h': 'h', 'hora': 'h', 'horas': 'h',
+}
+
+_MARCADOR = re.compile(r'^\s*(?:[-*•]\s*)?')
+_NUMERO = r'\d+(?:[.,]\d+)*'
+_LINHA = re.compile(
+    rf'^(?P<quantidade>{_NUMERO})\s*(?P<unidade>[^\W\d_]+[²³23]?\.?)?\s+(?:(?:de|do|da|dos|das)\s+)?(?P<produto>.+)$'
+)
+# Preço unitário no fim da linha: "@ 32,50", "@ R$ 32,50" ou "x R$ 32,50"
+_PRECO = re.compile(
+    rf'\s*(?:@\s*(?:R\$\s*)?|(?:\b(?:a|x|por)\s+)?R\$\s*)(?P<preco>{_NUMERO})\s*(?:/\s*\w+)?\s*$',
+    re.IGNORECASE,
+)
+
+
+# ==================== INTERPRETAÇÃO DO TEXTO ====================
+
+def _numero(texto):
+    """'1.234,5' -> 1234.5; '2.5' -> 2.5; '1.000' -> 1000"""
+    if ',' in texto:
+        return float(texto.replace('.', '').replace(',', '.'))
+    if re.fullmatch(r'\d{1,3}(?:\.\d{3})+', texto):
+        return float(texto.replace('.', ''))
+    return float(texto)
+
+
+def interpretar_linha(linha):
+    """Dict do item (produto, produto_chave, quantidade, unidade, preco_unitario, valor) ou None"""
+    texto = _MARCADOR.sub('', linha).strip()
+    # Linhas vazias e títulos ("Primeira entrega (cronograma):") não são itens
+    if not texto or texto.endswith(':'):
+        return None
+
+    preco = None
+    achado = _PRECO.search(texto)
+    if achado and achado.start() > 0:
+        preco = _numero(achado.group('preco'))
+        texto = texto[:achado.start()].strip()
+
+    quantidade, unidade, produto = 1.0, 'un', texto
+    achado = _LINHA.match(texto)
+    if achado:
+        quantidade = _numero(achado.group('quantidade'))
+        escrita = normalizar_texto(achado.group('unidade') or '').rstrip('.')
+        if escrita in UNIDADES:
+            unidade, produto = UNIDADES[escrita], achado.group('produto')
+        else:
+            # "10 Estações de trabalho": a palavra é o produto, não a unidade
+            produto = texto[achado.end('quantidade'):].strip()
+
+    produto = produto.strip()[:200]
+    return {
+        'produto': produto,
+        'produto_chave': normalizar_texto(produto)[:200],
+        'quantidade': quantidade,
+        'unidade': unidade,
+        'preco_unitario': preco,
+        'valor': round(quantidade * preco, 2) if preco is not None else None,
+    }
+
+
+def interpretar_itens(texto):
+    """Itens de um texto com um item por linha"""
+    return [item for item in map(interpretar_linha, (texto or '').splitlines()) if item]
+
+
+def valor_calculado(itens):
+    """Soma dos itens se todos tiverem preço; senão None (vale o valor informado)"""
+    if not itens or any(item['preco_unitario'] is None for item in itens):
+        return None
+    return round(sum(item['valor'] for item in itens), 2)
+
+
+def montar_linhas(texto, modelo):
+    """(instâncias de ItemCotacao/ItemPedido, valor calculado ou None)"""
+    itens = interpretar_itens(texto)
+    return [modelo(**item) for item in itens], valor_calculado(itens)
+
+
+# ==================== CONVERSÃO E MIGRAÇÃO ====================
+
+_COLUNAS_COPIADAS = ('produto', 'produto_chave', 'quantidade', 'unidade', 'preco_unitario', 'valor')
+
+
+def copiar_itens_cotacao(cotacao_id, pedido_id):
+    """Copia os itens da cotação para o pedido num único INSERT ... SELECT"""
+    origem = ItemCotacao.__table__.c
+    consulta = (select(literal(pedido_id), *[origem[coluna] for coluna in _COLUNAS_COPIADAS])
+                .where(origem.cotacao_id == cotacao_id)
+                .order_by(origem.id))
+    return db.session.execute(
+        insert(ItemPedido.__table__).from_select(('pedido_id',) + _COLUNAS_COPIADAS, consulta)
+    ).rowcount
+
+
+def copiar_itens_pedidos(pedido_ids):
+    """copiar_itens_cotacao para vários pedidos novos (cada um da sua cotacao_id), num só INSERT ... SELECT"""
+    if not pedido_ids:
+        return 0
+    origem, pedidos = ItemCotacao.__table__.c, Pedido.__table__.c
+    consulta = (select(pedidos.id, *[origem[coluna] for coluna in _COLUNAS_COPIADAS])
+                .join(Pedido.__table__, pedidos.cotacao_id == origem.cotacao_id)
+                .where(pedidos.id.in_(pedido_ids))
+                .order_by(pedidos.id, origem.id))
+    return db.session.execute(
+        insert(ItemPedido.__table__).from_select(('pedido_id',) + _COLUNAS_COPIADAS, consulta)
+    ).rowcount
+
+
+def _migrar(modelo, modelo_item, coluna_fk, tamanho_lote):
+    """Cria itens para os documentos que ainda não têm nenhum"""
+    total, ultimo_id = 0, 0
+    fk = getattr(modelo_item, coluna_fk)
+    while True:
+        lote = db.session.execute(
+            select(modelo.id, modelo.itens)
+            .where(modelo.id > ultimo_id, ~select(fk).where(fk == modelo.id).exists())
+            .order_by(modelo.id)
+            .limit(tamanho_lote)
+        ).all()
+        if not lote:
+            return total
+        linhas = [dict(item, **{coluna_fk: id}) for id, texto in lote for item in interpretar_itens(texto)]
+        if linhas:
+            db.session.execute(insert(modelo_item.__table__), linhas)
+        db.session.commit()
+        total += len(lote)
+        ultimo_id = lote[-1].id
+
+
+def migrar_itens(tamanho_lote=1000):
+    """Interpreta o texto `itens` das cotações e pedidos antigos; retorna (cotações, pedidos)"""
+    return (_migrar(Cotacao, ItemCotacao, 'cotacao_id', tamanho_lote),
+            _migrar(Pedido, ItemPedido, 'pedido_id', tamanho_lote))
+
+
+# ==================== VENDAS POR PRODUTO ====================
+
+def vendas_por_produto(inicio=None, fim=None, produto=None, limite=50):
+    """Quantidade e valor vendidos por produto e unidade (pedidos não cancelados).
+
+    `produto` filtra pelo início do nome normalizado ("aco" casa "aço
+    carbono"); inicio/fim (datas) limitam pela data do pedido, fim inclusivo.
+    """
+    consulta = (select(ItemPedido.produto_chave, ItemPedido.unidade,
+                       func.min(ItemPedido.produto).label('produto'),
+                       func.sum(ItemPedido.quantidade).label('quantidade'),
+                       func.sum(ItemPedido.valor).label('valor'),
+                       func.count(func.distinct(ItemPedido.pedido_id)).label('pedidos'))
+                .join(Pedido, Pedido.id == ItemPedido.pedido_id)
+                .where(Pedido.status_entrega != 'Cancelado')
+                .group_by(ItemPedido.produto_chave, ItemPedido.unidade)
+                .order_by(func.sum(ItemPedido.quantidade).desc())
+                .limit(limite))
+    if produto:
+        chave = normalizar_texto(produto).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        consulta = consulta.where(ItemPedido.produto_chave.like(chave + '%', escape='\\'))
+    if inicio:
+        consulta = consulta.where(Pedido.data_criacao >= inicio)
+    if fim:
+        consulta = consulta.where(Pedido.data_criacao < fim + timedelta(days=1))
+    return [dict(linha._mapping) for linha in db.session.execute(consulta)]
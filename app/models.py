@@ -1,5 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import event, update
+from sqlalchemy.orm import object_session
 from app import db
+from app.utils import montar_texto_busca, normalizar_telefone, sufixo_telefone
 import uuid
 
 class Cliente(db.Model):
@@ -17,13 +20,81 @@ class Cliente(db.Model):
     data_cadastro = db.Column(db.DateTime, default=datetime.utcnow)
     ultimo_contato = db.Column(db.Date, nullable=True)
     ativo = db.Column(db.Boolean, default=True)
+    # Nome, empresa, email e telefone normalizados (sem acento, minúsculas),
+    # indexado pelo backend de busca (app/busca.py)
+    texto_busca = db.Column(db.Text)
+    # Telefone em E.164 (+5511987654321) e seus últimos dígitos, preenchidos a
+    # cada escrita: busca por telefone exata ou por sufixo (identificador de
+    # chamadas, WhatsApp) em uma consulta ao índice
+    telefone_e164 = db.Column(db.String(16))
+    telefone_sufixo = db.Column(db.String(8))
+    # Versão da linha: sobe a cada escrita do cliente e de suas interações,
+    # cotações e pedidos (ETag/Last-Modified das páginas e da API)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
     
     interacoes = db.relationship('Interacao', backref='cliente', lazy='dynamic', cascade='all, delete-orphan')
     cotacoes = db.relationship('Cotacao', backref='cliente', lazy='dynamic', cascade='all, delete-orphan')
     pedidos = db.relationship('Pedido', backref='cliente', lazy='dynamic', cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Listagem e selects de clientes: WHERE ativo ORDER BY nome, id
+        db.Index('ix_clientes_ativos_nome', nome, id,
+                 postgresql_where=(ativo == True), sqlite_where=(ativo == True)),
+        db.Index('ix_clientes_telefone_e164', telefone_e164),
+        db.Index('ix_clientes_telefone_sufixo', telefone_sufixo),
+    )
+    
+    # Campos expostos pela API JSON (/api/clientes)
+    CAMPOS_API = (
+        'id', 'nome', 'telefone', 'telefone_e164', 'email', 'empresa', 'limite_credito',
+        'area_atuacao', 'canal_vendas', 'endereco', 'data_cadastro',
+        'ultimo_contato', 'ativo',
+    )
+    
     def __repr__(self):
         return f'<Cliente {self.nome}>'
+    
+    def to_dict(self):
+        return _dados_api(self)
+
+
+def _dados_api(objeto):
+    """Campos de CAMPOS_API do objeto, com datas em ISO 8601 (o to_dict de todos os modelos)"""
+    dados = {}
+    for campo in objeto.CAMPOS_API:
+        valor = getattr(objeto, campo)
+        dados[campo] = valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+    return dados
+
+
+def dados_telefone(telefone):
+    """Valores das colunas de telefone (exibição, E.164, sufixo) para gravação"""
+    normalizado = normalizar_telefone(telefone)
+    if normalizado is None:
+        return {'telefone': telefone, 'telefone_e164': None, 'telefone_sufixo': sufixo_telefone(telefone)}
+    e164, formatado = normalizado
+    return {'telefone': formatado, 'telefone_e164': e164, 'telefone_sufixo': sufixo_telefone(e164)}
+
+
+@event.listens_for(Cliente, 'before_insert')
+@event.listens_for(Cliente, 'before_update')
+def _normalizar_telefone(mapper, connection, cliente):
+    """Telefone no formato de exibição + colunas E.164 e sufixo"""
+    for campo, valor in dados_telefone(cliente.telefone).items():
+        setattr(cliente, campo, valor)
+
+
+@event.listens_for(Cliente, 'before_insert')
+@event.listens_for(Cliente, 'before_update')
+def _atualizar_texto_busca(mapper, connection, cliente):
+    """Mantém texto_busca em dia a cada escrita do cliente.
+
+    Registrado depois de _normalizar_telefone: indexa o telefone já normalizado.
+    """
+    cliente.texto_busca = montar_texto_busca(
+        cliente.nome, cliente.empresa, cliente.email, cliente.telefone
+    )
 
 class Interacao(db.Model):
     __tablename__ = 'interacoes'
@@ -32,7 +103,19 @@ class Interacao(db.Model):
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
     tipo = db.Column(db.String(50), nullable=False)
     descricao = db.Column(db.Text, nullable=False)
-    data_hora = db.Column(db.DateTime, default=datetime.utcnow)
+    # NOT NULL: chave da paginação por cursor (linhas com data nula sumiriam)
+    data_hora = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                          server_default=db.func.current_timestamp())
+    
+    __table_args__ = (
+        # Interações do cliente (seção paginada de detalhes_cliente)
+        db.Index('ix_interacoes_cliente_data', cliente_id, data_hora.desc()),
+    )
+    
+    CAMPOS_API = ('id', 'tipo', 'descricao', 'data_hora')
+    
+    def to_dict(self):
+        return _dados_api(self)
 
 class Cotacao(db.Model):
     __tablename__ = 'cotacoes'
@@ -43,9 +126,30 @@ class Cotacao(db.Model):
     itens = db.Column(db.Text, nullable=False)
     valor_total = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='Enviada')
-    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    # NOT NULL: chave da paginação por cursor (linhas com data nula sumiriam)
+    data_criacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                             server_default=db.func.current_timestamp())
     validade = db.Column(db.Date, nullable=True)
     observacoes = db.Column(db.Text)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Itens estruturados; `itens` continua com o texto digitado
+    linhas = db.relationship('ItemCotacao', cascade='all, delete-orphan', order_by='ItemCotacao.id')
+    
+    __table_args__ = (
+        # Listagem/exportação: ORDER BY data_criacao DESC, id DESC, com ou sem status
+        db.Index('ix_cotacoes_data', data_criacao.desc(), id.desc()),
+        db.Index('ix_cotacoes_status_data', status, data_criacao.desc(), id.desc()),
+        # Cotações do cliente (seção paginada de detalhes_cliente)
+        db.Index('ix_cotacoes_cliente_data', cliente_id, data_criacao.desc()),
+    )
+    
+    CAMPOS_API = ('id', 'id_cotacao', 'itens', 'valor_total', 'status',
+                  'data_criacao', 'validade', 'observacoes')
+    
+    def to_dict(self):
+        return _dados_api(self)
 
 class Pedido(db.Model):
     __tablename__ = 'pedidos'
@@ -57,7 +161,216 @@ class Pedido(db.Model):
     itens = db.Column(db.Text, nullable=False)
     valor_final = db.Column(db.Float, nullable=False)
     status_entrega = db.Column(db.String(30), default='Pendente')
-    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    # NOT NULL: chave da paginação por cursor (linhas com data nula sumiriam)
+    data_criacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                             server_default=db.func.current_timestamp())
     data_entrega_prevista = db.Column(db.Date, nullable=True)
     data_entrega_real = db.Column(db.Date, nullable=True)
     observacoes = db.Column(db.Text)
+    versao = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    linhas = db.relationship('ItemPedido', cascade='all, delete-orphan', order_by='ItemPedido.id')
+    
+    __table_args__ = (
+        # Listagem/exportação: ORDER BY data_criacao DESC, id DESC, com ou sem status
+        db.Index('ix_pedidos_data', data_criacao.desc(), id.desc()),
+        db.Index('ix_pedidos_status_data', status_entrega, data_criacao.desc(), id.desc()),
+        # Pedidos do cliente (seção paginada de detalhes_cliente)
+        db.Index('ix_pedidos_cliente_data', cliente_id, data_criacao.desc()),
+        # Pedido gerado a partir de uma cotação; a maioria dos pedidos não tem
+        db.Index('ix_pedidos_cotacao', cotacao_id,
+                 postgresql_where=cotacao_id.isnot(None), sqlite_where=cotacao_id.isnot(None)),
+    )
+    
+    CAMPOS_API = ('id', 'id_pedido', 'cotacao_id', 'itens', 'valor_final', 'status_entrega',
+                  'data_criacao', 'data_entrega_prevista', 'data_entrega_real', 'observacoes')
+    
+    def to_dict(self):
+        return _dados_api(self)
+
+# ==================== ITENS (app/itens.py) ====================
+
+class ItemCotacao(db.Model):
+    """Linha de uma cotação: produto, quantidade, unidade e preço"""
+    __tablename__ = 'itens_cotacao'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    cotacao_id = db.Column(db.Integer, db.ForeignKey('cotacoes.id'), nullable=False, index=True)
+    produto = db.Column(db.String(200), nullable=False)
+    # Produto normalizado (sem acento, minúsculas): chave dos agrupamentos
+    produto_chave = db.Column(db.String(200), nullable=False)
+    quantidade = db.Column(db.Float, nullable=False, default=1.0)
+    unidade = db.Column(db.String(10), nullable=False, default='un')
+    preco_unitario = db.Column(db.Float)
+    # quantidade x preco_unitario (nulo sem preço)
+    valor = db.Column(db.Float)
+    
+    CAMPOS_API = ('id', 'produto', 'quantidade', 'unidade', 'preco_unitario', 'valor')
+    
+    def to_dict(self):
+        return _dados_api(self)
+
+class ItemPedido(db.Model):
+    """Linha de um pedido (copiada da cotação na conversão)"""
+    __tablename__ = 'itens_pedido'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    pedido_id = db.Column(db.Integer, db.ForeignKey('pedidos.id'), nullable=False, index=True)
+    produto = db.Column(db.String(200), nullable=False)
+    produto_chave = db.Column(db.String(200), nullable=False)
+    quantidade = db.Column(db.Float, nullable=False, default=1.0)
+    unidade = db.Column(db.String(10), nullable=False, default='un')
+    preco_unitario = db.Column(db.Float)
+    valor = db.Column(db.Float)
+    
+    __table_args__ = (
+        # Vendas por produto: WHERE/GROUP BY produto_chave, unidade (índice
+        # cobre a quantidade; o pedido vem pela PK)
+        db.Index('ix_itens_pedido_produto', produto_chave, unidade, pedido_id, quantidade),
+    )
+    
+    CAMPOS_API = ('id', 'produto', 'quantidade', 'unidade', 'preco_unitario', 'valor')
+    
+    def to_dict(self):
+        return _dados_api(self)
+
+# ==================== VERSÕES ====================
+
+def tocar_clientes(connection, cliente_ids):
+    """Sobe a versão dos clientes (use também após UPDATEs em massa nos filhos)"""
+    ids = {cliente_id for cliente_id in cliente_ids if cliente_id is not None}
+    if ids:
+        connection.execute(
+            update(Cliente.__table__)
+            .where(Cliente.__table__.c.id.in_(ids))
+            .values(versao=Cliente.__table__.c.versao + 1, atualizado_em=datetime.utcnow())
+        )
+
+
+def _nova_versao(mapper, connection, alvo):
+    """Incrementa a versão no próprio UPDATE (sem depender do valor em memória)"""
+    if object_session(alvo).is_modified(alvo, include_collections=False):
+        alvo.versao = mapper.class_.versao + 1
+        alvo.atualizado_em = datetime.utcnow()
+
+
+def _tocar_cliente(mapper, connection, alvo):
+    """Escrita em interação/cotação/pedido muda a página do cliente"""
+    tocar_clientes(connection, [alvo.cliente_id])
+
+
+for _modelo in (Cliente, Cotacao, Pedido):
+    event.listen(_modelo, 'before_update', _nova_versao)
+
+for _modelo in (Interacao, Cotacao, Pedido):
+    for _evento in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_modelo, _evento, _tocar_cliente)
+
+
+class Contador(db.Model):
+    """Contadores do dashboard mantidos pelas rotas de escrita (app/contadores.py)"""
+    __tablename__ = 'contadores'
+    
+    nome = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+# ==================== DUPLICIDADE (app/duplicados.py) ====================
+
+class ChaveDuplicidade(db.Model):
+    """Chaves de bloqueio de cada cliente: só quem divide uma chave é comparado"""
+    __tablename__ = 'chaves_duplicidade'
+    
+    chave = db.Column(db.String(120), primary_key=True)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True, index=True)
+
+# ==================== RESUMOS DE VENDAS (app/resumos.py) ====================
+
+class ResumoCanal(db.Model):
+    """Pedidos e valor vendido por canal de vendas do cliente"""
+    __tablename__ = 'resumo_vendas_canal'
+    
+    canal_vendas = db.Column(db.String(50), primary_key=True)
+    total_pedidos = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0)
+
+class ResumoCliente(db.Model):
+    """Pedidos e valor vendido por cliente (base do top 10)"""
+    __tablename__ = 'resumo_vendas_cliente'
+    
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), primary_key=True)
+    total_pedidos = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0, index=True)
+
+class ResumoStatus(db.Model):
+    """Quantidade de pedidos por status de entrega"""
+    __tablename__ = 'resumo_pedidos_status'
+    
+    status_entrega = db.Column(db.String(30), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumoMes(db.Model):
+    """Pedidos não cancelados e valor vendido por mês local de criação ('AAAA-MM')"""
+    __tablename__ = 'resumo_vendas_mes'
+    
+    mes = db.Column(db.String(7), primary_key=True)
+    total_pedidos = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0)
+
+class ResumoSegmento(db.Model):
+    """Pedidos não cancelados e receita por mês local, canal e área do cliente (app/analise.py)"""
+    __tablename__ = 'resumo_vendas_segmento'
+    
+    mes = db.Column(db.String(7), primary_key=True)
+    canal_vendas = db.Column(db.String(50), primary_key=True)
+    area_atuacao = db.Column(db.String(100), primary_key=True)
+    total_pedidos = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0)
+
+class ResumoFunil(db.Model):
+    """Cotações por mês local e status; convertidas = com algum pedido (app/analise.py)"""
+    __tablename__ = 'resumo_funil_cotacoes'
+    
+    mes = db.Column(db.String(7), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    convertidas = db.Column(db.Integer, nullable=False, default=0)
+
+# ==================== TAREFAS EM SEGUNDO PLANO (app/tarefas.py) ====================
+
+class Tarefa(db.Model):
+    """Operação longa enfileirada no banco e executada por `flask trabalhador`"""
+    __tablename__ = 'tarefas'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='Pendente')
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    progresso = db.Column(db.Integer, nullable=False, default=0)  # 0 a 100
+    mensagem = db.Column(db.String(200))
+    resultado = db.Column(db.JSON)
+    erro = db.Column(db.Text)
+    # Arquivo de entrada (upload de importação); só carregado pelo trabalhador
+    anexo = db.deferred(db.Column(db.LargeBinary))
+    trabalhador = db.Column(db.String(100))
+    criada_em = db.Column(db.DateTime, default=datetime.utcnow)
+    executar_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    iniciada_em = db.Column(db.DateTime)
+    concluida_em = db.Column(db.DateTime)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Próxima da fila: WHERE status = 'Pendente' AND executar_em <= agora ORDER BY executar_em, id
+        db.Index('ix_tarefas_fila', status, executar_em, id),
+    )
+    
+    # Campos expostos por /api/tarefas
+    CAMPOS_API = (
+        'id', 'tipo', 'parametros', 'status', 'tentativas', 'max_tentativas', 'progresso',
+        'mensagem', 'resultado', 'erro', 'criada_em', 'executar_em', 'iniciada_em', 'concluida_em',
+    )
+    
+    def to_dict(self):
+        return _dados_api(self)
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from functools import partial
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class OrcamentoConsultasExcedido(AssertionError):
+    """Rota executou mais comandos SQL do que o orçamento declarado"""
+
+
+# ==================== CONTAGEM DE COMANDOS ====================
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _contar_comando(conn, cursor, statement, parameters, context, executemany):
+    """Incrementa os contadores ativos no contexto atual"""
+    if not has_app_context():
+        return
+    for contador in g.get('contadores_sql', ()):
+        contador.append(statement)
+
+
+@contextmanager
+def contar_consultas():
+    """Coleta os comandos SQL executados dentro do bloco.
+
+    Uso:
+        with contar_consultas() as comandos:
+            ...
+        assert len(comandos) <= 3
+    """
+    comandos = []
+    contadores = g.setdefault('contadores_sql', [])
+    contadores.append(comandos)
+    try:
+        yield comandos
+    finally:
+        contadores.remove(comandos)
+
+
+# ==================== ORÇAMENTO POR ROTA ====================
+
+def orcamento(max_consultas):
+    """Declara quantos comandos SQL a rota pode executar por requisição.
+
+    Em respostas em streaming contam também os comandos executados enquanto
+    o corpo é gerado; a conferência é feita quando ele termina.
+    """
+    def decorador(view):
+        view.orcamento_consultas = max_consultas
+        return view
+    return decorador
+
+
+def _iniciar_contagem():
+    g.comandos_requisicao = []
+    g.setdefault('contadores_sql', []).append(g.comandos_requisicao)
+
+
+def _verificar_orcamento(response):
+    comandos = g.pop('comandos_requisicao', None)
+    if comandos is None:
+        return response
+
+    view = current_app.view_functions.get(request.endpoint)
+    limite = getattr(view, 'orcamento_consultas', None)
+    conferir = partial(_conferir, comandos, limite, request.endpoint, current_app.logger,
+                       current_app.config.get('ORCAMENTO_CONSULTAS_ESTRITO'))
+    if response.is_streamed and limite is not None:
+        # Em streaming as consultas rodam enquanto o corpo é gerado, depois
+        # deste after_request: a contagem continua e é conferida no fim
+        response.response = _conferir_no_fim(response.response, conferir)
+        return response
+    g.contadores_sql.remove(comandos)
+    conferir()
+    return response
+
+
+def _conferir_no_fim(corpo, conferir):
+    """Gera o corpo da resposta e confere o orçamento quando ele termina"""
+    yield from corpo
+    conferir()
+
+
+def _conferir(comandos, limite, endpoint, logger, estrito):
+    if limite is None or len(comandos) <= limite:
+        return
+    mensagem = f'{endpoint} executou {len(comandos)} comandos SQL (orçamento: {limite})'
+    if estrito:
+        raise OrcamentoConsultasExcedido(mensagem + ':\n' + '\n'.join(comandos))
+    logger.warning(mensagem)
+
+
+def init_app(app):
+    """Registra a verificação do orçamento de consultas nas requisições"""
+    app.before_request(_iniciar_contagem)
+    app.after_request(_verificar_orcamento)
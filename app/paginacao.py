@@ -0,0 +1,196 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_, tuple_
+
+from app import db
+
+
+# ==================== TOKENS DE CURSOR ====================
+
+def _serializar_valor(valor):
+    """Converte valores da chave em algo serializável em JSON"""
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _desserializar_valor(valor):
+    """Operação inversa de _serializar_valor"""
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        if 'd' in valor:
+            return date.fromisoformat(valor['d'])
+    return valor
+
+
+def codificar_cursor(chave, direcao, pagina, total=None):
+    """Gera um token opaco (base64 url-safe) para a posição na listagem"""
+    dados = {
+        'k': [_serializar_valor(v) for v in chave],
+        'd': direcao,
+        'p': pagina,
+    }
+    if total is not None:
+        dados['t'] = total
+    bruto = json.dumps(dados, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token):
+    """Lê um token gerado por codificar_cursor; retorna None se for inválido"""
+    if not token:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        dados = json.loads(bruto.decode('utf-8'))
+        return {
+            'chave': [_desserializar_valor(v) for v in dados['k']],
+            'direcao': 'prev' if dados.get('d') == 'prev' else 'next',
+            'pagina': max(int(dados.get('p', 1)), 1),
+            'total': dados.get('t'),
+        }
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+# ==================== CONTAGEM ====================
+
+def contar_aproximado(query):
+    """Estimativa de linhas usando o planejador do PostgreSQL.
+
+    Em outros bancos (SQLite em desenvolvimento) faz a contagem exata.
+    """
+    engine = db.session.get_bind()
+    if engine.dialect.name != 'postgresql':
+        return query.order_by(None).count()
+
+    compilado = query.order_by(None).statement.compile(dialect=engine.dialect)
+    plano = db.session.connection().exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + str(compilado), compilado.params
+    ).scalar()
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+# ==================== PAGINAÇÃO POR CURSOR ====================
+
+# Bancos que comparam linhas inteiras: (a, b) > (x, y)
+_DIALETOS_ROW_VALUE = ('postgresql', 'sqlite', 'mysql', 'mariadb')
+
+
+def _condicao_seek(colunas, chave, maior):
+    """Condição da página seguinte à chave composta, usável como faixa do índice.
+
+    (a, b) > (x, y) vira um range scan a partir da chave. Nos bancos sem
+    comparação de linhas, o OR equivalente ganha o limite a >= x na frente,
+    para o planejador ainda começar a busca pela chave.
+    """
+    if len(colunas) == 1:
+        return colunas[0] > chave[0] if maior else colunas[0] < chave[0]
+    if db.session.get_bind().dialect.name in _DIALETOS_ROW_VALUE:
+        linha, posicao = tuple_(*colunas), tuple_(*chave)
+        return linha > posicao if maior else linha < posicao
+
+    condicoes = []
+    for i, coluna in enumerate(colunas):
+        iguais = [colunas[j] == chave[j] for j in range(i)]
+        comparacao = coluna > chave[i] if maior else coluna < chave[i]
+        condicoes.append(and_(*iguais, comparacao))
+    limite = colunas[0] >= chave[0] if maior else colunas[0] <= chave[0]
+    return and_(limite, or_(*condicoes))
+
+
+class PaginacaoCursor:
+    """Paginação keyset (seek) com tokens opacos de próxima/anterior.
+
+    A ordenação deve terminar em uma coluna única (normalmente o id) para
+    que a chave seja estável, e as colunas devem ser NOT NULL: a comparação
+    com a chave nunca casa com NULL. Cada página custa uma única consulta indexada,
+    independente da profundidade; a contagem (quando pedida) só é feita na
+    primeira página e viaja dentro dos tokens.
+    """
+
+    def __init__(self, query, colunas, cursor=None, per_page=10,
+                 descendente=False, contagem='aproximada'):
+        self.per_page = per_page
+        self.colunas = colunas
+        self.descendente = descendente
+        self.aproximado = contagem == 'aproximada'
+
+        estado = decodificar_cursor(cursor)
+        if estado and len(estado['chave']) != len(colunas):
+            estado = None
+
+        self.page = estado['pagina'] if estado else 1
+        self.total = estado['total'] if estado else None
+        if estado is None and contagem:
+            if contagem == 'exata':
+                self.total = query.order_by(None).count()
+            else:
+                self.total = contar_aproximado(query)
+
+        voltando = bool(estado) and estado['direcao'] == 'prev'
+        # Andando para trás invertemos a ordenação e depois a lista
+        ordem_crescente = self.descendente == voltando
+
+        if estado:
+            query = query.filter(_condicao_seek(colunas, estado['chave'], maior=ordem_crescente))
+
+        ordem = [c.asc() if ordem_crescente else c.desc() for c in colunas]
+        linhas = query.order_by(None).order_by(*ordem).limit(per_page + 1).all()
+
+        ha_mais = len(linhas) > per_page
+        linhas = linhas[:per_page]
+        if voltando:
+            linhas.reverse()
+
+        self.items = linhas
+        if voltando:
+            self.has_prev = ha_mais
+            self.has_next = True
+        else:
+            self.has_prev = estado is not None
+            self.has_next = ha_mais
+
+    def _chave(self, item):
+        return [getattr(item, coluna.key) for coluna in self.colunas]
+
+    @property
+    def pages(self):
+        """Total de páginas estimado (None se a contagem foi desativada)"""
+        if self.total is None:
+            return None
+        return max((self.total + self.per_page - 1) // self.per_page, 1)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return codificar_cursor(self._chave(self.items[-1]), 'next', self.page + 1, self.total)
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return codificar_cursor(self._chave(self.items[0]), 'prev', self.page - 1, self.total)
+
+
+def paginar_cursor(query, colunas, descendente=False):
+    """Aplica PaginacaoCursor usando os parâmetros da requisição atual"""
+    contagem = current_app.config.get('PAGINACAO_CONTAGEM', 'aproximada')
+    return PaginacaoCursor(
+        query,
+        colunas,
+        cursor=request.args.get('cursor', '', type=str),
+        per_page=current_app.config.get('ITEMS_PER_PAGE', 10),
+        descendente=descendente,
+        contagem=None if contagem == 'nenhuma' else contagem,
+    )
@@ -0,0 +1,201 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import before_render_template, current_app, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+logger_lento = logging.getLogger('app.lento')
+
+
+# Perfil por requisição: comandos SQL, tempo no banco e no Jinja.
+#
+# Com PERFIL_AMOSTRAGEM > 0 uma fração das requisições é medida: cada
+# comando SQL (eventos do engine) e cada render de template (sinais do
+# Flask) somam no perfil da requisição em `g`. A resposta ganha o cabeçalho
+# Server-Timing (aparece no DevTools do navegador); comandos idênticos
+# repetidos na mesma requisição são avisados como possível N+1 e
+# requisições acima de PERFIL_LENTO_MS vão para o log 'app.lento' com o SQL.
+# Com amostragem 0 (padrão) nenhum evento é registrado.
+
+# Quantos comandos mostrar no log de requisições lentas
+COMANDOS_NO_LOG = 5
+TAMANHO_SQL_LOG = 500
+
+
+# ==================== PERFIL DA REQUISIÇÃO ====================
+
+class PerfilRequisicao:
+    """Comandos, tempo no banco e no Jinja de uma requisição"""
+
+    __slots__ = ('inicio', 'comandos', 'db_ms', 'template_ms', '_templates')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.comandos = []
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self._templates = []
+
+    def registrar_comando(self, statement, ms):
+        self.comandos.append((statement, ms))
+        self.db_ms += ms
+
+    def repetidos(self, minimo):
+        """[(statement, vezes)] executados ao menos `minimo` vezes"""
+        contagem = Counter(statement for statement, _ in self.comandos)
+        return [(statement, vezes) for statement, vezes in contagem.most_common() if vezes >= minimo]
+
+    def server_timing(self, total_ms):
+        return (f'db;desc="{len(self.comandos)} SQL";dur={self.db_ms:.1f}, '
+                f'tpl;desc="Jinja";dur={self.template_ms:.1f}, '
+                f'total;dur={total_ms:.1f}')
+
+
+def _perfil():
+    return g.get('perfil') if has_app_context() else None
+
+
+# ==================== EVENTOS ====================
+
+def _inicio_comando(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _perfil() is not None:
+        context._perfil_inicio = time.perf_counter()
+
+
+def _fim_comando(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_perfil_inicio', None)
+    perfil = _perfil()
+    if inicio is not None and perfil is not None:
+        perfil.registrar_comando(statement, (time.perf_counter() - inicio) * 1000)
+
+
+def _antes_template(app, template, context, **extra):
+    perfil = _perfil()
+    if perfil is not None:
+        perfil._templates.append(time.perf_counter())
+
+
+def _template_renderizado(app, template, context, **extra):
+    perfil = _perfil()
+    if perfil is not None and perfil._templates:
+        inicio = perfil._templates.pop()
+        # Só o render mais externo soma: os internos já estão dentro dele
+        if not perfil._templates:
+            perfil.template_ms += (time.perf_counter() - inicio) * 1000
+
+
+# ==================== ESTATÍSTICAS DO PROCESSO ====================
+
+class EstatisticasPerfil:
+    """Totais por endpoint das requisições medidas neste processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.endpoints = {}
+
+    def registrar(self, endpoint, total_ms, perfil, mais_1, lenta):
+        with self._trava:
+            dados = self.endpoints.setdefault(endpoint, {
+                'amostras': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'db_ms': 0.0,
+                'template_ms': 0.0, 'comandos': 0, 'mais_1': 0, 'lentas': 0,
+            })
+            dados['amostras'] += 1
+            dados['total_ms'] += total_ms
+            dados['max_ms'] = max(dados['max_ms'], total_ms)
+            dados['db_ms'] += perfil.db_ms
+            dados['template_ms'] += perfil.template_ms
+            dados['comandos'] += len(perfil.comandos)
+            dados['mais_1'] += mais_1
+            dados['lentas'] += lenta
+
+    def to_dict(self):
+        with self._trava:
+            linhas = [
+                {
+                    'endpoint': endpoint,
+                    'amostras': dados['amostras'],
+                    'media_ms': round(dados['total_ms'] / dados['amostras'], 2),
+                    'max_ms': round(dados['max_ms'], 2),
+                    'media_db_ms': round(dados['db_ms'] / dados['amostras'], 2),
+                    'media_template_ms': round(dados['template_ms'] / dados['amostras'], 2),
+                    'media_comandos': round(dados['comandos'] / dados['amostras'], 2),
+                    'mais_1': dados['mais_1'],
+                    'lentas': dados['lentas'],
+                    'soma_ms': round(dados['total_ms'], 1),
+                }
+                for endpoint, dados in self.endpoints.items()
+            ]
+        # Onde o processo gasta mais tempo no total primeiro
+        linhas.sort(key=lambda linha: linha['soma_ms'], reverse=True)
+        return {'pid': os.getpid(), 'endpoints': linhas}
+
+
+estatisticas = EstatisticasPerfil()
+
+
+# ==================== REQUISIÇÕES ====================
+
+def _sql_log(statement):
+    return ' '.join(statement.split())[:TAMANHO_SQL_LOG]
+
+
+def _iniciar_perfil():
+    taxa = current_app.config['PERFIL_AMOSTRAGEM']
+    if taxa >= 1 or random.random() < taxa:
+        g.perfil = PerfilRequisicao()
+
+
+def _finalizar_perfil(response):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return response
+    total_ms = (time.perf_counter() - perfil.inicio) * 1000
+    response.headers.add('Server-Timing', perfil.server_timing(total_ms))
+
+    repetidos = perfil.repetidos(current_app.config['PERFIL_REPETICOES'])
+    lenta = total_ms >= current_app.config['PERFIL_LENTO_MS']
+    estatisticas.registrar(request.endpoint, total_ms, perfil, bool(repetidos), lenta)
+
+    for statement, vezes in repetidos:
+        logger.warning('%s: possível N+1, o mesmo comando executou %d vezes: %s',
+                       request.endpoint, vezes, _sql_log(statement))
+    if lenta:
+        linhas = [f'{request.method} {request.full_path.rstrip("?")} -> {response.status_code} '
+                  f'({request.endpoint}): {total_ms:.1f} ms, {len(perfil.comandos)} comandos SQL '
+                  f'em {perfil.db_ms:.1f} ms, templates {perfil.template_ms:.1f} ms']
+        for statement, ms in sorted(perfil.comandos, key=lambda comando: comando[1], reverse=True)[:COMANDOS_NO_LOG]:
+            linhas.append(f'  {ms:8.1f} ms  {_sql_log(statement)}')
+        for statement, vezes in repetidos:
+            linhas.append(f'  {vezes:5d} vezes  {_sql_log(statement)}')
+        logger_lento.warning('\n'.join(linhas))
+    return response
+
+
+def init_app(app):
+    """Liga o perfil nas requisições se PERFIL_AMOSTRAGEM > 0"""
+    if app.config['PERFIL_AMOSTRAGEM'] <= 0:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _inicio_comando):
+        event.listen(Engine, 'before_cursor_execute', _inicio_comando)
+        event.listen(Engine, 'after_cursor_execute', _fim_comando)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_template_renderizado, app)
+
+    arquivo = app.config.get('PERFIL_LOG_LENTO')
+    if arquivo and not logger_lento.handlers:
+        manipulador = logging.FileHandler(arquivo)
+        manipulador.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(message)s'))
+        logger_lento.addHandler(manipulador)
+
+    app.before_request(_iniciar_perfil)
+    app.after_request(_finalizar_perfil)
@@ -0,0 +1,177 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+# Pool de conexões do SQLAlchemy configurado por variáveis de ambiente.
+#
+# Cada worker do gunicorn tem o seu pool, então o total de conexões abertas
+# no banco é workers x (pool_size + max_overflow); no Railway isso precisa
+# caber no limite de conexões do Postgres. Por isso o pool sai de um
+# orçamento total: cada worker pode abrir DB_MAX_CONEXOES // workers
+# conexões, das quais até GUNICORN_THREADS ficam no pool e o resto é
+# overflow. DB_POOL_SIZE e DB_MAX_OVERFLOW, se definidos, fixam os valores
+# (e a conta do orçamento passa a ser de quem os definiu). Com PGBOUNCER=1 (modo
+# transaction) quem faz o pool é o PgBouncer: a aplicação abre e fecha a
+# conexão a cada uso (NullPool) e não depende de estado de sessão.
+
+ESPERA_ALERTA_MS = float(os.environ.get('DB_POOL_ESPERA_ALERTA_MS', 100))
+
+# Limites (ms) do histograma de espera por conexão
+FAIXAS_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+def _env_int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+def _env_bool(nome, padrao):
+    return os.environ.get(nome, '1' if padrao else '0').lower() in ('1', 'true', 'sim')
+
+
+# Conexões de todos os workers web juntos: o max_connections padrão do
+# Postgres é 100, e o resto fica para o `flask trabalhador`, o release e o psql
+MAX_CONEXOES_PADRAO = 60
+
+
+def _workers():
+    """Workers do gunicorn, com a mesma conta do gunicorn.conf.py"""
+    return _env_int('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)
+
+
+def _tamanho_pool():
+    """(pool_size, max_overflow) de cada worker dentro de DB_MAX_CONEXOES"""
+    por_worker = max(_env_int('DB_MAX_CONEXOES', MAX_CONEXOES_PADRAO) // max(_workers(), 1), 1)
+    tamanho = _env_int('DB_POOL_SIZE', min(_env_int('GUNICORN_THREADS', 4), por_worker))
+    return tamanho, _env_int('DB_MAX_OVERFLOW', max(por_worker - tamanho, 0))
+
+
+# ==================== MÉTRICAS ====================
+
+class MetricasPool:
+    """Espera por conexão e ocupação do pool neste processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.espera_total_ms = 0.0
+            self.espera_max_ms = 0.0
+            self.em_uso_max = 0
+            self.histograma = [0] * (len(FAIXAS_ESPERA_MS) + 1)
+
+    def registrar(self, espera_ms, em_uso=0, timeout=False):
+        faixa = next((i for i, limite in enumerate(FAIXAS_ESPERA_MS) if espera_ms <= limite),
+                     len(FAIXAS_ESPERA_MS))
+        with self._trava:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total_ms += espera_ms
+            self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+            self.em_uso_max = max(self.em_uso_max, em_uso)
+            self.histograma[faixa] += 1
+        if espera_ms >= ESPERA_ALERTA_MS:
+            logger.warning('Espera de %.1f ms por uma conexão do pool (%s em uso)', espera_ms, em_uso)
+
+    def to_dict(self, engine, capacidade=None):
+        pool = engine.pool
+        with self._trava:
+            total = self.checkouts + self.timeouts
+            dados = {
+                'pid': os.getpid(),
+                'pool': type(pool).__name__,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'espera_media_ms': round(self.espera_total_ms / total, 3) if total else 0.0,
+                'espera_max_ms': round(self.espera_max_ms, 3),
+                'em_uso_max': self.em_uso_max,
+                # Faixas em ordem; 'ate_ms' None é a faixa acima do último limite
+                'histograma_espera': [
+                    {'ate_ms': limite, 'checkouts': n}
+                    for limite, n in zip(FAIXAS_ESPERA_MS + (None,), self.histograma)
+                ],
+            }
+        if isinstance(pool, QueuePool):
+            em_uso = pool.checkedout()
+            dados.update({
+                'tamanho': pool.size(),
+                'em_uso': em_uso,
+                'ociosas': pool.checkedin(),
+                'overflow': pool.overflow(),
+                'capacidade': capacidade,
+                'utilizacao': round(em_uso / capacidade, 3) if capacidade else None,
+            })
+        return dados
+
+
+metricas = MetricasPool()
+
+
+# ==================== POOLS INSTRUMENTADOS ====================
+
+class _MedirEspera:
+    """Mede quanto tempo cada checkout esperou (inclui abrir conexão nova)"""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeout:
+            metricas.registrar((time.perf_counter() - inicio) * 1000, timeout=True)
+            raise
+        em_uso = self.checkedout() if isinstance(self, QueuePool) else 0
+        metricas.registrar((time.perf_counter() - inicio) * 1000, em_uso)
+        return conexao
+
+
+class QueuePoolMedido(_MedirEspera, QueuePool):
+    pass
+
+
+class NullPoolMedido(_MedirEspera, NullPool):
+    pass
+
+
+# ==================== OPÇÕES DO ENGINE ====================
+
+def opcoes_engine(database_url):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir do ambiente"""
+    if database_url.startswith('sqlite') and (':memory:' in database_url or database_url == 'sqlite://'):
+        # Banco em memória: o Flask-SQLAlchemy escolhe o pool adequado
+        return {}
+
+    if _env_bool('PGBOUNCER', False):
+        # Modo transaction do PgBouncer: sem pool local, sem pre-ping
+        # (cada uso é uma conexão nova ao PgBouncer)
+        return {'poolclass': NullPoolMedido}
+
+    tamanho, overflow = _tamanho_pool()
+    return {
+        'poolclass': QueuePoolMedido,
+        'pool_size': tamanho,
+        'max_overflow': overflow,
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        # Recicla antes de proxies/firewalls derrubarem conexões ociosas
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+    }
+
+
+def capacidade(opcoes):
+    """Conexões que um processo pode abrir com essas opções"""
+    if opcoes.get('poolclass') is not QueuePoolMedido:
+        return None
+    return opcoes['pool_size'] + max(opcoes['max_overflow'], 0)
@@ -0,0 +1,344 @@
+from sqlalchemy import case, delete, func, insert, select, update
+
+from app import db
+from app.analise import SEM_AREA, SEM_CANAL, expressao_mes, limites_meses, mes_local
+from app.models import (Cliente, Cotacao, Pedido, ResumoCanal, ResumoCliente, ResumoFunil,
+                        ResumoMes, ResumoSegmento, ResumoStatus)
+
+
+# Resumos de vendas usados por /relatorios.
+#
+# Cada pedido criado soma sua contribuição nas tabelas de resumo (canal,
+# cliente, status, mês e segmento) na mesma transação; mudanças de status e
+# de canal/área do cliente apenas movem valores entre linhas. O mesmo vale
+# para as cotações no funil. A página de relatórios e a análise leem só as
+# linhas prontas, sem varrer a tabela de pedidos. Os meses são locais
+# (TIMEZONE), como em app/analise.py.
+#
+# Receita por mês (ResumoMes e ResumoSegmento) não conta pedidos cancelados:
+# cancelar tira o pedido das duas, reativar devolve. Canal, cliente e status
+# seguem contando todos os pedidos, como a página de relatórios sempre fez.
+
+CANCELADO = 'Cancelado'
+
+
+def _insert_dialeto():
+    dialeto = db.session.get_bind().dialect.name
+    if dialeto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_upsert
+    elif dialeto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_upsert
+    else:
+        return None
+    return insert_upsert
+
+
+def _somar(modelo, chave, deltas):
+    """Soma os deltas na linha da chave, criando a linha se não existir"""
+    insert_upsert = _insert_dialeto()
+    if insert_upsert is not None:
+        comando = insert_upsert(modelo).values(**chave, **deltas)
+        comando = comando.on_conflict_do_update(
+            index_elements=list(chave),
+            set_={coluna: getattr(modelo, coluna) + comando.excluded[coluna] for coluna in deltas},
+        )
+        db.session.execute(comando)
+        return
+
+    filtro = [getattr(modelo, coluna) == valor for coluna, valor in chave.items()]
+    resultado = db.session.execute(
+        update(modelo).where(*filtro).values(
+            **{coluna: getattr(modelo, coluna) + delta for coluna, delta in deltas.items()}
+        )
+    )
+    if resultado.rowcount == 0:
+        db.session.execute(insert(modelo).values(**chave, **deltas))
+
+
+def _somar_varios(modelo, linhas):
+    """_somar de várias chaves num só comando (executemany): linhas = [(chave, deltas)]"""
+    insert_upsert = _insert_dialeto()
+    if insert_upsert is None or len(linhas) < 2:
+        for chave, deltas in linhas:
+            _somar(modelo, chave, deltas)
+        return
+    tabela = modelo.__table__
+    chave, deltas = linhas[0]
+    comando = insert_upsert(tabela)
+    comando = comando.on_conflict_do_update(
+        index_elements=list(chave),
+        set_={coluna: tabela.c[coluna] + comando.excluded[coluna] for coluna in deltas},
+    )
+    db.session.execute(comando, [{**chave, **deltas} for chave, deltas in linhas])
+
+
+# ==================== AJUSTES NAS ESCRITAS ====================
+
+def _segmento(mes, canal_vendas, area_atuacao):
+    return {'mes': mes, 'canal_vendas': canal_vendas or SEM_CANAL, 'area_atuacao': area_atuacao or SEM_AREA}
+
+
+def registrar_pedido(pedido, canal_vendas, area_atuacao=None):
+    """Soma um pedido novo nos resumos (chamar antes do commit)"""
+    valor = pedido.valor_final or 0.0
+    _somar(ResumoCanal, {'canal_vendas': canal_vendas or SEM_CANAL},
+           {'total_pedidos': 1, 'valor_total': valor})
+    _somar(ResumoCliente, {'cliente_id': pedido.cliente_id},
+           {'total_pedidos': 1, 'valor_total': valor})
+    _somar(ResumoStatus, {'status_entrega': pedido.status_entrega or 'Pendente'},
+           {'total': 1})
+    if pedido.status_entrega != CANCELADO:
+        mes = mes_local(pedido.data_criacao)
+        _somar(ResumoMes, {'mes': mes}, {'total_pedidos': 1, 'valor_total': valor})
+        _somar(ResumoSegmento, _segmento(mes, canal_vendas, area_atuacao),
+               {'total_pedidos': 1, 'valor_total': valor})
+
+
+def registrar_pedidos(pedidos):
+    """registrar_pedido para um lote: (pedido, canal, área) de cada um, somando por chave"""
+    somas = {modelo: {} for modelo in (ResumoCanal, ResumoCliente, ResumoStatus, ResumoMes, ResumoSegmento)}
+
+    def _acumular(modelo, chave, deltas):
+        chave = tuple(chave.items())
+        atual = somas[modelo].setdefault(chave, dict.fromkeys(deltas, 0))
+        for coluna, delta in deltas.items():
+            atual[coluna] += delta
+
+    for pedido, canal_vendas, area_atuacao in pedidos:
+        valor = pedido.valor_final or 0.0
+        mes = mes_local(pedido.data_criacao)
+        _acumular(ResumoCanal, {'canal_vendas': canal_vendas or SEM_CANAL}, {'total_pedidos': 1, 'valor_total': valor})
+        _acumular(ResumoCliente, {'cliente_id': pedido.cliente_id}, {'total_pedidos': 1, 'valor_total': valor})
+        _acumular(ResumoStatus, {'status_entrega': pedido.status_entrega or 'Pendente'}, {'total': 1})
+        if pedido.status_entrega != CANCELADO:
+            _acumular(ResumoMes, {'mes': mes}, {'total_pedidos': 1, 'valor_total': valor})
+            _acumular(ResumoSegmento, _segmento(mes, canal_vendas, area_atuacao),
+                      {'total_pedidos': 1, 'valor_total': valor})
+    for modelo, linhas in somas.items():
+        _somar_varios(modelo, [(dict(chave), deltas) for chave, deltas in linhas.items()])
+
+
+def mudar_status_pedido(antigo, novo, pedido):
+    """Move um pedido entre status no resumo; cancelar tira o pedido da receita do mês e do segmento"""
+    if antigo == novo:
+        return
+    if antigo:
+        _somar(ResumoStatus, {'status_entrega': antigo}, {'total': -1})
+    _somar(ResumoStatus, {'status_entrega': novo}, {'total': 1})
+
+    if (antigo == CANCELADO) != (novo == CANCELADO):
+        sinal = 1 if antigo == CANCELADO else -1
+        canal, area = db.session.execute(
+            select(Cliente.canal_vendas, Cliente.area_atuacao).where(Cliente.id == pedido.cliente_id)
+        ).one()
+        mes, deltas = mes_local(pedido.data_criacao), {
+            'total_pedidos': sinal, 'valor_total': sinal * (pedido.valor_final or 0.0)}
+        _somar(ResumoMes, {'mes': mes}, deltas)
+        _somar(ResumoSegmento, _segmento(mes, canal, area), deltas)
+
+
+def mudar_status_pedidos(pedidos, novo):
+    """mudar_status_pedido para um lote, somando por status, mês e segmento.
+
+    pedidos: (status anterior, data_criacao, valor_final, canal, área) de
+    cada pedido que muda para `novo`.
+    """
+    por_status, por_segmento = {}, {}
+    for antigo, data, valor, canal, area in pedidos:
+        if antigo == novo:
+            continue
+        if antigo:
+            por_status[antigo] = por_status.get(antigo, 0) - 1
+        por_status[novo] = por_status.get(novo, 0) + 1
+        if (antigo == CANCELADO) != (novo == CANCELADO):
+            sinal = 1 if antigo == CANCELADO else -1
+            chave = (mes_local(data), canal, area)
+            total, soma = por_segmento.get(chave, (0, 0.0))
+            por_segmento[chave] = (total + sinal, soma + sinal * (valor or 0.0))
+    _somar_varios(ResumoStatus, [({'status_entrega': status}, {'total': delta})
+                                 for status, delta in por_status.items() if delta])
+    por_mes = {}
+    for (mes, _canal, _area), (total, soma) in por_segmento.items():
+        total_mes, soma_mes = por_mes.get(mes, (0, 0.0))
+        por_mes[mes] = (total_mes + total, soma_mes + soma)
+    _somar_varios(ResumoMes, [({'mes': mes}, {'total_pedidos': total, 'valor_total': soma})
+                              for mes, (total, soma) in por_mes.items()])
+    _somar_varios(ResumoSegmento, [(_segmento(mes, canal, area), {'total_pedidos': total, 'valor_total': soma})
+                                   for (mes, canal, area), (total, soma) in por_segmento.items()])
+
+
+def mudar_segmento_cliente(cliente_id, antigo, novo):
+    """Move o histórico do cliente para o novo canal/área; antigo e novo são (canal, área)"""
+    if (antigo[0] or SEM_CANAL, antigo[1] or SEM_AREA) == (novo[0] or SEM_CANAL, novo[1] or SEM_AREA):
+        return
+    _mudar_canal_cliente(cliente_id, antigo[0], novo[0])
+
+    # Por mês: só os pedidos deste cliente (índice por cliente e data)
+    por_mes = {}
+    for data, valor in db.session.execute(
+        select(Pedido.data_criacao, Pedido.valor_final)
+        .where(Pedido.cliente_id == cliente_id, Pedido.status_entrega.is_distinct_from(CANCELADO))
+    ):
+        pedidos, total = por_mes.get(mes_local(data), (0, 0.0))
+        por_mes[mes_local(data)] = (pedidos + 1, total + (valor or 0.0))
+    for mes, (pedidos, total) in por_mes.items():
+        _somar(ResumoSegmento, _segmento(mes, *antigo), {'total_pedidos': -pedidos, 'valor_total': -total})
+        _somar(ResumoSegmento, _segmento(mes, *novo), {'total_pedidos': pedidos, 'valor_total': total})
+
+
+def _mudar_canal_cliente(cliente_id, antigo, novo):
+    """Move o histórico do cliente para o novo canal de vendas"""
+    antigo, novo = antigo or SEM_CANAL, novo or SEM_CANAL
+    if antigo == novo:
+        return
+    resumo = db.session.get(ResumoCliente, cliente_id)
+    if resumo is None or not resumo.total_pedidos:
+        return
+    _somar(ResumoCanal, {'canal_vendas': antigo},
+           {'total_pedidos': -resumo.total_pedidos, 'valor_total': -resumo.valor_total})
+    _somar(ResumoCanal, {'canal_vendas': novo},
+           {'total_pedidos': resumo.total_pedidos, 'valor_total': resumo.valor_total})
+
+
+def _convertida(cotacao_id):
+    return db.session.execute(
+        select(Pedido.id).where(Pedido.cotacao_id == cotacao_id).limit(1)
+    ).first() is not None
+
+
+def registrar_cotacao(cotacao):
+    """Soma uma cotação nova no funil (chamar antes do commit)"""
+    _somar(ResumoFunil, {'mes': mes_local(cotacao.data_criacao), 'status': cotacao.status or 'Enviada'},
+           {'total': 1, 'convertidas': 0})
+
+
+def mudar_status_cotacao(cotacao, antigo, novo):
+    """Move uma cotação entre status no funil"""
+    antigo, novo = antigo or 'Enviada', novo or 'Enviada'
+    if antigo == novo:
+        return
+    mes, convertida = mes_local(cotacao.data_criacao), int(_convertida(cotacao.id))
+    _somar(ResumoFunil, {'mes': mes, 'status': antigo}, {'total': -1, 'convertidas': -convertida})
+    _somar(ResumoFunil, {'mes': mes, 'status': novo}, {'total': 1, 'convertidas': convertida})
+
+
+def mudar_status_cotacoes(cotacoes, novo):
+    """mudar_status_cotacao para um lote: (status anterior, data_criacao, convertida) de cada uma"""
+    novo = novo or 'Enviada'
+    deltas = {}
+    for antigo, data, convertida in cotacoes:
+        antigo = antigo or 'Enviada'
+        if antigo == novo:
+            continue
+        mes = mes_local(data)
+        for chave, sinal in (((mes, antigo), -1), ((mes, novo), 1)):
+            total, convertidas = deltas.get(chave, (0, 0))
+            deltas[chave] = (total + sinal, convertidas + sinal * int(convertida))
+    _somar_varios(ResumoFunil, [({'mes': mes, 'status': status}, {'total': total, 'convertidas': convertidas})
+                                for (mes, status), (total, convertidas) in deltas.items() if total or convertidas])
+
+
+def registrar_conversao(cotacao):
+    """Conta a cotação como convertida no funil (chamar antes de adicionar o pedido)"""
+    if not _convertida(cotacao.id):
+        _somar(ResumoFunil, {'mes': mes_local(cotacao.data_criacao), 'status': cotacao.status or 'Enviada'},
+               {'total': 0, 'convertidas': 1})
+
+
+def registrar_conversoes(cotacoes):
+    """registrar_conversao para um lote: (data_criacao, status) das cotações convertidas pela primeira vez"""
+    deltas = {}
+    for data, status in cotacoes:
+        chave = (mes_local(data), status or 'Enviada')
+        deltas[chave] = deltas.get(chave, 0) + 1
+    _somar_varios(ResumoFunil, [({'mes': mes, 'status': status}, {'total': 0, 'convertidas': convertidas})
+                                for (mes, status), convertidas in deltas.items()])
+
+
+# ==================== RECONSTRUÇÃO ====================
+
+def _mes_reconstrucao(coluna):
+    """expressao_mes cobrindo todas as datas da coluna (None se a tabela está vazia)"""
+    primeira, ultima = db.session.execute(select(func.min(coluna), func.max(coluna))).one()
+    if primeira is None:
+        return None
+    return expressao_mes(coluna, limites_meses(mes_local(primeira), mes_local(ultima)))
+
+
+def reconstruir_resumos():
+    """Recalcula todos os resumos a partir de pedidos e cotações (INSERT ... SELECT)"""
+    for modelo in (ResumoCanal, ResumoCliente, ResumoStatus, ResumoMes, ResumoSegmento, ResumoFunil):
+        db.session.execute(delete(modelo))
+
+    canal = func.coalesce(Cliente.canal_vendas, SEM_CANAL)
+
+    db.session.execute(insert(ResumoCanal).from_select(
+        ['canal_vendas', 'total_pedidos', 'valor_total'],
+        select(canal, func.count(Pedido.id), func.coalesce(func.sum(Pedido.valor_final), 0))
+        .join(Cliente, Cliente.id == Pedido.cliente_id).group_by(canal)
+    ))
+    db.session.execute(insert(ResumoCliente).from_select(
+        ['cliente_id', 'total_pedidos', 'valor_total'],
+        select(Pedido.cliente_id, func.count(Pedido.id), func.coalesce(func.sum(Pedido.valor_final), 0))
+        .group_by(Pedido.cliente_id)
+    ))
+    db.session.execute(insert(ResumoStatus).from_select(
+        ['status_entrega', 'total'],
+        select(func.coalesce(Pedido.status_entrega, 'Pendente'), func.count(Pedido.id))
+        .group_by(func.coalesce(Pedido.status_entrega, 'Pendente'))
+    ))
+    mes = _mes_reconstrucao(Pedido.data_criacao)
+    if mes is not None:
+        db.session.execute(insert(ResumoMes).from_select(
+            ['mes', 'total_pedidos', 'valor_total'],
+            select(mes, func.count(Pedido.id), func.coalesce(func.sum(Pedido.valor_final), 0))
+            .where(Pedido.data_criacao.isnot(None), Pedido.status_entrega.is_distinct_from(CANCELADO))
+            .group_by(mes)
+        ))
+        area = func.coalesce(Cliente.area_atuacao, SEM_AREA)
+        db.session.execute(insert(ResumoSegmento).from_select(
+            ['mes', 'canal_vendas', 'area_atuacao', 'total_pedidos', 'valor_total'],
+            select(mes, canal, area, func.count(Pedido.id), func.coalesce(func.sum(Pedido.valor_final), 0))
+            .join(Cliente, Cliente.id == Pedido.cliente_id)
+            .where(Pedido.data_criacao.isnot(None), Pedido.status_entrega.is_distinct_from(CANCELADO))
+            .group_by(mes, canal, area)
+        ))
+
+    mes = _mes_reconstrucao(Cotacao.data_criacao)
+    if mes is not None:
+        convertida = case((select(Pedido.id).where(Pedido.cotacao_id == Cotacao.id).exists(), 1), else_=0)
+        linhas = (select(mes.label('mes'), func.coalesce(Cotacao.status, 'Enviada').label('status'),
+                         convertida.label('convertida'))
+                  .where(Cotacao.data_criacao.isnot(None))
+                  .subquery())
+        db.session.execute(insert(ResumoFunil).from_select(
+            ['mes', 'status', 'total', 'convertidas'],
+            select(linhas.c.mes, linhas.c.status, func.count(), func.sum(linhas.c.convertida))
+            .group_by(linhas.c.mes, linhas.c.status)
+        ))
+    db.session.commit()
+
+
+# ==================== LEITURA ====================
+
+def ler_resumos():
+    """Linhas prontas para a página de relatórios"""
+    pedidos_por_status = (ResumoStatus.query
+                          .filter(ResumoStatus.total > 0)
+                          .order_by(ResumoStatus.status_entrega).all())
+    vendas_por_canal = (ResumoCanal.query
+                        .filter(ResumoCanal.total_pedidos > 0)
+                        .order_by(ResumoCanal.valor_total.desc()).all())
+    top_clientes = (db.session.query(Cliente.nome, ResumoCliente.valor_total)
+                    .join(Cliente, Cliente.id == ResumoCliente.cliente_id)
+                    .order_by(ResumoCliente.valor_total.desc())
+                    .limit(10).all())
+    vendas_por_mes = (ResumoMes.query
+                      .filter(ResumoMes.total_pedidos > 0)
+                      .order_by(ResumoMes.mes.desc()).limit(12).all())
+    return {
+        'vendas_por_canal': vendas_por_canal,
+        'top_clientes': top_clientes,
+        'pedidos_por_status': pedidos_por_status,
+        'vendas_por_mes': vendas_por_mes,
+    }
@@ -0,0 +1,263 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Tarefa
+
+logger = logging.getLogger(__name__)
+
+
+# Tarefas em segundo plano com a fila no próprio banco (sem broker).
+#
+# A rota grava uma linha em `tarefas` (enfileirar) na mesma transação das
+# suas mudanças e responde na hora; o processo `flask trabalhador` executa as
+# tarefas com N threads. Cada thread reserva a próxima pendente com
+# SELECT ... FOR UPDATE SKIP LOCKED (PostgreSQL: trabalhadores concorrentes
+# pulam as linhas já travadas) seguido de um UPDATE condicionado ao status;
+# no SQLite, que não tem travas de linha, o UPDATE condicionado sozinho
+# garante que só um trabalhador fica com a tarefa.
+#
+# Tarefas que falham voltam para a fila com espera crescente até
+# max_tentativas. O trabalhador renova `atualizado_em` das tarefas em
+# execução; as que ficam sem renovação por TAREFAS_TEMPO_LIMITE (processo
+# morto) são devolvidas à fila.
+
+PENDENTE = 'Pendente'
+EXECUTANDO = 'Executando'
+CONCLUIDA = 'Concluída'
+FALHOU = 'Falhou'
+
+# Espera antes de cada nova tentativa: 30 s, 60 s, 120 s... até 1 h
+ESPERA_BASE_SEGUNDOS = 30
+ESPERA_MAXIMA_SEGUNDOS = 3600
+TAMANHO_ERRO = 4000
+
+_TIPOS = {}
+
+
+# ==================== REGISTRO E FILA ====================
+
+def tarefa(tipo, max_tentativas=3):
+    """Registra a função das tarefas de `tipo`: funcao(tarefa, progresso) -> resultado (JSON)"""
+    def decorador(funcao):
+        _TIPOS[tipo] = (funcao, max_tentativas)
+        return funcao
+    return decorador
+
+
+def enfileirar(tipo, parametros=None, anexo=None):
+    """Adiciona a tarefa à sessão atual (quem chama faz o commit)"""
+    if tipo not in _TIPOS:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo}')
+    nova = Tarefa(tipo=tipo, parametros=parametros or {}, anexo=anexo,
+                  max_tentativas=_TIPOS[tipo][1], status=PENDENTE, executar_em=datetime.utcnow())
+    db.session.add(nova)
+    db.session.flush()
+    return nova
+
+
+def reservar(trabalhador):
+    """Marca a próxima tarefa pendente como em execução; None se a fila estiver vazia"""
+    while True:
+        agora = datetime.utcnow()
+        id = db.session.execute(
+            select(Tarefa.id)
+            .where(Tarefa.status == PENDENTE, Tarefa.executar_em <= agora)
+            .order_by(Tarefa.executar_em, Tarefa.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if id is None:
+            db.session.rollback()
+            return None
+        marcadas = db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.id == id, Tarefa.status == PENDENTE)
+            .values(status=EXECUTANDO, tentativas=Tarefa.tentativas + 1, trabalhador=trabalhador,
+                    iniciada_em=agora, atualizado_em=agora)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if marcadas:
+            return db.session.get(Tarefa, id)
+        # SQLite: outro trabalhador reservou a mesma entre o SELECT e o UPDATE
+
+
+# ==================== EXECUÇÃO ====================
+
+class Progresso:
+    """Passado à função da tarefa: progresso(percentual, mensagem=None).
+
+    Grava numa conexão à parte, visível enquanto a tarefa ainda trabalha, no
+    máximo uma vez por INTERVALO segundos.
+    """
+
+    INTERVALO = 1.0
+
+    def __init__(self, tarefa_id):
+        self.tarefa_id = tarefa_id
+        self._ultimo = 0.0
+
+    def __call__(self, percentual, mensagem=None):
+        agora = time.monotonic()
+        if agora - self._ultimo < self.INTERVALO:
+            return
+        self._ultimo = agora
+        valores = {'progresso': int(min(max(percentual, 0), 100)), 'atualizado_em': datetime.utcnow()}
+        if mensagem is not None:
+            valores['mensagem'] = mensagem[:200]
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(update(Tarefa.__table__).where(Tarefa.__table__.c.id == self.tarefa_id)
+                             .values(**valores))
+        except OperationalError:
+            # SQLite: a própria tarefa segura a escrita; o próximo aviso tenta de novo
+            logger.debug('Progresso da tarefa %s não gravado agora', self.tarefa_id)
+
+
+def _atualizar(tarefa_id, **valores):
+    db.session.execute(update(Tarefa).where(Tarefa.id == tarefa_id).values(**valores)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+
+def executar(tarefa):
+    """Executa uma tarefa reservada; retorna True se concluiu"""
+    id, tipo, tentativas, max_tentativas = tarefa.id, tarefa.tipo, tarefa.tentativas, tarefa.max_tentativas
+    registro = _TIPOS.get(tipo)
+    if registro is None:
+        _atualizar(id, status=FALHOU, erro=f'Tipo de tarefa desconhecido: {tipo}',
+                   concluida_em=datetime.utcnow(), atualizado_em=datetime.utcnow())
+        return False
+
+    inicio = time.perf_counter()
+    try:
+        resultado = registro[0](tarefa, Progresso(id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.exception('Tarefa %s (%s) falhou na tentativa %d de %d', id, tipo, tentativas, max_tentativas)
+        agora = datetime.utcnow()
+        valores = {'erro': traceback.format_exc()[-TAMANHO_ERRO:], 'atualizado_em': agora}
+        if tentativas < max_tentativas:
+            espera = min(ESPERA_BASE_SEGUNDOS * 2 ** (tentativas - 1), ESPERA_MAXIMA_SEGUNDOS)
+            valores.update(status=PENDENTE, executar_em=agora + timedelta(seconds=espera))
+        else:
+            valores.update(status=FALHOU, concluida_em=agora)
+        _atualizar(id, **valores)
+        return False
+
+    agora = datetime.utcnow()
+    _atualizar(id, status=CONCLUIDA, progresso=100, resultado=resultado, erro=None, anexo=None,
+               concluida_em=agora, atualizado_em=agora)
+    logger.info('Tarefa %s (%s) concluída em %.1f s', id, tipo, time.perf_counter() - inicio)
+    return True
+
+
+def recuperar_abandonadas(tempo_limite):
+    """Devolve à fila (ou dá como falha) as tarefas em execução sem sinal há tempo_limite segundos"""
+    agora = datetime.utcnow()
+    abandonadas = update(Tarefa).where(
+        Tarefa.status == EXECUTANDO, Tarefa.atualizado_em < agora - timedelta(seconds=tempo_limite)
+    ).execution_options(synchronize_session=False)
+    erro = 'Trabalhador interrompido durante a execução'
+    falhas = db.session.execute(abandonadas.where(Tarefa.tentativas >= Tarefa.max_tentativas).values(
+        status=FALHOU, erro=erro, concluida_em=agora, atualizado_em=agora)).rowcount
+    devolvidas = db.session.execute(abandonadas.where(Tarefa.tentativas < Tarefa.max_tentativas).values(
+        status=PENDENTE, erro=erro, executar_em=agora, atualizado_em=agora)).rowcount
+    db.session.commit()
+    if falhas or devolvidas:
+        logger.warning('%d tarefas abandonadas devolvidas à fila, %d dadas como falha', devolvidas, falhas)
+    return devolvidas, falhas
+
+
+# ==================== TRABALHADOR ====================
+
+class Trabalhador:
+    """Processo que executa a fila com `concorrencia` threads (flask trabalhador)"""
+
+    def __init__(self, app, concorrencia=None, intervalo=None, ate_esvaziar=False):
+        self.app = app
+        self.concorrencia = concorrencia or app.config['TAREFAS_CONCORRENCIA']
+        self.intervalo = intervalo or app.config['TAREFAS_INTERVALO']
+        self.tempo_limite = app.config['TAREFAS_TEMPO_LIMITE']
+        self.ate_esvaziar = ate_esvaziar
+        self.nome = f'{socket.gethostname()}:{os.getpid()}'
+        self.parar = threading.Event()
+        self._em_execucao = set()
+        self._trava = threading.Lock()
+
+    def _laco(self, indice):
+        while not self.parar.is_set():
+            with self.app.app_context():
+                try:
+                    tarefa = reservar(f'{self.nome}/{indice}')
+                    if tarefa is not None:
+                        with self._trava:
+                            self._em_execucao.add(tarefa.id)
+                        try:
+                            executar(tarefa)
+                        finally:
+                            with self._trava:
+                                self._em_execucao.discard(tarefa.id)
+                        continue
+                except Exception:
+                    # Banco fora do ar etc.: tenta de novo no próximo intervalo
+                    logger.exception('Falha ao buscar tarefas')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            if self.ate_esvaziar:
+                return
+            self.parar.wait(self.intervalo)
+
+    def _batimentos(self):
+        """Renova as tarefas em execução e recupera as abandonadas por outros processos"""
+        while not self.parar.wait(max(self.tempo_limite / 4, 1)):
+            with self.app.app_context():
+                try:
+                    with self._trava:
+                        ids = list(self._em_execucao)
+                    if ids:
+                        with db.engine.begin() as conn:
+                            conn.execute(update(Tarefa.__table__).where(Tarefa.__table__.c.id.in_(ids))
+                                         .values(atualizado_em=datetime.utcnow()))
+                    recuperar_abandonadas(self.tempo_limite)
+                except Exception:
+                    logger.exception('Falha ao renovar tarefas em execução')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def _sinal(self, numero, quadro):
+        logger.info('Sinal %s: terminando as tarefas em execução', numero)
+        self.parar.set()
+
+    def executar(self):
+        with self.app.app_context():
+            recuperar_abandonadas(self.tempo_limite)
+            db.session.remove()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._sinal)
+            signal.signal(signal.SIGINT, self._sinal)
+
+        threads = [threading.Thread(target=self._laco, args=(i,), name=f'tarefas-{i}')
+                   for i in range(self.concorrencia)]
+        for thread in threads:
+            thread.start()
+        batimentos = threading.Thread(target=self._batimentos, name='tarefas-batimentos', daemon=True)
+        batimentos.start()
+        # join com timeout: o Python só entrega sinais à thread principal entre esperas
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+        self.parar.set()
@@ -1,11 +1,65 @@
 import re
+import unicodedata
+from functools import lru_cache
 
 def validar_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return bool(re.match(pattern, email))
 
 def formatar_telefone(telefone):
-    numeros = re.sub(r'\D', '', telefone)
-    if len(numeros) == 11:
-        return f"({numeros[:2]}) {numeros[2:7]}-{numeros[7:]}"
-    return telefone
+    normalizado = normalizar_telefone(telefone)
+    return normalizado[1] if normalizado else telefone
+
+
+# Dígitos finais usados na busca por sufixo: casam o mesmo número com ou sem
+# DDI/DDD e com ou sem o nono dígito dos celulares
+TAMANHO_SUFIXO_TELEFONE = 8
+
+
+@lru_cache(maxsize=4096)
+def normalizar_telefone(telefone, regiao='BR'):
+    """(E.164, formato de exibição) do telefone, ou None se não for válido.
+
+    Memoizada: importações e formulários repetem os mesmos números.
+    """
+    # Import tardio: os metadados do phonenumbers são pesados
+    import phonenumbers
+
+    bruto = (telefone or '').strip()
+    digitos = re.sub(r'\D', '', bruto)
+    if len(digitos) < 10:
+        return None
+    # "55 11 9..." sem o "+" também é número com DDI
+    if not bruto.startswith('+') and digitos.startswith('55') and len(digitos) in (12, 13):
+        bruto = '+' + digitos
+    try:
+        numero = phonenumbers.parse(bruto, regiao)
+    except phonenumbers.NumberParseException:
+        return None
+    if not phonenumbers.is_valid_number(numero):
+        return None
+
+    formato = (phonenumbers.PhoneNumberFormat.NATIONAL if phonenumbers.region_code_for_number(numero) == regiao
+               else phonenumbers.PhoneNumberFormat.INTERNATIONAL)
+    return (phonenumbers.format_number(numero, phonenumbers.PhoneNumberFormat.E164),
+            phonenumbers.format_number(numero, formato))
+
+
+def sufixo_telefone(telefone):
+    """Últimos dígitos do telefone (None se tiver menos que isso)"""
+    digitos = re.sub(r'\D', '', telefone or '')
+    return digitos[-TAMANHO_SUFIXO_TELEFONE:] if len(digitos) >= TAMANHO_SUFIXO_TELEFONE else None
+
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos, para buscas ('São João' -> 'sao joao')"""
+    if not texto:
+        return ''
+    sem_acento = unicodedata.normalize('NFKD', texto)
+    sem_acento = ''.join(c for c in sem_acento if not unicodedata.combining(c))
+    return ' '.join(sem_acento.lower().split())
+
+
+def montar_texto_busca(nome, empresa, email, telefone):
+    """Texto indexado pela busca de clientes (telefone só com dígitos)"""
+    digitos = re.sub(r'\D', '', telefone or '')
+    return normalizar_texto(' '.join(filter(None, [nome, empresa, email, digitos])))
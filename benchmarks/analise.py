@@ -0,0 +1,155 @@
+"""Tempo da análise mensal (app/analise.py) em uma base grande.
+
+Popula um banco descartável (ou o de DATABASE_URL, se --usar-banco) com
+clientes, cotações e pedidos espalhados por --anos, reconstrói os resumos
+(a varredura completa, feita uma vez) e mostra o plano das consultas e a
+mediana de analisar() para 12 meses e para o período todo. Falha
+(código 1) se a mediana de 12 meses passar do orçamento.
+
+Uso:
+    python benchmarks/analise.py
+    python benchmarks/analise.py --pedidos 200000 --orcamento-ms 50
+    DATABASE_URL=postgresql://... python benchmarks/analise.py --usar-banco
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=20000)
+    parser.add_argument('--pedidos', type=int, default=1000000, help='pedidos; cotações = metade')
+    parser.add_argument('--anos', type=int, default=3)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--orcamento-ms', type=float, default=float(os.environ.get('ORCAMENTO_ANALISE_MS', 100)))
+    parser.add_argument('--usar-banco', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (APAGA os dados)')
+    return parser.parse_args()
+
+
+ARGS = _argumentos()
+if not ARGS.usar_banco:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'analise.db')
+
+from sqlalchemy import event, insert, text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from app import analise, resumos  # noqa: E402
+from app.models import Cliente, Cotacao, Pedido  # noqa: E402
+
+CANAIS = ['Revenda', 'Indústria', 'Consumidor', None]
+AREAS = ['Construção', 'Varejo', 'Saúde', 'Educação', None]
+STATUS_COTACAO = ['Enviada', 'Aprovada', 'Recusada']
+STATUS_PEDIDO = ['Pendente', 'Em processamento', 'Enviado', 'Entregue', 'Cancelado']
+
+
+# ==================== CARGA ====================
+
+def popular(total_clientes, total_pedidos, anos):
+    """Carga determinística (seed fixa), em lotes de executemany"""
+    aleatorio = random.Random(42)
+    fim = datetime.utcnow()
+    minutos = 60 * 24 * 365 * anos
+    db.drop_all()
+    db.create_all()
+
+    def _gravar(tabela, gerar, total):
+        for inicio in range(0, total, 20000):
+            db.session.execute(insert(tabela), [gerar(i) for i in range(inicio, min(inicio + 20000, total))])
+
+    def _data():
+        return fim - timedelta(minutes=aleatorio.randrange(minutos))
+
+    _gravar(Cliente.__table__, lambda i: {
+        'id': i + 1, 'nome': f'Cliente {i:06d}', 'empresa': f'Empresa {i % 500}',
+        'email': f'cliente{i}@exemplo.com.br', 'telefone': '(11) 90000-0000',
+        'canal_vendas': aleatorio.choice(CANAIS), 'area_atuacao': aleatorio.choice(AREAS),
+    }, total_clientes)
+    total_cotacoes = total_pedidos // 2
+    _gravar(Cotacao.__table__, lambda i: {
+        'id': i + 1, 'id_cotacao': f'C{i:09d}', 'cliente_id': aleatorio.randint(1, total_clientes),
+        'itens': 'Item', 'valor_total': aleatorio.uniform(100, 10000),
+        'status': aleatorio.choice(STATUS_COTACAO), 'data_criacao': _data(),
+    }, total_cotacoes)
+    _gravar(Pedido.__table__, lambda i: {
+        'id_pedido': f'P{i:09d}', 'cliente_id': aleatorio.randint(1, total_clientes),
+        'cotacao_id': i + 1 if i < total_cotacoes and aleatorio.random() < 0.4 else None,
+        'itens': 'Item', 'valor_final': aleatorio.uniform(100, 10000),
+        'status_entrega': aleatorio.choice(STATUS_PEDIDO), 'data_criacao': _data(),
+    }, total_pedidos)
+    db.session.commit()
+    with db.engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+
+# ==================== MEDIÇÃO ====================
+
+def planos(**parametros):
+    """Plano de cada consulta emitida por analisar()"""
+    capturados = []
+
+    def _ouvir(conn, cursor, statement, parameters, context, executemany):
+        capturados.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', _ouvir)
+    try:
+        analise.analisar(**parametros)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _ouvir)
+
+    with db.engine.connect() as conn:
+        for statement, parameters in capturados:
+            print('   ' + ' '.join(statement.split())[:110])
+            if conn.dialect.name == 'postgresql':
+                linhas = [linha[0] for linha in conn.exec_driver_sql('EXPLAIN ' + statement, parameters)]
+            else:
+                linhas = [linha[-1] for linha in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+            for linha in linhas:
+                print(f'      -> {linha}')
+
+
+def cronometrar(repeticoes, **parametros):
+    """Mediana de analisar(), em ms (sem o cache de respostas)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        analise.analisar(**parametros)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tempos)[len(tempos) // 2]
+
+
+def main():
+    with app.app_context():
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)}')
+        print(f'Populando {ARGS.clientes} clientes e {ARGS.pedidos} pedidos em {ARGS.anos} anos...')
+        popular(ARGS.clientes, ARGS.pedidos, ARGS.anos)
+
+        inicio = time.perf_counter()
+        resumos.reconstruir_resumos()
+        print(f'Resumos reconstruídos em {(time.perf_counter() - inicio) * 1000:.0f} ms')
+
+        print('\nPlanos (12 meses):')
+        planos(meses=12)
+
+        doze = cronometrar(ARGS.repeticoes, meses=12)
+        todos = cronometrar(ARGS.repeticoes, meses=12 * ARGS.anos + 1)
+        resultado = analise.analisar(meses=12)['totais']
+        print(f"\n12 meses:        {doze:8.1f} ms  ({resultado['pedidos']} pedidos, "
+              f"conversão {resultado['taxa_conversao']:.1%})")
+        print(f'{ARGS.anos} anos:          {todos:8.1f} ms')
+
+        if doze > ARGS.orcamento_ms:
+            print(f'❌ Acima do orçamento de {ARGS.orcamento_ms:.0f} ms')
+            sys.exit(1)
+        print(f'✅ Dentro do orçamento de {ARGS.orcamento_ms:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+"""Teste de carga HTTP: latência p50/p95/p99 por rota e vazão.
+
+Popula um banco descartável com benchmarks/semente.py (ou o de DATABASE_URL,
+se --usar-banco), sobe o gunicorn com gunicorn.conf.py e dispara, com
+--concorrencia conexões keep-alive, uma mistura ponderada das rotas do
+blueprint: dashboard, listas com busca e filtro de status, páginas de
+detalhe, APIs e POSTs com CSRF (status do pedido, edição de cliente e
+conversão de cotação). Com --url o alvo é um servidor já rodando, sobre
+uma base gerada pela mesma semente e escala.
+
+Com --baseline compara o p95 de cada rota e a vazão com um resultado salvo
+(--salvar) e falha (código 1) em regressão acima de --tolerancia ou se
+houver erros. A base de referência do repositório é carga_base.json;
+regrave-a na máquina de referência quando a regressão for esperada.
+
+Uso:
+    python benchmarks/carga.py --escala 10k --duracao 30
+    python benchmarks/carga.py --baseline benchmarks/carga_base.json
+    python benchmarks/carga.py --salvar benchmarks/carga_base.json
+    DATABASE_URL=postgresql://... python benchmarks/carga.py --usar-banco --escala 1m
+    python benchmarks/carga.py --url http://localhost:8080 --escala 100k
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urlsplit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.semente import ESCALAS, NOMES, STATUS_PEDIDO  # noqa: E402
+
+BASELINE_PADRAO = os.path.join(RAIZ, 'benchmarks', 'carga_base.json')
+
+# Regressão só conta acima deste aumento absoluto do p95 (ruído em rotas rápidas)
+PISO_REGRESSAO_MS = 5.0
+TERMOS_BUSCA = ['horizonte', 'metal forte', 'clinica', 'distribuidora aliança', 'contato12', 'serra']
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='10k')
+    parser.add_argument('--clientes', type=int, help='quantidade exata (em vez de --escala)')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--duracao', type=float, default=30, help='segundos medidos')
+    parser.add_argument('--aquecimento', type=float, default=5, help='segundos descartados')
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY do gunicorn')
+    parser.add_argument('--url', help='servidor já rodando (não popula nem sobe o gunicorn)')
+    parser.add_argument('--usar-banco', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (APAGA os dados)')
+    parser.add_argument('--manter-dados', action='store_true',
+                        help='com --usar-banco, não popula de novo (base já gerada com a mesma escala)')
+    parser.add_argument('--baseline', help=f'resultado para comparar (ex.: {os.path.relpath(BASELINE_PADRAO)})')
+    parser.add_argument('--salvar', help='grava o resultado em JSON')
+    parser.add_argument('--tolerancia', type=float, default=0.2, help='aumento relativo aceito no p95')
+    return parser.parse_args()
+
+
+# ==================== CLIENTE HTTP ====================
+
+class _Formulario(HTMLParser):
+    """Campos do primeiro <form method="post"> de uma página (valores atuais)"""
+
+    def __init__(self):
+        super().__init__()
+        self.campos = {}
+        self._dentro = self._fim = False
+        self._select = self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and not self._fim and (attrs.get('method') or '').lower() == 'post':
+            self._dentro = True
+        elif not self._dentro:
+            return
+        elif tag == 'input' and attrs.get('name') and attrs.get('type') not in ('submit', 'checkbox'):
+            self.campos[attrs['name']] = attrs.get('value') or ''
+        elif tag == 'select':
+            self._select = attrs.get('name')
+            self.campos.setdefault(self._select, '')
+        elif tag == 'option' and self._select and 'selected' in attrs:
+            self.campos[self._select] = attrs.get('value') or ''
+        elif tag == 'textarea':
+            self._textarea = attrs.get('name')
+            self.campos[self._textarea] = ''
+
+    def handle_data(self, data):
+        if self._textarea:
+            self.campos[self._textarea] += data
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self._dentro:
+            self._dentro, self._fim = False, True
+        elif tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+
+class Sessao:
+    """Conexão keep-alive com cookie de sessão (CSRF), como um navegador"""
+
+    def __init__(self, url, resultados=None):
+        partes = urlsplit(url)
+        self.host, self.porta = partes.hostname, partes.port or 80
+        self.resultados = resultados
+        self.cookies = {}
+        self.conexao = None
+        self.csrf = None
+
+    def _enviar(self, metodo, caminho, dados=None):
+        cabecalhos = {'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items())}
+        corpo = None
+        if dados is not None:
+            corpo = urlencode(dados).encode()
+            cabecalhos['Content-Type'] = 'application/x-www-form-urlencoded'
+        for tentativa in range(2):
+            if self.conexao is None:
+                self.conexao = http.client.HTTPConnection(self.host, self.porta, timeout=60)
+            try:
+                self.conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+                resposta = self.conexao.getresponse()
+                conteudo = resposta.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Keep-alive expirado ou worker reciclado (max_requests)
+                self.conexao.close()
+                self.conexao = None
+                if tentativa:
+                    raise
+        for cookie in resposta.headers.get_all('Set-Cookie') or []:
+            nome, _, valor = cookie.split(';', 1)[0].partition('=')
+            self.cookies[nome.strip()] = valor
+        if resposta.getheader('Connection', '').lower() == 'close':
+            self.conexao.close()
+            self.conexao = None
+        return resposta.status, conteudo
+
+    def requisitar(self, rotulo, metodo, caminho, dados=None):
+        """(status, corpo), registrando a latência em `rotulo`; status 0 se a conexão falhou.
+
+        POST bem-sucedido redireciona; 200 num POST é o formulário de volta com erros.
+        """
+        inicio = time.perf_counter()
+        try:
+            status, corpo = self._enviar(metodo, caminho, dados)
+        except (http.client.HTTPException, OSError):
+            status, corpo = 0, b''
+        if self.resultados is not None:
+            ok = 300 <= status < 400 if metodo == 'POST' else 200 <= status < 400
+            self.resultados.registrar(rotulo, (time.perf_counter() - inicio) * 1000, not ok)
+        return status, corpo
+
+    def formulario(self, rotulo, caminho):
+        """Campos do formulário da página (o GET também é medido)"""
+        _, corpo = self.requisitar(rotulo, 'GET', caminho)
+        leitor = _Formulario()
+        leitor.feed(corpo.decode('utf-8', 'replace'))
+        return leitor.campos
+
+
+# ==================== MISTURA DE ROTAS ====================
+
+# (rótulo, peso, ação(sessao, aleatorio, totais, rotulo)). Os POSTs fazem
+# antes o GET do formulário, como o navegador, medido com o rótulo da página.
+
+def _get(caminho):
+    return lambda sessao, aleatorio, totais, rotulo: sessao.requisitar(rotulo, 'GET', caminho(aleatorio, totais))
+
+
+def _id(aleatorio, totais, chave):
+    return aleatorio.randint(1, totais[chave])
+
+
+def _post_status_pedido(sessao, aleatorio, totais, rotulo):
+    id = _id(aleatorio, totais, 'pedidos')
+    campos = sessao.formulario('pedido', f'/pedidos/{id}')
+    campos.update(status_entrega=aleatorio.choice(STATUS_PEDIDO), data_entrega_real='')
+    sessao.requisitar(rotulo, 'POST', f'/pedidos/{id}/status', campos)
+
+
+def _post_editar_cliente(sessao, aleatorio, totais, rotulo):
+    id = _id(aleatorio, totais, 'clientes')
+    campos = sessao.formulario('cliente_editar', f'/clientes/{id}/editar')
+    campos.update(limite_credito=str(aleatorio.choice([5000, 10000, 25000, 50000])), ignorar_duplicados='1')
+    sessao.requisitar(rotulo, 'POST', f'/clientes/{id}/editar', campos)
+
+
+def _post_converter_cotacao(sessao, aleatorio, totais, rotulo):
+    # O token vale para a sessão toda; pega o de uma página com formulário
+    if not sessao.csrf:
+        sessao.csrf = sessao.formulario('pedido', f'/pedidos/{_id(aleatorio, totais, "pedidos")}').get('csrf_token')
+    sessao.requisitar(rotulo, 'POST', f'/cotacoes/{_id(aleatorio, totais, "cotacoes")}/converter',
+                      {'csrf_token': sessao.csrf or ''})
+
+
+MISTURA = [
+    ('inicio', 5, _get(lambda a, t: '/')),
+    ('clientes', 10, _get(lambda a, t: f'/clientes?page={a.randint(1, 20)}')),
+    ('clientes_busca', 15, _get(lambda a, t: '/clientes?' + urlencode({'search': a.choice(TERMOS_BUSCA + NOMES)}))),
+    ('cliente', 12, _get(lambda a, t: f'/clientes/{_id(a, t, "clientes")}')),
+    ('cliente_pedidos', 5, _get(lambda a, t: f'/clientes/{_id(a, t, "clientes")}/pedidos')),
+    ('pedidos_status', 10, _get(lambda a, t: '/pedidos?' + urlencode({'status': a.choice(STATUS_PEDIDO)}))),
+    ('pedido', 10, _get(lambda a, t: f'/pedidos/{_id(a, t, "pedidos")}')),
+    ('relatorios', 3, _get(lambda a, t: '/relatorios')),
+    ('api_analise', 3, _get(lambda a, t: '/api/relatorios/analise?inicio=2024-01-01&fim=2024-12-31')),
+    ('api_cliente', 10, _get(lambda a, t: f'/api/clientes/{_id(a, t, "clientes")}')),
+    ('POST pedido_status', 4, _post_status_pedido),
+    ('POST cliente_editar', 2, _post_editar_cliente),
+    ('POST cotacao_converter', 1, _post_converter_cotacao),
+]
+
+
+# ==================== EXECUÇÃO ====================
+
+class Resultados:
+    """Latências (ms) e erros por rótulo, de todas as threads"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.latencias = {}
+        self.erros = {}
+        self.medindo = False
+
+    def registrar(self, rotulo, ms, erro):
+        if not self.medindo:
+            return
+        with self._trava:
+            self.latencias.setdefault(rotulo, []).append(ms)
+            if erro:
+                self.erros[rotulo] = self.erros.get(rotulo, 0) + 1
+
+
+def _trabalhador(url, indice, semente, totais, resultados, parar):
+    aleatorio = random.Random(semente + indice)
+    sessao = Sessao(url, resultados)
+    rotulos, pesos = [r for r, _, _ in MISTURA], [p for _, p, _ in MISTURA]
+    acoes = {r: acao for r, _, acao in MISTURA}
+    while not parar.is_set():
+        rotulo = aleatorio.choices(rotulos, pesos)[0]
+        acoes[rotulo](sessao, aleatorio, totais, rotulo)
+
+
+def percentil(valores, p):
+    """Percentil por posição (nearest-rank) de uma lista ordenada"""
+    return valores[max(math.ceil(p / 100 * len(valores)) - 1, 0)]
+
+
+def executar(url, args, totais):
+    """Aquecimento, medição e resumo {rotas, requisicoes, erros, vazao}"""
+    resultados, parar = Resultados(), threading.Event()
+    threads = [threading.Thread(target=_trabalhador, daemon=True,
+                                args=(url, i, args.semente, totais, resultados, parar))
+               for i in range(args.concorrencia)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.aquecimento)
+    resultados.medindo = True
+    time.sleep(args.duracao)
+    resultados.medindo = False
+    parar.set()
+    for thread in threads:
+        thread.join()
+
+    rotas = {}
+    for rotulo, valores in sorted(resultados.latencias.items()):
+        valores.sort()
+        rotas[rotulo] = {
+            'requisicoes': len(valores), 'erros': resultados.erros.get(rotulo, 0),
+            **{f'p{p}': round(percentil(valores, p), 2) for p in (50, 95, 99)},
+            'max': round(valores[-1], 2),
+        }
+    total = sum(rota['requisicoes'] for rota in rotas.values())
+    return {
+        'rotas': rotas,
+        'requisicoes': total,
+        'erros': sum(rota['erros'] for rota in rotas.values()),
+        'vazao': round(total / args.duracao, 1),
+    }
+
+
+def imprimir(resultado):
+    print(f'\n{"rota":<24}{"req":>7}{"erros":>7}{"p50":>9}{"p95":>9}{"p99":>9}{"max":>9}  (ms)')
+    for rotulo, rota in resultado['rotas'].items():
+        print(f'{rotulo:<24}{rota["requisicoes"]:>7}{rota["erros"]:>7}{rota["p50"]:>9.1f}'
+              f'{rota["p95"]:>9.1f}{rota["p99"]:>9.1f}{rota["max"]:>9.1f}')
+    print(f'\n{resultado["requisicoes"]} requisições, {resultado["erros"]} erros, '
+          f'{resultado["vazao"]:.1f} req/s')
+
+
+def comparar(resultado, base, tolerancia):
+    """Mensagens de regressão do p95 por rota e da vazão em relação à base"""
+    regressoes = []
+    for rotulo, rota in resultado['rotas'].items():
+        anterior = base['rotas'].get(rotulo)
+        if anterior and rota['p95'] > anterior['p95'] * (1 + tolerancia) \
+                and rota['p95'] - anterior['p95'] > PISO_REGRESSAO_MS:
+            regressoes.append(f'{rotulo}: p95 {anterior["p95"]:.1f} -> {rota["p95"]:.1f} ms')
+    if resultado['vazao'] < base['vazao'] * (1 - tolerancia):
+        regressoes.append(f'vazão {base["vazao"]:.1f} -> {resultado["vazao"]:.1f} req/s')
+    return regressoes
+
+
+# ==================== SERVIDOR ====================
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def subir_gunicorn(database_url, workers, log):
+    """Processo do gunicorn (configuração de produção) e a URL, quando estiver respondendo"""
+    porta = _porta_livre()
+    ambiente = dict(os.environ, DATABASE_URL=database_url, PORT=str(porta),
+                    WEB_CONCURRENCY=str(workers), GUNICORN_LOGLEVEL='warning')
+    processo = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                                cwd=RAIZ, env=ambiente, stdout=subprocess.DEVNULL, stderr=log)
+    url = f'http://127.0.0.1:{porta}'
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            break
+        try:
+            if Sessao(url)._enviar('GET', '/')[0] < 500:
+                return processo, url
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise SystemExit(f'❌ O gunicorn não respondeu; veja {log.name}')
+
+
+def popular_banco(args, total_clientes):
+    """Gera a base com a semente; retorna (DATABASE_URL, totais por tabela)"""
+    from benchmarks.semente import popular
+
+    from app import app, db
+    with app.app_context():
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)}')
+        if args.manter_dados:
+            from app.models import Cliente, Cotacao, Pedido
+            totais = {'clientes': Cliente.query.count(), 'cotacoes': Cotacao.query.count(),
+                      'pedidos': Pedido.query.count()}
+        else:
+            print(f'Populando {total_clientes} clientes (semente {args.semente})...')
+            inicio = time.perf_counter()
+            totais = popular(total_clientes, args.semente)
+            print(f'Base gerada em {time.perf_counter() - inicio:.0f} s: '
+                  + ', '.join(f'{nome} {quantidade}' for nome, quantidade in totais.items()))
+        url = db.engine.url.render_as_string(hide_password=False)
+        db.engine.dispose()
+    return url, totais
+
+
+def main():
+    args = _argumentos()
+    total_clientes = args.clientes or ESCALAS[args.escala]
+    if not args.usar_banco and not args.url:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'carga.db')
+
+    processo = None
+    if args.url:
+        # Base da mesma semente: há pelo menos tantos pedidos e cotações quanto clientes
+        url, totais = args.url.rstrip('/'), {'clientes': total_clientes}
+    else:
+        database_url, totais = popular_banco(args, total_clientes)
+        log = tempfile.NamedTemporaryFile('w', prefix='gunicorn-', suffix='.log', delete=False)
+        processo, url = subir_gunicorn(database_url, args.workers, log)
+        print(f'gunicorn em {url} ({args.workers} workers, log em {log.name})')
+    totais = {chave: totais.get(chave) or total_clientes for chave in ('clientes', 'cotacoes', 'pedidos')}
+
+    print(f'Aquecendo {args.aquecimento:.0f} s e medindo {args.duracao:.0f} s '
+          f'com {args.concorrencia} conexões...')
+    try:
+        resultado = executar(url, args, totais)
+    finally:
+        if processo:
+            processo.terminate()
+            processo.wait()
+    resultado = {
+        'clientes': total_clientes, 'concorrencia': args.concorrencia,
+        'banco': 'url' if args.url else os.environ.get('DATABASE_URL', '').split(':', 1)[0],
+        **resultado,
+    }
+    imprimir(resultado)
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            arquivo.write('\n')
+        print(f'Resultado salvo em {args.salvar}')
+
+    falhou = resultado['erros'] > 0
+    if falhou:
+        print(f'❌ {resultado["erros"]} requisições com erro')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            base = json.load(arquivo)
+        if (base['clientes'], base['concorrencia']) != (total_clientes, args.concorrencia):
+            print(f'⚠️  Base gerada com {base["clientes"]} clientes e {base["concorrencia"]} conexões; '
+                  'comparação ignorada')
+        else:
+            regressoes = comparar(resultado, base, args.tolerancia)
+            for regressao in regressoes:
+                print(f'❌ Regressão: {regressao}')
+            falhou = falhou or bool(regressoes)
+            if not regressoes:
+                print(f'✅ Sem regressões em relação a {args.baseline} (tolerância {args.tolerancia:.0%})')
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == '__main__':
+    main()
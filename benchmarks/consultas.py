@@ -0,0 +1,262 @@
+"""Micro-benchmarks das consultas das rotas (controllers.py), sem HTTP nem templates.
+
+Para cada escala, popula um banco descartável com benchmarks/semente.py (ou
+o de DATABASE_URL, se --usar-banco) e executa as mesmas consultas que as
+rotas emitem: contadores do dashboard (quente e frio), resumos de
+/relatorios, análise mensal, listas paginadas na primeira página e em uma
+página profunda (cursor a 90% da lista), busca, páginas de detalhe e
+seções do cliente. Mede, por caso:
+
+    comandos  comandos SQL emitidos
+    linhas    linhas devolvidas pelos SELECTs (reexecutados com COUNT(*))
+    mediana / p95   tempo de parede em ms (sessão limpa a cada execução)
+    KiB       pico de memória alocada pelo Python (tracemalloc)
+
+Com --salvar grava o resultado em JSON; com --comparar mostra a variação
+em relação a um resultado salvo, para avaliar reescritas e índices.
+
+Uso:
+    python benchmarks/consultas.py
+    python benchmarks/consultas.py --escalas 10000,100000 --salvar antes.json
+    python benchmarks/consultas.py --escalas 10000,100000 --comparar antes.json
+    DATABASE_URL=postgresql://... python benchmarks/consultas.py --usar-banco --escalas 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escalas', default='2000,20000', help='clientes por escala, separados por vírgula')
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--casos', help='só os casos que começam com estes prefixos (vírgulas)')
+    parser.add_argument('--salvar', help='grava o resultado em JSON')
+    parser.add_argument('--comparar', help='resultado salvo para comparar')
+    parser.add_argument('--usar-banco', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (APAGA os dados)')
+    return parser.parse_args()
+
+
+ARGS = _argumentos()
+if not ARGS.usar_banco:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'consultas.db')
+
+from sqlalchemy import event, func, select  # noqa: E402
+from sqlalchemy.orm import joinedload, selectinload  # noqa: E402
+
+from app import app, db  # noqa: E402
+from app import analise, contadores, controllers, itens, resumos  # noqa: E402
+from app.busca import buscar_clientes  # noqa: E402
+from app.models import Cliente, Cotacao, Pedido  # noqa: E402
+from app.paginacao import codificar_cursor, paginar_cursor  # noqa: E402
+from benchmarks.semente import popular  # noqa: E402
+
+# Registros de detalhe percorridos em rodízio (ids espalhados pela base)
+AMOSTRAS_DETALHE = 16
+PROFUNDIDADE = 0.9
+
+
+# ==================== CASOS ====================
+
+def _cursor_profundo(query, colunas, descendente=False):
+    """?cursor= da página que começa a PROFUNDIDADE da lista (como se o usuário tivesse navegado até lá)"""
+    total = query.order_by(None).count()
+    posicao = int(total * PROFUNDIDADE)
+    ordem = [c.desc() if descendente else c.asc() for c in colunas]
+    linha = query.order_by(*ordem).offset(posicao).first()
+    if linha is None:
+        return ''
+    chave = [getattr(linha, coluna.key) for coluna in colunas]
+    return codificar_cursor(chave, 'next', posicao // app.config['ITEMS_PER_PAGE'] + 1, total)
+
+
+def _lista_pedidos(status=''):
+    query = Pedido.query.options(joinedload(Pedido.cliente))
+    if status:
+        query = query.filter_by(status_entrega=status)
+    return query
+
+
+def _lista_cotacoes():
+    return Cotacao.query.options(joinedload(Cotacao.cliente))
+
+
+def montar_casos(totais):
+    """[(nome, caminho da requisição simulada, função)] espelhando as rotas"""
+    def _ids(total):
+        passo = max(total // AMOSTRAS_DETALHE, 1)
+        return [1 + i * passo for i in range(AMOSTRAS_DETALHE)]
+
+    ids_clientes, ids_pedidos = _ids(totais['clientes']), _ids(totais['pedidos'])
+    rodizio = {'cliente': 0, 'pedido': 0}
+
+    def _proximo(tipo, ids):
+        rodizio[tipo] = (rodizio[tipo] + 1) % len(ids)
+        return ids[rodizio[tipo]]
+
+    clientes_ativos = [Cliente.nome, Cliente.id]
+    data_id = [Pedido.data_criacao, Pedido.id]
+    with app.test_request_context():
+        profundo_clientes = _cursor_profundo(Cliente.query.filter_by(ativo=True), clientes_ativos)
+        profundo_pedidos = _cursor_profundo(_lista_pedidos('Pendente'), data_id, descendente=True)
+        profundo_cotacoes = _cursor_profundo(_lista_cotacoes(), [Cotacao.data_criacao, Cotacao.id],
+                                             descendente=True)
+
+    return [
+        ('dashboard.contadores', '/', contadores.ler_contadores),
+        # Caminho frio do dashboard: contadores ausentes, uma consulta agregada
+        ('dashboard.contadores_frio', '/', contadores.calcular_contadores),
+        ('relatorios.resumos', '/relatorios', resumos.ler_resumos),
+        ('relatorios.analise_12_meses', '/api/relatorios/analise',
+         lambda: analise.analisar(inicio=date(2024, 1, 1), fim=date(2024, 12, 31))),
+        ('relatorios.produtos', '/api/relatorios/produtos', itens.vendas_por_produto),
+        ('clientes.pagina_1', '/clientes',
+         lambda: paginar_cursor(Cliente.query.filter_by(ativo=True), clientes_ativos).items),
+        ('clientes.pagina_profunda', f'/clientes?cursor={profundo_clientes}',
+         lambda: paginar_cursor(Cliente.query.filter_by(ativo=True), clientes_ativos).items),
+        ('clientes.busca', '/clientes?search=horizonte', lambda: buscar_clientes('horizonte', 50)),
+        ('pedidos.pagina_1', '/pedidos',
+         lambda: paginar_cursor(_lista_pedidos(), data_id, descendente=True).items),
+        ('pedidos.status_pagina_1', '/pedidos?status=Pendente',
+         lambda: paginar_cursor(_lista_pedidos('Pendente'), data_id, descendente=True).items),
+        ('pedidos.status_pagina_profunda', f'/pedidos?status=Pendente&cursor={profundo_pedidos}',
+         lambda: paginar_cursor(_lista_pedidos('Pendente'), data_id, descendente=True).items),
+        ('cotacoes.pagina_profunda', f'/cotacoes?cursor={profundo_cotacoes}',
+         lambda: paginar_cursor(_lista_cotacoes(), [Cotacao.data_criacao, Cotacao.id], descendente=True).items),
+        ('cliente.detalhe', '/clientes/1',
+         lambda: controllers._cliente_com_resumo(_proximo('cliente', ids_clientes))),
+        ('cliente.secao_pedidos', '/clientes/1/pedidos',
+         lambda: controllers._pagina_secao(_proximo('cliente', ids_clientes), 'pedidos').items),
+        ('cliente.versao', '/clientes/1', lambda: controllers._versao_cliente(_proximo('cliente', ids_clientes))),
+        ('pedido.detalhe', '/pedidos/1',
+         lambda: Pedido.query.options(joinedload(Pedido.cliente), selectinload(Pedido.linhas))
+         .get(_proximo('pedido', ids_pedidos))),
+        ('pedido.versao', '/pedidos/1', lambda: controllers._versao_pedido(_proximo('pedido', ids_pedidos))),
+        ('api.cliente', '/api/clientes/1', lambda: db.session.get(Cliente, _proximo('cliente', ids_clientes)).to_dict()),
+    ]
+
+
+# ==================== MEDIÇÃO ====================
+
+class _Captura:
+    """Comandos SQL emitidos enquanto ativa"""
+
+    def __init__(self):
+        self.comandos = []
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self._ouvir)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self._ouvir)
+
+    def _ouvir(self, conn, cursor, statement, parameters, context, executemany):
+        self.comandos.append((statement, parameters))
+
+
+def _linhas(comandos):
+    """Linhas devolvidas pelos SELECTs capturados"""
+    total = 0
+    with db.engine.connect() as conn:
+        for statement, parameters in comandos:
+            if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                total += conn.exec_driver_sql(f'SELECT COUNT(*) FROM ({statement}) AS medida', parameters).scalar()
+    return total
+
+
+def _executar(funcao):
+    """Executa com a sessão limpa (sem identity map nem transação aberta)"""
+    db.session.remove()
+    resultado = funcao()
+    db.session.remove()
+    return resultado
+
+
+def medir(caminho, funcao, repeticoes):
+    with app.test_request_context(caminho):
+        with _Captura() as captura:
+            _executar(funcao)
+        linhas = _linhas(captura.comandos)
+
+        tracemalloc.start()
+        _executar(funcao)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            _executar(funcao)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'comandos': len(captura.comandos),
+        'linhas': linhas,
+        'mediana_ms': round(tempos[len(tempos) // 2], 3),
+        'p95_ms': round(tempos[min(int(len(tempos) * 0.95), len(tempos) - 1)], 3),
+        'pico_kib': round(pico / 1024, 1),
+    }
+
+
+# ==================== RELATÓRIO ====================
+
+def _variacao(atual, anterior):
+    if not anterior:
+        return ''
+    return f'{(atual / anterior - 1) * 100:+6.0f}%'
+
+
+def imprimir(escala, resultados, anteriores):
+    print(f'\n{escala} clientes')
+    print(f'{"caso":<32}{"cmds":>5}{"linhas":>8}{"mediana":>10}{"p95":>9}{"KiB":>9}'
+          + ('   Δ mediana' if anteriores else ''))
+    for nome, r in resultados.items():
+        anterior = anteriores.get(nome, {})
+        comandos = f'{r["comandos"]:>5}' if anterior.get('comandos', r['comandos']) == r['comandos'] \
+            else f'{anterior["comandos"]}→{r["comandos"]}'.rjust(5)
+        print(f'{nome:<32}{comandos}{r["linhas"]:>8}{r["mediana_ms"]:>10.2f}{r["p95_ms"]:>9.2f}'
+              f'{r["pico_kib"]:>9.1f}' + (f'   {_variacao(r["mediana_ms"], anterior.get("mediana_ms"))}'
+                                         if anteriores else ''))
+
+
+def main():
+    anteriores = {}
+    if ARGS.comparar:
+        with open(ARGS.comparar, encoding='utf-8') as arquivo:
+            anteriores = json.load(arquivo)
+    prefixos = tuple(ARGS.casos.split(',')) if ARGS.casos else ('',)
+
+    saida = {}
+    with app.app_context():
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)}')
+        for escala in (int(valor) for valor in ARGS.escalas.split(',')):
+            inicio = time.perf_counter()
+            popular(escala, ARGS.semente, progresso=None)
+            totais = {'clientes': escala,
+                      'pedidos': db.session.scalar(select(func.max(Pedido.id))) or 1}
+            print(f'\nBase de {escala} clientes gerada em {time.perf_counter() - inicio:.0f} s')
+
+            resultados = {nome: medir(caminho, funcao, ARGS.repeticoes)
+                          for nome, caminho, funcao in montar_casos(totais) if nome.startswith(prefixos)}
+            saida[str(escala)] = resultados
+            imprimir(escala, resultados, anteriores.get(str(escala), {}))
+
+    if ARGS.salvar:
+        with open(ARGS.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump(saida, arquivo, ensure_ascii=False, indent=2)
+            arquivo.write('\n')
+        print(f'\nResultado salvo em {ARGS.salvar}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Vazão da importação de clientes (app/importacao.py), em linhas por segundo.
+
+Gera um CSV determinístico (--linhas, com ~1% de linhas inválidas e
+emails de algumas centenas de domínios, como uma base real), importa em
+um banco descartável (ou no de DATABASE_URL, se --usar-banco) com cada
+valor de --processos e mostra linhas/s e onde o tempo foi (validação nos
+processos auxiliares x gravação). Falha (código 1) se a importação com
+1 processo ficar abaixo de --minimo-1 ou a com mais processos abaixo de
+--minimo-n.
+
+A validação (email_validator e phonenumbers, em Python, ~170 µs por linha)
+é a parte cara e é a que se divide entre os processos; a gravação é serial,
+lote a lote. Com 1 processo o esperado é ~3 mil linhas/s. As 10 mil
+linhas/s pedem --processos 4 ou mais, com esses núcleos livres, e o
+PostgreSQL (COPY): no SQLite a gravação sozinha, com o trigger do FTS5,
+fica em ~6 mil linhas/s (use --minimo-n 5000 para medir localmente).
+
+Uso:
+    python benchmarks/importacao.py
+    python benchmarks/importacao.py --linhas 100000 --processos 1,4,8 --minimo-n 10000
+    DATABASE_URL=postgresql://... python benchmarks/importacao.py --usar-banco
+"""
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, default=20000)
+    parser.add_argument('--processos', default=f'1,{max(os.cpu_count() or 1, 2)}',
+                        help='valores de --processos a medir, separados por vírgula')
+    parser.add_argument('--lote', type=int, default=5000)
+    parser.add_argument('--minimo-1', type=float, default=float(os.environ.get('IMPORTACAO_MINIMO_1', 2500)),
+                        help='linhas/s mínimas com 1 processo')
+    parser.add_argument('--minimo-n', type=float, default=float(os.environ.get('IMPORTACAO_MINIMO_N', 10000)),
+                        help='linhas/s mínimas com mais de 1 processo')
+    parser.add_argument('--usar-banco', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (APAGA os dados)')
+    return parser.parse_args()
+
+
+ARGS = _argumentos()
+if not ARGS.usar_banco:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'importacao.db')
+
+from app import app, db, importacao  # noqa: E402
+
+DDDS = ['11', '21', '31', '41', '48', '51', '81', '85']
+CANAIS = ['Revenda', 'Indústria', 'Consumidor']
+AREAS = ['Construção', 'Varejo', 'Saúde', 'Educação', 'Tecnologia']
+
+
+# ==================== ARQUIVO ====================
+
+def gerar_csv(total):
+    """CSV com `total` linhas; ~1% com telefone, email ou canal inválido"""
+    aleatorio = random.Random(42)
+    dominios = [f'empresa{i}.com.br' for i in range(300)] + ['gmail.com', 'hotmail.com', 'outlook.com']
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(importacao.CAMPOS)
+    for i in range(total):
+        telefone = f'({aleatorio.choice(DDDS)}) 9{aleatorio.randint(6000, 9999)}-{aleatorio.randint(0, 9999):04d}'
+        email = f'contato{i}@{aleatorio.choice(dominios)}'
+        canal = aleatorio.choice(CANAIS)
+        defeito = aleatorio.random()
+        if defeito < 0.004:
+            telefone = '123'
+        elif defeito < 0.007:
+            email = f'contato{i}.sem-arroba'
+        elif defeito < 0.01:
+            canal = 'Outro'
+        escritor.writerow([f'Cliente {i:07d}', telefone, email, f'Empresa {i % 5000:04d} Ltda',
+                           f'{aleatorio.randint(0, 50000)},00', aleatorio.choice(AREAS), canal,
+                           f'Rua {i}, {aleatorio.randint(1, 999)}'])
+    return buffer.getvalue()
+
+
+# ==================== MEDIÇÃO ====================
+
+def medir(texto, processos):
+    """(resultado, segundos, segundos gravando) de uma importação em banco vazio"""
+    db.drop_all()
+    db.create_all()
+    gravar, gravando = importacao._gravar, [0.0]
+
+    def _gravar_medido(linhas):
+        inicio = time.perf_counter()
+        gravar(linhas)
+        gravando[0] += time.perf_counter() - inicio
+
+    importacao._gravar = _gravar_medido
+    try:
+        inicio = time.perf_counter()
+        resultado = importacao.importar_clientes(importacao.ler_csv(io.StringIO(texto)),
+                                                 tamanho_lote=ARGS.lote, processos=processos)
+        return resultado, time.perf_counter() - inicio, gravando[0]
+    finally:
+        importacao._gravar = gravar
+
+
+def main():
+    processos = [int(valor) for valor in ARGS.processos.split(',')]
+    texto = gerar_csv(ARGS.linhas)
+    falhas = []
+    with app.app_context():
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)} '
+              f'({os.cpu_count()} núcleos, lote {ARGS.lote})')
+        for quantidade in processos:
+            resultado, segundos, gravando = medir(texto, quantidade)
+            vazao = ARGS.linhas / segundos
+            minimo = ARGS.minimo_1 if quantidade == 1 else ARGS.minimo_n
+            print(f'--processos {quantidade}: {vazao:8.0f} linhas/s  ({resultado.importados} importadas, '
+                  f'{resultado.total_erros} com erro, {segundos:.1f} s, {gravando:.1f} s gravando; '
+                  f'mínimo {minimo:.0f})')
+            if vazao < minimo:
+                falhas.append(f'--processos {quantidade}: {vazao:.0f} linhas/s, abaixo de {minimo:.0f}')
+
+    for falha in falhas:
+        print(f'❌ {falha}')
+    if falhas:
+        sys.exit(1)
+    print('✅ Acima dos mínimos')
+
+
+if __name__ == '__main__':
+    main()
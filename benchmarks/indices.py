@@ -0,0 +1,209 @@
+"""Planos de consulta das rotas de listagem, sem e com os índices dos modelos.
+
+Popula um banco descartável (ou o de DATABASE_URL, se --usar-banco), executa
+cada rota pelo test client, captura os SELECTs que ela emitiu e mostra o
+plano (EXPLAIN / EXPLAIN QUERY PLAN) e o tempo da rota em duas fases: com os
+índices removidos e depois de recriados.
+
+Uso:
+    python benchmarks/indices.py
+    python benchmarks/indices.py --clientes 5000 --registros 200000
+    DATABASE_URL=postgresql://... python benchmarks/indices.py --usar-banco
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=2000)
+    parser.add_argument('--registros', type=int, default=50000,
+                        help='cotações e pedidos (cada); interações = metade')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--usar-banco', action='store_true',
+                        help='usa DATABASE_URL em vez de um SQLite temporário (APAGA os dados)')
+    return parser.parse_args()
+
+
+ARGS = _argumentos()
+if not ARGS.usar_banco:
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'indices.db')
+
+from sqlalchemy import event, insert, text  # noqa: E402
+
+from app import app, db  # noqa: E402
+from app.models import Cliente, Cotacao, Interacao, Pedido  # noqa: E402
+from app.utils import montar_texto_busca  # noqa: E402
+
+STATUS_COTACAO = ['Enviada', 'Aprovada', 'Recusada']
+STATUS_PEDIDO = ['Pendente', 'Em processamento', 'Enviado', 'Entregue', 'Cancelado']
+CANAIS = ['Revenda', 'Indústria', 'Consumidor']
+
+
+# ==================== CARGA ====================
+
+def popular(total_clientes, total_registros):
+    """Carga determinística (seed fixa) com executemany em lotes"""
+    aleatorio = random.Random(42)
+    inicio = datetime(2023, 1, 1)
+    db.drop_all()
+    db.create_all()
+
+    def _gravar(tabela, linhas):
+        for i in range(0, len(linhas), 5000):
+            db.session.execute(insert(tabela), linhas[i:i + 5000])
+
+    clientes = []
+    for i in range(1, total_clientes + 1):
+        nome, empresa = f'Cliente {i:06d}', f'Empresa {i % 500}'
+        email, telefone = f'cliente{i}@exemplo.com.br', f'(11) 9{i:04d}-{i % 10000:04d}'
+        clientes.append({
+            'id': i, 'nome': nome, 'empresa': empresa, 'email': email, 'telefone': telefone,
+            'canal_vendas': aleatorio.choice(CANAIS), 'ativo': aleatorio.random() > 0.1,
+            'data_cadastro': inicio, 'limite_credito': 0.0,
+            'texto_busca': montar_texto_busca(nome, empresa, email, telefone),
+        })
+    _gravar(Cliente.__table__, clientes)
+
+    def _data():
+        return inicio + timedelta(minutes=aleatorio.randrange(60 * 24 * 730))
+
+    _gravar(Cotacao.__table__, [{
+        'id_cotacao': f'C{i:09d}', 'cliente_id': aleatorio.randint(1, total_clientes),
+        'itens': 'Item', 'valor_total': aleatorio.uniform(100, 10000),
+        'status': aleatorio.choice(STATUS_COTACAO), 'data_criacao': _data(),
+    } for i in range(total_registros)])
+    _gravar(Pedido.__table__, [{
+        'id_pedido': f'P{i:09d}', 'cliente_id': aleatorio.randint(1, total_clientes),
+        'cotacao_id': i + 1 if aleatorio.random() < 0.2 else None,
+        'itens': 'Item', 'valor_final': aleatorio.uniform(100, 10000),
+        'status_entrega': aleatorio.choice(STATUS_PEDIDO), 'data_criacao': _data(),
+    } for i in range(total_registros)])
+    _gravar(Interacao.__table__, [{
+        'cliente_id': aleatorio.randint(1, total_clientes), 'tipo': 'Telefone',
+        'descricao': 'Contato', 'data_hora': _data(),
+    } for _ in range(total_registros // 2)])
+    db.session.commit()
+
+
+# ==================== ÍNDICES ====================
+
+def _indices():
+    return [indice for tabela in db.metadata.sorted_tables for indice in tabela.indexes
+            if tabela.name in ('clientes', 'cotacoes', 'pedidos', 'interacoes')]
+
+
+def remover_indices():
+    with db.engine.begin() as conn:
+        for indice in _indices():
+            indice.drop(conn, checkfirst=True)
+        conn.execute(text('ANALYZE'))
+
+
+def criar_indices():
+    with db.engine.begin() as conn:
+        for indice in _indices():
+            indice.create(conn, checkfirst=True)
+        conn.execute(text('ANALYZE'))
+
+
+# ==================== PLANOS ====================
+
+def rotas():
+    """Rotas que listam ou detalham, com os filtros usados na interface"""
+    return [
+        '/clientes',
+        '/cotacoes',
+        '/cotacoes?status=Aprovada',
+        '/pedidos',
+        '/pedidos?status=Entregue',
+        '/pedidos?inicio=2024-06-01&fim=2024-06-30',
+        '/pedidos/exportar?status=Pendente&inicio=2024-01-01&fim=2024-01-31',
+        '/clientes/7',
+        '/clientes/7/pedidos',
+        '/clientes/7/cotacoes',
+    ]
+
+
+def capturar_selects(cliente_http, url):
+    """Executa a rota e devolve os SELECTs (com parâmetros) que ela emitiu"""
+    capturados = []
+
+    def _ouvir(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            capturados.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', _ouvir)
+    try:
+        resposta = cliente_http.get(url)
+        resposta.get_data()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _ouvir)
+    assert resposta.status_code == 200, f'{url}: HTTP {resposta.status_code}'
+    return capturados
+
+
+def plano(statement, parameters):
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            linhas = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).all()
+            return [linha[0] for linha in linhas]
+        linhas = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        return [linha[-1] for linha in linhas]
+
+
+def cronometrar(cliente_http, url, repeticoes):
+    """Mediana do tempo da rota, em ms"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        cliente_http.get(url).get_data()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return sorted(tempos)[len(tempos) // 2]
+
+
+def executar_fase(titulo, cliente_http, repeticoes):
+    print(f'\n==================== {titulo.upper()} ====================')
+    resultados = {}
+    for url in rotas():
+        selects = capturar_selects(cliente_http, url)
+        resultados[url] = cronometrar(cliente_http, url, repeticoes)
+        print(f'\n{url}  ({resultados[url]:.1f} ms)')
+        for statement, parameters in selects:
+            # Contadores/resumos/sessão não interessam aqui
+            if 'FROM contadores' in statement or 'FROM resumo' in statement:
+                continue
+            print('   ' + ' '.join(statement.split())[:110])
+            for linha in plano(statement, parameters):
+                print(f'      -> {linha}')
+    return resultados
+
+
+def main():
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)}')
+        print(f'Populando {ARGS.clientes} clientes e {ARGS.registros} cotações/pedidos...')
+        popular(ARGS.clientes, ARGS.registros)
+
+        cliente_http = app.test_client()
+        remover_indices()
+        sem = executar_fase('sem índices', cliente_http, ARGS.repeticoes)
+        criar_indices()
+        com = executar_fase('com índices', cliente_http, ARGS.repeticoes)
+
+    print('\n==================== RESUMO (mediana, ms) ====================')
+    print(f"{'rota':<70}{'sem':>10}{'com':>10}")
+    for url in rotas():
+        print(f'{url:<70}{sem[url]:>10.1f}{com[url]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Carga determinística de clientes, interações, cotações e pedidos.
+
+Os formatos seguem os dados de exemplo de dados_db.py (segmentos, canais,
+DDDs, produtos e status), multiplicados até a escala pedida; a mesma
+semente gera sempre a mesma base. Usada pelo teste de carga
+(benchmarks/carga.py); também roda sozinha para popular um banco:
+
+    python benchmarks/semente.py --escala 100k                    # SQLite em instance/
+    DATABASE_URL=postgresql://... python benchmarks/semente.py --escala 1m
+
+APAGA os dados do banco de DATABASE_URL.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ESCALAS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Data final fixa: a base não muda com o dia em que é gerada
+DATA_FINAL = datetime(2024, 12, 31, 18, 0)
+DIAS_HISTORICO = 730
+
+# Formatos de dados_db.py
+SEGMENTOS = [
+    'Tecnologia da Informação', 'Varejo Alimentício', 'Construção Civil', 'Saúde', 'Educação',
+    'Alimentação', 'Indústria Metalúrgica', 'Farmacêutico', 'Fitness e Bem-estar', 'Serviços Jurídicos',
+]
+CANAIS = ['Indústria', 'Revenda', 'Consumidor']
+DDDS = ['11', '21', '85', '81', '48', '31', '41', '51']
+PREFIXOS = ['Tech', 'Supermercado', 'Construtora', 'Clínica', 'Escola', 'Restaurante', 'Indústria',
+            'Farmácia', 'Academia', 'Escritório', 'Distribuidora', 'Comercial']
+NOMES = ['Solutions', 'Bom Preço', 'Alicerce', 'Saúde Total', 'Futuro Brilhante', 'Sabor & Arte',
+         'Metal Forte', 'Popular', 'Corpo e Mente', 'Advocacia', 'Horizonte', 'Central', 'Aliança',
+         'Nova Era', 'Progresso', 'Paulista', 'Nordeste', 'Litoral', 'Serra', 'Vale']
+PRODUTOS = [
+    ('Licenças Software', 'un', 900.0), ('Computadores', 'un', 3500.0), ('Servidor', 'un', 18000.0),
+    ('Checkouts', 'un', 4200.0), ('Balanças', 'un', 1500.0), ('cimento CP-II 50kg', 'saco', 32.5),
+    ('areia', 'm³', 120.0), ('brita', 'm³', 140.0), ('ferro 10mm', 't', 5200.0),
+    ('Macas elétricas', 'un', 6400.0), ('Impressoras', 'un', 1200.0), ('aço carbono', 't', 4800.0),
+    ('alumínio', 't', 9500.0), ('Esteiras', 'un', 7800.0), ('Mesas executivas', 'un', 1100.0),
+    ('Instalação e treinamento', 'h', 180.0),
+]
+TIPOS_INTERACAO = ['Telefone', 'Email', 'Reunião', 'WhatsApp', 'Visita', 'Outro']
+STATUS_COTACAO = ['Enviada', 'Aprovada', 'Recusada']
+STATUS_PEDIDO = ['Pendente', 'Em processamento', 'Enviado', 'Entregue', 'Cancelado']
+
+# Por cliente, em média: interações, cotações e pedidos
+MEDIA_INTERACOES = 3
+MEDIA_COTACOES = 2
+MEDIA_PEDIDOS = 2
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='10k')
+    parser.add_argument('--clientes', type=int, help='quantidade exata (em vez de --escala)')
+    parser.add_argument('--semente', type=int, default=42)
+    return parser.parse_args()
+
+
+# ==================== GERAÇÃO ====================
+
+def _telefone(aleatorio):
+    ddd, numero = aleatorio.choice(DDDS), aleatorio.randrange(10**8)
+    telefone = f'({ddd}) 9{numero // 10**4:04d}-{numero % 10**4:04d}'
+    e164 = f'+55{ddd}9{numero:08d}'
+    return telefone, e164, e164[-8:]
+
+
+def _itens(aleatorio):
+    """Texto no formato do formulário e as linhas estruturadas correspondentes"""
+    from app.utils import normalizar_texto
+
+    linhas = []
+    for produto, unidade, preco in aleatorio.sample(PRODUTOS, aleatorio.randint(1, 3)):
+        quantidade = float(aleatorio.randint(1, 50))
+        linhas.append({
+            'produto': produto, 'produto_chave': normalizar_texto(produto), 'quantidade': quantidade,
+            'unidade': unidade, 'preco_unitario': preco, 'valor': round(quantidade * preco, 2),
+        })
+    texto = '\n'.join(f"- {linha['quantidade']:g} {linha['unidade']} {linha['produto']} @ "
+                      f"{linha['preco_unitario']:.2f}".replace('.', ',') for linha in linhas)
+    return texto, linhas, round(sum(linha['valor'] for linha in linhas), 2)
+
+
+def _data(aleatorio, depois_de=None):
+    inicio = depois_de or DATA_FINAL - timedelta(days=DIAS_HISTORICO)
+    minutos = max(int((DATA_FINAL - inicio).total_seconds() // 60), 1)
+    return inicio + timedelta(minutes=aleatorio.randrange(minutos))
+
+
+def _dominio(nome):
+    from app.utils import normalizar_texto
+    return ''.join(c for c in normalizar_texto(nome) if c.isalnum())
+
+
+def _lote(aleatorio, primeiro_id, quantidade, ids):
+    """Linhas de um lote de clientes e de tudo que pertence a eles"""
+    from app.utils import montar_texto_busca
+
+    tabelas = {nome: [] for nome in ('clientes', 'interacoes', 'cotacoes', 'itens_cotacao',
+                                     'pedidos', 'itens_pedido')}
+    for cliente_id in range(primeiro_id, primeiro_id + quantidade):
+        prefixo, nome = aleatorio.choice(PREFIXOS), aleatorio.choice(NOMES)
+        empresa = f'{nome} {cliente_id}'
+        nome_cliente = f'{prefixo} {nome} {cliente_id}'
+        email = f'contato{cliente_id}@{_dominio(nome)}.com.br'
+        telefone, e164, sufixo = _telefone(aleatorio)
+        cadastro = _data(aleatorio)
+        tabelas['clientes'].append({
+            'id': cliente_id, 'nome': nome_cliente, 'empresa': empresa, 'email': email,
+            'telefone': telefone, 'telefone_e164': e164, 'telefone_sufixo': sufixo,
+            'limite_credito': float(aleatorio.choice([5000, 8000, 10000, 15000, 25000, 50000, 80000])),
+            'area_atuacao': aleatorio.choice(SEGMENTOS), 'canal_vendas': aleatorio.choice(CANAIS),
+            'endereco': f'Rua {aleatorio.randint(1, 999)}, DDD {telefone[1:3]}',
+            'data_cadastro': cadastro, 'atualizado_em': cadastro, 'ativo': aleatorio.random() > 0.1,
+            'texto_busca': montar_texto_busca(nome_cliente, empresa, email, telefone),
+        })
+
+        for _ in range(aleatorio.randint(0, 2 * MEDIA_INTERACOES)):
+            tabelas['interacoes'].append({
+                'cliente_id': cliente_id, 'tipo': aleatorio.choice(TIPOS_INTERACAO),
+                'descricao': f'Contato sobre {aleatorio.choice(PRODUTOS)[0]}',
+                'data_hora': _data(aleatorio, cadastro),
+            })
+
+        aprovadas = []
+        for _ in range(aleatorio.randint(0, 2 * MEDIA_COTACOES)):
+            ids['cotacoes'] += 1
+            texto, linhas, valor = _itens(aleatorio)
+            status = aleatorio.choice(STATUS_COTACAO)
+            data = _data(aleatorio, cadastro)
+            tabelas['cotacoes'].append({
+                'id': ids['cotacoes'], 'id_cotacao': f'C{ids["cotacoes"]:08d}', 'cliente_id': cliente_id,
+                'itens': texto, 'valor_total': valor, 'status': status, 'data_criacao': data,
+                'atualizado_em': data,
+            })
+            tabelas['itens_cotacao'] += [dict(linha, cotacao_id=ids['cotacoes']) for linha in linhas]
+            if status == 'Aprovada':
+                aprovadas.append((ids['cotacoes'], texto, linhas, valor, data))
+
+        for numero in range(aleatorio.randint(0, 2 * MEDIA_PEDIDOS)):
+            ids['pedidos'] += 1
+            if numero < len(aprovadas):
+                cotacao_id, texto, linhas, valor, data = aprovadas[numero]
+                data = _data(aleatorio, data)
+            else:
+                cotacao_id, (texto, linhas, valor), data = None, _itens(aleatorio), _data(aleatorio, cadastro)
+            status = aleatorio.choice(STATUS_PEDIDO)
+            tabelas['pedidos'].append({
+                'id': ids['pedidos'], 'id_pedido': f'P{ids["pedidos"]:08d}', 'cliente_id': cliente_id,
+                'cotacao_id': cotacao_id, 'itens': texto, 'valor_final': valor, 'status_entrega': status,
+                'data_criacao': data, 'atualizado_em': data,
+                'data_entrega_prevista': (data + timedelta(days=aleatorio.randint(5, 30))).date(),
+                'data_entrega_real': (data + timedelta(days=aleatorio.randint(5, 40))).date()
+                if status == 'Entregue' else None,
+            })
+            tabelas['itens_pedido'] += [dict(linha, pedido_id=ids['pedidos']) for linha in linhas]
+    return tabelas
+
+
+# ==================== CARGA ====================
+
+def popular(total_clientes, semente=42, tamanho_lote=2000, progresso=print):
+    """Recria as tabelas e grava a base; retorna a contagem de linhas por tabela"""
+    from sqlalchemy import text
+
+    from app import analise, contadores, db, duplicados, resumos  # noqa: F401 (listeners)
+
+    aleatorio = random.Random(semente)
+    db.drop_all()
+    db.create_all()
+    tabelas = {tabela.name: tabela for tabela in db.metadata.sorted_tables}
+
+    totais, ids = {}, {'cotacoes': 0, 'pedidos': 0}
+    inicio = time.perf_counter()
+    for primeiro in range(1, total_clientes + 1, tamanho_lote):
+        lote = _lote(aleatorio, primeiro, min(tamanho_lote, total_clientes - primeiro + 1), ids)
+        for nome, linhas in lote.items():
+            if linhas:
+                db.session.execute(tabelas[nome].insert(), linhas)
+                totais[nome] = totais.get(nome, 0) + len(linhas)
+        db.session.commit()
+        if progresso and (primeiro - 1) % (tamanho_lote * 25) == 0:
+            progresso(f'   {primeiro + tamanho_lote - 1:>9} clientes ({time.perf_counter() - inicio:.0f} s)')
+
+    # Sequências do PostgreSQL continuam do maior id gravado
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for nome in ('clientes', 'cotacoes', 'pedidos'):
+            db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{nome}', 'id'), "
+                                    f"(SELECT COALESCE(MAX(id), 1) FROM {nome}))"))
+        db.session.commit()
+
+    # Estruturas derivadas que as rotas de escrita mantêm
+    contadores.recalcular_contadores()
+    resumos.reconstruir_resumos()
+    duplicados.reconstruir_chaves()
+    with db.engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+    return totais
+
+
+def main():
+    args = _argumentos()
+    from app import app
+
+    total = args.clientes or ESCALAS[args.escala]
+    with app.app_context():
+        from app import db
+        print(f'Banco: {db.engine.url.render_as_string(hide_password=True)}')
+        inicio = time.perf_counter()
+        totais = popular(total, args.semente)
+        for nome, quantidade in totais.items():
+            print(f'   {nome}: {quantidade}')
+        print(f'✅ Base gerada em {time.perf_counter() - inicio:.0f} s (semente {args.semente})')
+
+
+if __name__ == '__main__':
+    main()
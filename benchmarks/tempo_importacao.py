@@ -0,0 +1,95 @@
+"""Orçamento de tempo de importação do pacote `app` (python -X importtime).
+
+Mede, em subprocessos limpos, o tempo acumulado de `import app` e de
+`create_app()`, e falha (código 1) se passar do orçamento ou se algum
+módulo pesado que deveria ser carregado só no primeiro uso aparecer. Não
+depende de pytest: o CI roda o script e qualquer falha (inclusive erro ao
+importar) sai com código diferente de zero.
+
+Uso:
+    python benchmarks/tempo_importacao.py
+    python benchmarks/tempo_importacao.py --orcamento-import-ms 600 --orcamento-app-ms 2000
+    python benchmarks/tempo_importacao.py --salvar benchmarks/tempo_importacao.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que não podem ser carregados por `import app` / `create_app()`
+PROIBIDOS_IMPORT = ('app.controllers', 'app.forms', 'flask_wtf', 'wtforms', 'phonenumbers', 'email_validator')
+PROIBIDOS_APP = ('app.forms', 'phonenumbers', 'email_validator')
+
+
+def medir(codigo):
+    """(tempo acumulado do módulo de topo em ms, módulos importados, tempo total em ms)"""
+    ambiente = dict(os.environ, PYTHONPATH=RAIZ)
+    ambiente.setdefault('DATABASE_URL', 'sqlite://')
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, env=ambiente, capture_output=True, text=True,
+    )
+    if processo.returncode != 0:
+        erro = [linha for linha in processo.stderr.splitlines()
+                if linha.strip() and not linha.startswith('import time:')]
+        print(f'❌ {codigo!r} falhou: {erro[-1] if erro else processo.returncode}')
+        sys.exit(1)
+    total_ms = (time.perf_counter() - inicio) * 1000
+    modulos, app_ms = [], 0.0
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha[len('import time:'):].split('|')
+        nome = nome.strip()
+        modulos.append(nome)
+        if nome == 'app':
+            app_ms = int(acumulado) / 1000
+    return app_ms, modulos, total_ms
+
+
+def melhor_de(codigo, repeticoes):
+    medicoes = [medir(codigo) for _ in range(repeticoes)]
+    return min(medicoes, key=lambda m: m[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--orcamento-import-ms', type=float, default=float(os.environ.get('ORCAMENTO_IMPORT_MS', 800)))
+    parser.add_argument('--orcamento-app-ms', type=float, default=float(os.environ.get('ORCAMENTO_APP_MS', 2500)))
+    parser.add_argument('--salvar', help='grava as medições em JSON (para acompanhar a evolução)')
+    args = parser.parse_args()
+
+    falhas = []
+
+    import_ms, modulos, _ = melhor_de('import app', args.repeticoes)
+    print(f'import app:   {import_ms:8.1f} ms  (orçamento {args.orcamento_import_ms:.0f} ms, {len(modulos)} módulos)')
+    if import_ms > args.orcamento_import_ms:
+        falhas.append(f'import app levou {import_ms:.1f} ms')
+    falhas += [f'import app carregou {m}' for m in PROIBIDOS_IMPORT if m in modulos]
+
+    _, modulos_app, app_ms = melhor_de('from app import create_app; create_app()', args.repeticoes)
+    print(f'create_app(): {app_ms:8.1f} ms  (processo inteiro, orçamento {args.orcamento_app_ms:.0f} ms)')
+    if app_ms > args.orcamento_app_ms:
+        falhas.append(f'create_app() levou {app_ms:.1f} ms')
+    falhas += [f'create_app() carregou {m}' for m in PROIBIDOS_APP if m in modulos_app]
+
+    if args.salvar:
+        with open(args.salvar, 'w', encoding='utf-8') as arquivo:
+            json.dump({'import_app_ms': round(import_ms, 1), 'create_app_ms': round(app_ms, 1),
+                       'modulos_import': len(modulos), 'modulos_app': len(modulos_app)}, arquivo, indent=2)
+
+    for falha in falhas:
+        print(f'❌ {falha}')
+    if falhas:
+        sys.exit(1)
+    print('✅ Dentro do orçamento')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Configuração do gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+
+Todas as opções podem ser ajustadas por variáveis de ambiente.
+"""
+
+import multiprocessing
+import os
+
+# ==================== REDE ====================
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# ==================== WORKERS ====================
+
+# Processos: (2 x núcleos) + 1, o padrão recomendado pelo gunicorn;
+# WEB_CONCURRENCY (Heroku/Railway) tem prioridade. O pool de cada worker
+# divide DB_MAX_CONEXOES entre eles (app/pool.py)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Threads por worker: as rotas passam a maior parte do tempo esperando o banco
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Carrega a aplicação no mestre antes do fork: módulos e templates
+# compilados ficam em páginas compartilhadas (copy-on-write)
+preload_app = True
+
+# ==================== RECICLAGEM ====================
+
+# Cada worker é reiniciado após ~N requisições (jitter evita que todos
+# reiniciem juntos), limitando crescimento de memória
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# ==================== LOGS ====================
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+
+# ==================== HOOKS ====================
+
+def post_fork(server, worker):
+    """Aquece o pool de conexões do worker antes de ele aceitar requisições"""
+    from app import app
+    from app.aquecimento import abrir_conexoes, descartar_conexoes_herdadas
+    from app.pool import capacidade
+
+    # Sockets abertos no mestre não podem ser usados por dois processos
+    descartar_conexoes_herdadas(app)
+    # Uma por thread, sem passar do que cabe no pool do worker
+    conexoes = min(threads, capacidade(app.config['SQLALCHEMY_ENGINE_OPTIONS']) or threads)
+    try:
+        abrir_conexoes(app, conexoes)
+        worker.log.info("Worker %s: %s conexões abertas", worker.pid, conexoes)
+    except Exception as e:
+        # Banco indisponível não deve derrubar o worker; a conexão é
+        # aberta de novo na primeira requisição
+        worker.log.warning("Worker %s: falha ao aquecer o pool: %s", worker.pid, e)
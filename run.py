@@ -8,7 +8,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from app import app, db
+    from app import app
     print("✅ Módulo app importado com sucesso!")
 except ImportError as e:
     print(f"❌ Erro ao importar módulo app: {e}")
@@ -26,14 +26,8 @@ if __name__ == '__main__':
     print(f"DATABASE_URL configurada: {'Sim' if os.environ.get('DATABASE_URL') else 'Não'}")
     print(f"{'='*50}\n")
     
-    # Criar tabelas se não existirem
-    with app.app_context():
-        try:
-            db.create_all()
-            print("✅ Banco de dados inicializado com sucesso!")
-        except Exception as e:
-            print(f"❌ Erro ao criar tabelas: {e}")
-            # Não sair aqui, deixar o app tentar rodar mesmo assim
+    # As tabelas não são criadas aqui: rode `flask --app run init-db` uma vez
+    # (e a cada atualização) para criar tabelas, colunas e índices
     
     # Iniciar aplicação
     print(f"🚀 Iniciando aplicação na porta {port}...")
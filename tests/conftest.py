@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Clientes da base de teste (benchmarks/semente.py, sempre a mesma base)
+TOTAL_CLIENTES = 200
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """Aplicação sobre um SQLite temporário populado, com orçamento de consultas estrito"""
+    with pytest.MonkeyPatch.context() as ambiente:
+        ambiente.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path_factory.mktemp('banco') / 'crm.db'))
+        ambiente.setenv('ORCAMENTO_CONSULTAS_ESTRITO', '1')
+        # Sem cache de respostas: toda requisição executa a rota
+        ambiente.setenv('CACHE_TIPO', 'nenhum')
+        from app import create_app
+        aplicacao = create_app()
+    aplicacao.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+    from benchmarks.semente import popular
+    with aplicacao.app_context():
+        popular(TOTAL_CLIENTES, progresso=None)
+    return aplicacao
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
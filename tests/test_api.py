@@ -0,0 +1,15 @@
+from app import db
+from app.models import Cliente
+
+
+def test_detalhe_e_lista_serializam_o_cliente_igual(app, client):
+    with app.app_context():
+        cliente = Cliente.query.filter_by(ativo=True).order_by(Cliente.id).first()
+        cliente.ultimo_contato = cliente.data_cadastro
+        id = cliente.id
+        db.session.commit()
+
+    detalhe = client.get(f'/api/clientes/{id}').get_json()
+    lista = {item['id']: item for item in client.get('/api/clientes').get_json()}
+    assert detalhe == lista[id]
+    assert isinstance(detalhe['data_cadastro'], str)
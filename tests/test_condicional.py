@@ -0,0 +1,57 @@
+import pytest
+
+from app.models import Cotacao
+
+
+@pytest.fixture
+def cotacao(app):
+    with app.app_context():
+        cotacao = Cotacao.query.filter_by(status='Enviada').order_by(Cotacao.id).first()
+        return cotacao.id, cotacao.cliente_id
+
+
+def _revalidar(client, url):
+    """GET com a ETag da versão atual: 304 se nada mudou"""
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    return etag
+
+
+def test_escrita_sem_mudanca_exibe_mensagem_na_revalidacao(client, cotacao):
+    id, cliente_id = cotacao
+    url = f'/clientes/{cliente_id}'
+    etag = _revalidar(client, url)
+
+    resposta = client.post(f'/cotacoes/{id}/status', data={'status': 'Inexistente'})
+    assert resposta.status_code == 302 and resposta.headers['Location'].endswith(url)
+
+    resposta = client.get(url, headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'Status inválido!' in resposta.get_data(as_text=True)
+    assert 'ETag' not in resposta.headers
+
+    # Mensagem exibida uma vez; a versão não mudou, então volta o 304
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_segunda_conversao_exibe_mensagem_na_revalidacao(client, cotacao):
+    id, cliente_id = cotacao
+    url = f'/clientes/{cliente_id}'
+    client.post(f'/cotacoes/{id}/converter', follow_redirects=True)
+    etag = _revalidar(client, url)
+
+    client.post(f'/cotacoes/{id}/converter')
+    resposta = client.get(url, headers={'If-None-Match': etag})
+    assert resposta.status_code == 200
+    assert 'Cotação já convertida' in resposta.get_data(as_text=True)
+
+
+def test_mensagem_pendente_nao_tira_o_304_do_json(client, cotacao):
+    id, cliente_id = cotacao
+    url = f'/api/clientes/{cliente_id}'
+    etag = _revalidar(client, url)
+
+    client.post(f'/cotacoes/{id}/status', data={'status': 'Inexistente'})
+    # O JSON não exibe a mensagem: continua 304 e ela fica para a próxima página
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert 'Status inválido!' in client.get(f'/clientes/{cliente_id}').get_data(as_text=True)
@@ -0,0 +1,36 @@
+from app import contadores, db
+from app.models import Contador
+
+
+def test_rollback_descarta_o_ajuste(app):
+    with app.app_context():
+        antes = contadores.ler_contadores()[contadores.PEDIDOS]
+        contadores.ajustar(contadores.PEDIDOS, +5)
+        db.session.rollback()
+        db.session.commit()
+        assert contadores.ler_contadores()[contadores.PEDIDOS] == antes
+
+
+def test_ajustes_da_transacao_gravados_no_commit(app):
+    with app.app_context():
+        antes = contadores.ler_contadores()[contadores.PEDIDOS]
+        contadores.ajustar(contadores.PEDIDOS, +2)
+        contadores.ajustar(contadores.PEDIDOS, -1)
+        assert db.session.get(Contador, contadores.PEDIDOS).valor == antes
+        db.session.commit()
+        assert contadores.ler_contadores()[contadores.PEDIDOS] == antes + 1
+        contadores.recalcular_contadores()
+
+
+def test_caminho_frio_nao_apaga_os_contadores_existentes(app):
+    with app.app_context():
+        contadores.recalcular_contadores()
+        Contador.query.filter_by(nome=contadores.PEDIDOS).delete()
+        db.session.get(Contador, contadores.COTACOES).valor += 7
+        db.session.commit()
+
+        valores = contadores.ler_contadores()
+        calculados = contadores.calcular_contadores()
+        assert valores[contadores.PEDIDOS] == calculados[contadores.PEDIDOS]
+        assert valores[contadores.COTACOES] == calculados[contadores.COTACOES] + 7
+        contadores.recalcular_contadores()
@@ -0,0 +1,17 @@
+from app import db
+from app.models import Cotacao, Pedido
+
+
+def test_conversao_com_id_ocupado_exibe_o_erro(app, client):
+    with app.app_context():
+        cotacao = Cotacao.query.filter_by(status='Enviada').order_by(Cotacao.id.desc()).first()
+        outra = Cotacao.query.filter(Cotacao.id != cotacao.id).first()
+        # PED-00N já usado por um pedido de outra cotação (ex.: SQL do seed)
+        db.session.add(Pedido(id_pedido=f'PED-{cotacao.id:03d}', cliente_id=outra.cliente_id,
+                              cotacao_id=outra.id, itens='x', valor_final=1))
+        db.session.commit()
+        id, cliente_id = cotacao.id, cotacao.cliente_id
+
+    resposta = client.post(f'/cotacoes/{id}/converter', follow_redirects=True)
+    assert resposta.status_code == 200
+    assert f'PED-{id:03d} já é o id de outro pedido' in resposta.get_data(as_text=True)
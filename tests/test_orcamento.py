@@ -0,0 +1,95 @@
+import html
+import re
+
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from app.models import Cliente, Interacao, Pedido
+from app.orcamento import OrcamentoConsultasExcedido, orcamento
+
+
+@pytest.fixture(scope='module')
+def ids(app):
+    """Cliente com mais pedidos da base, um pedido dele e o seu telefone"""
+    with app.app_context():
+        cliente_id = db.session.execute(
+            select(Pedido.cliente_id).group_by(Pedido.cliente_id)
+            .order_by(func.count().desc(), Pedido.cliente_id).limit(1)
+        ).scalar()
+        cliente = db.session.get(Cliente, cliente_id)
+        pedido = Pedido.query.filter_by(cliente_id=cliente_id).first()
+        return {'cliente': cliente_id, 'pedido': pedido.id, 'telefone': cliente.telefone}
+
+
+ROTAS = [
+    '/',
+    '/clientes',
+    '/clientes?busca=tech',
+    '/clientes/{cliente}',
+    '/clientes/{cliente}/interacoes',
+    '/clientes/{cliente}/cotacoes',
+    '/clientes/{cliente}/pedidos',
+    '/cotacoes',
+    '/cotacoes?status=Aprovada',
+    '/pedidos',
+    '/pedidos?status=Pendente',
+    '/pedidos/{pedido}',
+    '/relatorios',
+    '/api/relatorios/analise',
+    '/api/relatorios/produtos?produto=cimento',
+    '/api/clientes/{cliente}',
+    '/api/clientes/{cliente}/pedidos',
+    '/api/clientes/por-telefone?numero={telefone}',
+    '/api/tarefas',
+    # Streaming: os comandos do corpo contam
+    '/api/clientes',
+    '/api/clientes?formato=ndjson',
+    '/cotacoes/exportar',
+    '/pedidos/exportar?formato=xlsx',
+]
+
+
+@pytest.mark.parametrize('rota', ROTAS)
+def test_rota_dentro_do_orcamento(client, ids, rota):
+    # Modo estrito: estourar o orçamento levanta OrcamentoConsultasExcedido
+    resposta = client.get(rota.format(**ids))
+    assert resposta.status_code == 200
+    assert resposta.get_data()
+
+
+@pytest.mark.parametrize('rota', ['/clientes', '/cotacoes', '/pedidos'])
+def test_paginas_seguintes_dentro_do_orcamento(client, rota):
+    for _ in range(3):
+        corpo = client.get(rota).get_data(as_text=True)
+        proxima = re.search(r'href="([^"]*cursor=[^"]*)"[^>]*>Próxima', corpo)
+        assert proxima
+        rota = html.unescape(proxima.group(1))
+
+
+def test_rotas_de_leitura_declaram_orcamento(app):
+    sem_orcamento = [
+        regra.rule for regra in app.url_map.iter_rules()
+        if regra.endpoint.startswith('main.') and regra.methods - {'HEAD', 'OPTIONS'} == {'GET'}
+        and not hasattr(app.view_functions[regra.endpoint], 'orcamento_consultas')
+    ]
+    assert sem_orcamento == ['/admin/popular-banco']
+
+
+def test_n_mais_1_estoura_o_orcamento(app, client, monkeypatch):
+    @orcamento(2)
+    def listar_com_n_mais_1():
+        clientes = Cliente.query.order_by(Cliente.id).limit(10).all()
+        # Uma contagem por cliente em vez de um GROUP BY
+        return {c.id: Interacao.query.filter_by(cliente_id=c.id).count() for c in clientes}
+
+    monkeypatch.setitem(app.view_functions, 'main.listar_clientes', listar_com_n_mais_1)
+    with pytest.raises(OrcamentoConsultasExcedido, match='executou 11 comandos SQL'):
+        client.get('/clientes')
+
+
+def test_streaming_confere_comandos_do_corpo(app, client, monkeypatch):
+    # A consulta do /api/clientes roda depois do after_request, ao gerar o corpo
+    monkeypatch.setattr(app.view_functions['main.api_clientes'], 'orcamento_consultas', 0)
+    with pytest.raises(OrcamentoConsultasExcedido, match='executou 1 comandos SQL'):
+        client.get('/api/clientes').get_data()
@@ -0,0 +1,35 @@
+from datetime import date
+
+from app import analise, resumos
+from app.models import Pedido, ResumoMes, ResumoSegmento
+
+
+def _receita_por_mes():
+    mes = {r.mes: (r.total_pedidos, round(r.valor_total, 2)) for r in ResumoMes.query if r.total_pedidos}
+    segmento = {}
+    for r in ResumoSegmento.query:
+        total, soma = segmento.get(r.mes, (0, 0.0))
+        segmento[r.mes] = (total + r.total_pedidos, soma + r.valor_total)
+    return mes, {m: (total, round(soma, 2)) for m, (total, soma) in segmento.items() if total}
+
+
+def test_cancelar_tira_o_pedido_da_receita_do_mes_e_do_segmento(app, client):
+    with app.app_context():
+        resumos.reconstruir_resumos()
+        ids = [p.id for p in Pedido.query.filter(Pedido.status_entrega != resumos.CANCELADO).limit(5)]
+
+    resposta = client.post('/api/pedidos/status', json={'ids': ids, 'status_entrega': resumos.CANCELADO})
+    assert resposta.status_code == 200
+    client.post('/api/pedidos/status', json={'ids': ids[:2], 'status_entrega': 'Entregue'})
+
+    with app.app_context():
+        mes, segmento = _receita_por_mes()
+        assert mes == segmento
+        resumos.reconstruir_resumos()
+        assert _receita_por_mes() == (mes, segmento)
+
+
+def test_inicio_explicito_respeita_o_maximo_de_meses():
+    primeiro, ultimo = analise.periodo(date(1900, 1, 1), date(2024, 5, 31))
+    assert (primeiro, ultimo) == ('2014-06', '2024-05')
+    assert analise.periodo(date(2024, 1, 1), date(2024, 5, 31)) == ('2024-01', '2024-05')
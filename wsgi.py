@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Ponto de entrada WSGI de produção: gunicorn -c gunicorn.conf.py wsgi:app
+
+Não cria tabelas (use `flask --app wsgi init-db` no deploy); só monta a
+aplicação e compila os templates. Com preload_app isso acontece uma vez no
+processo mestre e os workers herdam tudo pronto.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app  # noqa: E402
+from app.aquecimento import compilar_templates  # noqa: E402
+
+app.logger.info("%s templates compilados", compilar_templates(app))